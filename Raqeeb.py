@@ -9,44 +9,41 @@ Version: 2.2
 Last Modified: 2025-07-23
 """
 
+import argparse
 import cv2
+import numpy as np
 import os
 import tkinter as tk
 from tkinter import messagebox, simpledialog, Toplevel, filedialog
 from PIL import Image, ImageTk
-from deepface import DeepFace
 import threading
+import queue
 import time
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledFrame # Correct import for ScrolledFrame
 from datetime import datetime, date
-import shutil
 import sqlite3
-import smtplib
-from email.message import EmailMessage
-import dlib
-from scipy.spatial import distance as dist
 import pandas as pd
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 import logging
 import csv
 import hashlib # For password hashing
+from raqeeb_core.api import ApiServer
+from raqeeb_core.client import RemoteEngine
+from raqeeb_core.camera import FOURCC_OPTIONS
+from raqeeb_core.settings import DETECTOR_BACKENDS, SettingsError
+from raqeeb_core.export import export_attendance
+from raqeeb_core.constants import DB_PATH, SHAPE_PREDICTOR_PATH
+from raqeeb_core.logs import setup_logging
 
 # --- Logging Setup (إعداد التسجيل) ---
-# Configures logging to save application events to a file for debugging.
-logging.basicConfig(filename='app.log', level=logging.INFO, 
-                    format='%(asctime)s - %(levelname)s - %(message)s')
-
-# --- Constants (الثوابت) ---
-DB_PATH = 'known_faces'
-UNKNOWN_PATH = 'unknown_visitors'
-MODEL_NAME = "ArcFace"  # Recommended model for high accuracy
-DATABASE_FILE = 'attendance_system.db'
-SHAPE_PREDICTOR_PATH = 'shape_predictor_68_face_landmarks.dat' # dlib model for facial landmarks
-EAR_CONSEC_FRAMES = 3  # Number of consecutive frames the eye must be below the threshold for a "blink"
+# JSON lines in app.log, rotated by size and daily; written by a background thread, never by the camera loop.
+setup_logging('app.log')
+
+# Settings that require the local HTTP API to be restarted
+API_SETTING_KEYS = frozenset({'api_enabled', 'api_host', 'api_port', 'api_token'})
 
 class MainApp:
     """
@@ -54,8 +51,10 @@ class MainApp:
     and face recognition models.
     (الفئة الرئيسية للتطبيق التي تهيئ واجهة المستخدم وقاعدة البيانات والكاميرا ونماذج التعرف على الوجوه)
     """
-    def __init__(self, window):
+    def __init__(self, window, server_url=None, token=''):
         self.window = window
+        # With a server URL this window is only a display for an engine running on another machine
+        self.remote = server_url is not None
         self.style = ttk.Style(theme='superhero') # Default theme, will be updated from settings
         self.window.geometry("1366x768")
         self.window.resizable(True, True)
@@ -63,42 +62,62 @@ class MainApp:
         self.setup_translation()
         self.current_lang = 'ar'
 
-        # --- Initialize dlib components for liveness detection (تهيئة مكونات dlib) ---
-        self.face_detector_dlib = dlib.get_frontal_face_detector()
-        if not os.path.exists(SHAPE_PREDICTOR_PATH):
-            messagebox.showerror("Fatal Error", f"Shape predictor file not found: '{SHAPE_PREDICTOR_PATH}'. Please download it and place it in the application folder.")
-            logging.critical(f"Shape predictor file not found: {SHAPE_PREDICTOR_PATH}")
-            self.window.destroy(); return
-        self.landmark_predictor = dlib.shape_predictor(SHAPE_PREDICTOR_PATH)
-        (self.lStart, self.lEnd) = (42, 48); (self.rStart, self.rEnd) = (36, 42)
-
         self.setup_ui()
         
-        self.is_running = True
-        self.setup_database_and_folders()
-        self.load_settings() # Load settings including theme
-        self.style.theme_use(self.selected_theme) # Apply loaded theme
+        # --- The recognition engine runs independently of Tk; this window is one of its clients (المحرك) ---
+        if self.remote:
+            self.engine = RemoteEngine(server_url, token)
+        else:
+            from raqeeb_core.engine import RaqeebEngine  # Here, not at the top: a remote display has no dlib
+            self.engine = RaqeebEngine()
+        self.store = None if self.remote else self.engine.store
+        if self.remote:
+            # Employees, settings and reports are managed on the server
+            for button in (self.settings_button, self.manage_users_button, self.dashboard_button):
+                button.config(state=DISABLED)
+        self.style.theme_use(self.settings.selected_theme) # Apply loaded theme
         self.load_todays_attendance()
         self.update_ui_text()
         self.update_clock()
         
-        # --- Load DeepFace model once at startup for better performance (تحميل نموذج DeepFace مرة واحدة) ---
+        # --- Load dlib and DeepFace models once at startup for better performance (تحميل النماذج مرة واحدة) ---
         self.set_status(self.T('status_loading_models'))
         self.progress_bar.pack(fill=tk.X, padx=10, pady=5)
         self.progress_bar.start()
         try:
             # This can take a few moments on the first run
-            self.deepface_model = DeepFace.build_model(MODEL_NAME)
-            logging.info(f"DeepFace model '{MODEL_NAME}' loaded successfully.")
+            self.engine.load_models()
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+        except FileNotFoundError:
             self.progress_bar.stop()
             self.progress_bar.pack_forget()
+            messagebox.showerror("Fatal Error", f"Shape predictor file not found: '{SHAPE_PREDICTOR_PATH}'. Please download it and place it in the application folder.")
+            logging.critical(f"Shape predictor file not found: {SHAPE_PREDICTOR_PATH}")
+            self.engine.close()
+            self.window.destroy(); return
         except Exception as e:
             self.progress_bar.stop()
             self.progress_bar.pack_forget()
             messagebox.showerror("Fatal Error", f"Could not load the AI model: {e}\n\nPlease check your internet connection for the first-time setup.")
             logging.critical(f"Error loading DeepFace model: {e}")
+            self.engine.close()
             self.window.destroy(); return
 
+        # Engine events arrive on the engine thread; they are queued here and applied on the Tk thread,
+        # so a busy or hung UI never stalls recognition.
+        self.engine_events = queue.Queue(maxsize=500)
+        self.latest_frame = None
+        self.frame_lock = threading.Lock()
+        self.rgba_buffer = None    # Reused for every displayed frame, together with the Tk photo
+        self.video_photo = None
+        self.video_item = None
+        self.engine.subscribe(self.on_engine_event, frames=True)
+        self.poll_engine_events()
+
+        self.api_server = None
+        self.restart_api_server()
+
         self.window.after(100, self.start_processing_thread)
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -193,7 +212,40 @@ class MainApp:
                 'admin_password_label': "كلمة مرور المسؤول:", 'password_prompt_title': "مطلوب كلمة المرور",
                 'password_prompt_text': "الرجاء إدخال كلمة مرور المسؤول للوصول.", 'password_incorrect': "كلمة المرور غير صحيحة.",
                 'profile_window_title': "ملف الموظف: {}", 'profile_attendance_log': "سجل الحضور الكامل",
-                'profile_col_date': "التاريخ", 'profile_col_time': "الوقت"
+                'profile_col_date': "التاريخ", 'profile_col_time': "الوقت",
+                'adaptive_scheduling_label': "جدولة تكيفية للإطارات (حسب الحمل)", 'target_latency_label': "زمن الاستجابة المستهدف (ملي ثانية):",
+                'motion_gate_label': "تشغيل كاشف الوجوه عند اكتشاف حركة فقط", 'motion_cooldown_label': "مدة بقاء الكاشف نشطاً بعد الحركة (ثوانٍ):",
+                'perf_overlay_label': "عرض مؤشرات الأداء على الفيديو", 'metrics_export_path_label': "ملف تصدير مؤشرات الأداء (.json أو .prom، فارغ = تعطيل):",
+                'metrics_export_interval_label': "فاصل تصدير المؤشرات (ثوانٍ):",
+                'api_enabled_label': "تفعيل واجهة HTTP المحلية (استعلامات الحضور والأحداث المباشرة)",
+                'api_host_label': "واجهة الشبكة (127.0.0.1 = هذا الجهاز فقط، 0.0.0.0 = الكل):", 'api_port_label': "منفذ الواجهة:",
+                'api_token_label': "رمز الوصول (فارغ = بدون مصادقة):",
+                'api_start_fail': "تعذر تشغيل خادم الواجهة على المنفذ {}: {}",
+                'export_tab': "تصدير الحضور", 'export_from_label': "من تاريخ (YYYY-MM-DD):", 'export_to_label': "إلى تاريخ (YYYY-MM-DD):",
+                'export_employee_label': "الموظف:", 'export_all_employees': "جميع الموظفين", 'export_format_label': "صيغة الملف:",
+                'export_summary_label': "ملخص (عدد أيام الحضور لكل موظف) بدلاً من كل السجلات",
+                'export_range_btn': "تصدير", 'export_date_invalid': "الرجاء إدخال التواريخ بالصيغة YYYY-MM-DD.",
+                'cancel': "إلغاء", 'enrol_shot_progress': "الصورة {} من {}", 'enrol_look_straight': "انظر مباشرة إلى الكاميرا",
+                'enrol_turn_left': "أدر رأسك قليلاً إلى اليسار", 'enrol_turn_right': "أدر رأسك قليلاً إلى اليمين",
+                'enrol_no_face': "لا يوجد وجه في الصورة", 'enrol_one_person': "يجب أن يظهر شخص واحد فقط أمام الكاميرا",
+                'enrol_move_closer': "اقترب من الكاميرا", 'enrol_hold_still': "ابقَ ثابتاً، الصورة غير واضحة",
+                'enrol_good': "ممتاز، ابقَ كما أنت", 'enrol_turn_less': "أدر رأسك أقل قليلاً", 'enrol_indexing': "جاري إضافة الصور إلى فهرس الوجوه...",
+                'enrol_timeout': "انتهى الوقت قبل التقاط صور واضحة", 'enrol_camera_not_running': "الكاميرا لا تعمل. تحقق من الإعدادات.",
+                'status_camera_reconnecting': "انقطع الاتصال بالكاميرا، جاري إعادة الاتصال...",
+                'camera_resolution_label': "دقة الكاميرا (العرض × الارتفاع، 0 = الافتراضي):", 'camera_fps_label': "معدل الإطارات المطلوب (0 = الافتراضي):",
+                'camera_fourcc_label': "صيغة الالتقاط (MJPG تسمح بدقة ومعدل أعلى في كاميرات USB):",
+                'camera_buffer_size_label': "حجم ذاكرة الكاميرا المؤقتة بالإطارات (1 = أقل تأخير):",
+                'settings_invalid': "قيمة غير صالحة للإعداد {}:\n{}",
+                'status_liveness_retry': "لم يتم رصد رمشة. الرجاء النظر إلى الكاميرا والرمش مرة أخرى...",
+                'backup_started': "يتم إنشاء النسخة الاحتياطية في الخلفية. سيظهر إشعار عند الانتهاء.",
+                'status_backup_failed': "فشل النسخ الاحتياطي التلقائي: {}",
+                'backup_enabled_label': "نسخ احتياطي تلقائي", 'backup_dir_label': "مجلد النسخ الاحتياطية",
+                'backup_interval_label': "الفاصل بين النسخ (ساعات)", 'backup_keep_last_label': "عدد أحدث النسخ المحفوظة",
+                'backup_keep_daily_label': "الاحتفاظ بنسخة يومية لعدد أيام", 'backup_compress_label': "ضغط النسخ الاحتياطية (gzip)",
+                'maintenance_interval_label': "صيانة قاعدة البيانات كل (ساعات، 0 للإيقاف)",
+                'status_server_unreachable': "تعذر الاتصال بالخادم {}، جارٍ إعادة المحاولة...",
+                'status_indexing_faces': "جاري تحديث فهرس الوجوه ({} من {})، التعرف يعمل أثناء ذلك...",
+                'status_index_ready': "تمت إضافة {} صورة إلى فهرس الوجوه."
             },
             'en': {
                 'window_title': "Baseera Integrated Management System", 'main_title': "Attendance & Security System",
@@ -231,7 +283,40 @@ class MainApp:
                 'admin_password_label': "Admin Password:", 'password_prompt_title': "Password Required",
                 'password_prompt_text': "Please enter the admin password to continue.", 'password_incorrect': "Incorrect password.",
                 'profile_window_title': "Employee Profile: {}", 'profile_attendance_log': "Full Attendance Log",
-                'profile_col_date': "Date", 'profile_col_time': "Time"
+                'profile_col_date': "Date", 'profile_col_time': "Time",
+                'adaptive_scheduling_label': "Adaptive frame scheduling (load-driven)", 'target_latency_label': "Target Latency (ms):",
+                'motion_gate_label': "Run face detection only when motion is detected", 'motion_cooldown_label': "Motion Cooldown (seconds):",
+                'perf_overlay_label': "Show performance overlay on the video", 'metrics_export_path_label': "Metrics Export File (.json or .prom, empty = off):",
+                'metrics_export_interval_label': "Metrics Export Interval (seconds):",
+                'api_enabled_label': "Enable the local HTTP API (attendance queries and live events)",
+                'api_host_label': "API Interface (127.0.0.1 = this computer only, 0.0.0.0 = all):", 'api_port_label': "API Port:",
+                'api_token_label': "API Token (empty = no authentication):",
+                'api_start_fail': "Could not start the API server on port {}: {}",
+                'export_tab': "Export Attendance", 'export_from_label': "From (YYYY-MM-DD):", 'export_to_label': "To (YYYY-MM-DD):",
+                'export_employee_label': "Employee:", 'export_all_employees': "All employees", 'export_format_label': "File Format:",
+                'export_summary_label': "Summary (days attended per employee) instead of every check-in",
+                'export_range_btn': "Export", 'export_date_invalid': "Please enter dates as YYYY-MM-DD.",
+                'cancel': "Cancel", 'enrol_shot_progress': "Photo {} of {}", 'enrol_look_straight': "Look straight at the camera",
+                'enrol_turn_left': "Turn your head slightly to the left", 'enrol_turn_right': "Turn your head slightly to the right",
+                'enrol_no_face': "No face in view", 'enrol_one_person': "Only one person should be in front of the camera",
+                'enrol_move_closer': "Move closer to the camera", 'enrol_hold_still': "Hold still, the image is blurred",
+                'enrol_good': "Great, hold that", 'enrol_turn_less': "Not so far, turn back a little", 'enrol_indexing': "Adding the photos to the face index...",
+                'enrol_timeout': "Timed out before clear photos were captured", 'enrol_camera_not_running': "The camera is not running. Check the settings.",
+                'status_camera_reconnecting': "Camera disconnected, reconnecting...",
+                'camera_resolution_label': "Camera Resolution (width x height, 0 = driver default):", 'camera_fps_label': "Requested Frame Rate (0 = driver default):",
+                'camera_fourcc_label': "Capture Format (MJPG allows higher resolution/frame rate on USB cameras):",
+                'camera_buffer_size_label': "Camera Buffer Size in frames (1 = lowest latency):",
+                'settings_invalid': "Invalid value for setting {}:\n{}",
+                'status_liveness_retry': "No blink detected. Please look at the camera and blink again...",
+                'backup_started': "The backup is being created in the background. You will be notified when it is done.",
+                'status_backup_failed': "Automatic backup failed: {}",
+                'backup_enabled_label': "Automatic Backups", 'backup_dir_label': "Backup Folder",
+                'backup_interval_label': "Hours Between Backups", 'backup_keep_last_label': "Newest Backups to Keep",
+                'backup_keep_daily_label': "Keep One Backup per Day for (days)", 'backup_compress_label': "Compress Backups (gzip)",
+                'maintenance_interval_label': "Database Maintenance Every (hours, 0 = off)",
+                'status_server_unreachable': "Cannot reach the server at {}, retrying...",
+                'status_indexing_faces': "Updating the face index ({} of {}); recognition keeps running...",
+                'status_index_ready': "Added {} photos to the face index."
             }
         }
 
@@ -256,60 +341,10 @@ class MainApp:
         self.attendance_tree.heading('name', text=self.T('col_name'))
         self.attendance_tree.heading('time', text=self.T('col_time'))
 
-    def setup_database_and_folders(self):
-        """Creates necessary folders and initializes the SQLite database and tables."""
-        os.makedirs(DB_PATH, exist_ok=True)
-        os.makedirs(UNKNOWN_PATH, exist_ok=True)
-        self.conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.cursor.execute('CREATE TABLE IF NOT EXISTS attendance (id INTEGER PRIMARY KEY, name TEXT, timestamp TEXT)')
-        self.cursor.execute('CREATE TABLE IF NOT EXISTS employees (id INTEGER PRIMARY KEY, name TEXT UNIQUE, email TEXT)')
-        self.cursor.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)')
-        self.conn.commit()
-
-        # Initialize default settings if not present
-        default_settings = {
-            'camera_index': '0', 'ear_threshold': '0.25', 'confidence_threshold': '0.4',
-            'detector_backend': 'mtcnn', 'process_frame_interval': '1', 'selected_theme': 'superhero',
-            'absentee_email_subject': self.texts['en']['absentee_email_subject'],
-            'absentee_email_body': self.texts['en']['absentee_email_body'],
-            'smtp_server': 'smtp.gmail.com', 'smtp_port': '465',
-            'admin_password': hashlib.sha256('admin'.encode()).hexdigest() # Default password is 'admin'
-        }
-        for key, value in default_settings.items():
-            self.cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (key, value))
-        self.conn.commit()
-
-    def load_settings(self):
-        """Loads all settings from the database into application variables."""
-        self.cursor.execute("SELECT key, value FROM settings")
-        settings = dict(self.cursor.fetchall())
-        self.SENDER_EMAIL = settings.get('sender_email', '')
-        self.EMAIL_PASSWORD = settings.get('email_password', '')
-        self.RECEIVER_EMAIL = settings.get('receiver_email', '')
-        self.SMTP_SERVER = settings.get('smtp_server', 'smtp.gmail.com')
-        self.SMTP_PORT = int(settings.get('smtp_port', 465))
-        self.CAMERA_INDEX = int(settings.get('camera_index', 0)) 
-        self.EAR_THRESHOLD = float(settings.get('ear_threshold', 0.25))
-        self.CONFIDENCE_THRESHOLD = float(settings.get('confidence_threshold', 0.4))
-        self.DETECTOR_BACKEND = settings.get('detector_backend', 'mtcnn')
-        self.PROCESS_FRAME_INTERVAL = int(settings.get('process_frame_interval', 1))
-        self.selected_theme = settings.get('selected_theme', 'superhero')
-        self.ALERT_EMAIL_SUBJECT = settings.get('email_subject_label', 'Security Alert: Unknown Person Detected')
-        self.ALERT_EMAIL_BODY = settings.get('email_body_label', 'An unknown person was detected by the security system.')
-        self.ADMIN_PASSWORD_HASH = settings.get('admin_password', hashlib.sha256('admin'.encode()).hexdigest())
-        
-        default_subject = self.texts[self.current_lang].get('absentee_email_subject', 'Attendance Reminder')
-        default_body = self.texts[self.current_lang].get('absentee_email_body', 'Dear {name}, ...')
-        self.ABSENTEE_EMAIL_SUBJECT = settings.get('absentee_email_subject', default_subject)
-        self.ABSENTEE_EMAIL_BODY = settings.get('absentee_email_body', default_body)
-
-        logging.info(f"Settings loaded successfully.")
-
     def check_password(self):
         """Prompts for the admin password and verifies it."""
         password = simpledialog.askstring(self.T('password_prompt_title'), self.T('password_prompt_text'), show='*')
-        if password and hashlib.sha256(password.encode()).hexdigest() == self.ADMIN_PASSWORD_HASH:
+        if password and hashlib.sha256(password.encode()).hexdigest() == self.settings.ADMIN_PASSWORD_HASH:
             return True
         elif password is not None: # User entered something, but it was wrong
             messagebox.showerror(self.T('export_fail_title'), self.T('password_incorrect'))
@@ -342,185 +377,132 @@ class MainApp:
 
     def load_todays_attendance(self): 
         """Loads and displays attendance records for the current day from the database."""
-        today_str = str(date.today())
-        self.cursor.execute("SELECT name, strftime('%H:%M:%S', timestamp) FROM attendance WHERE date(timestamp) = ?", (today_str,))
+        if self.store is None:
+            return  # A display gets today's attendance from the server once it connects
+        self.show_attendance(self.store.todays_attendance())
+        logging.info("Today's attendance loaded.")
+
+    def show_attendance(self, records):
+        """Replaces the attendance list with (name, 'HH:MM:SS') records."""
         for i in self.attendance_tree.get_children(): self.attendance_tree.delete(i)
-        for record in self.cursor.fetchall():
+        for record in records:
             self.attendance_tree.insert('', tk.END, values=record)
-        logging.info("Today's attendance loaded.")
+
+    @property
+    def settings(self):
+        """The engine's current settings snapshot."""
+        return self.engine.settings
 
     def start_processing_thread(self): 
-        """Starts the main video processing loop in a separate thread to avoid freezing the UI."""
-        if hasattr(self, 'video_thread') and self.video_thread.is_alive():
-            logging.warning("Processing thread is already running.")
+        """Starts the engine's video processing loop in its own thread to avoid freezing the UI."""
+        self.engine.start()
+
+    def restart_api_server(self):
+        """(Re)starts the local HTTP API according to the current settings."""
+        if self.api_server is not None:
+            self.api_server.stop()
+            self.api_server = None
+        if self.remote or not self.settings.API_ENABLED:
             return
-        self.video_thread = threading.Thread(target=self.video_loop, daemon=True)
-        self.video_thread.start()
-        logging.info("Video processing thread started.")
-
-    def eye_aspect_ratio(self, eye): 
-        """Calculates the Eye Aspect Ratio (EAR) for liveness detection."""
-        A = dist.euclidean(eye[1], eye[5])
-        B = dist.euclidean(eye[2], eye[4])
-        C = dist.euclidean(eye[0], eye[3])
-        return (A + B) / (2.0 * C)
-
-    def mark_attendance(self, name):
-        """Records attendance for a recognized employee if not already marked today."""
-        today_str = str(date.today())
-        self.cursor.execute("SELECT * FROM attendance WHERE name = ? AND date(timestamp) = ?", (name, today_str))
-        if self.cursor.fetchone() is None:
-            timestamp = datetime.now()
-            self.cursor.execute("INSERT INTO attendance (name, timestamp) VALUES (?, ?)", (name, timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-            self.conn.commit()
-            self.attendance_tree.insert('', tk.END, values=(name, timestamp.strftime('%H:%M:%S')))
-            self.set_status(self.T('status_recognized', name))
-            logging.info(f"Attendance marked for: {name} at {timestamp.strftime('%H:%M:%S')}")
-        else:
-            logging.info(f"Attendance already marked for: {name} today.")
-
-    def send_email(self, receiver, subject, body, image_path=None):
-        """Sends an email alert. Can optionally attach an image."""
-        if not self.SENDER_EMAIL or not self.EMAIL_PASSWORD: 
-            logging.warning("Email not sent: Sender email or password not configured in settings.")
-            return False
+        server = ApiServer(self.engine, host=self.settings.API_HOST, port=self.settings.API_PORT, token=self.settings.API_TOKEN)
         try:
-            msg = EmailMessage()
-            msg['Subject'] = subject
-            msg['From'] = self.SENDER_EMAIL
-            msg['To'] = receiver
-            msg.set_content(body)
-            if image_path and os.path.exists(image_path):
-                with open(image_path, 'rb') as f:
-                    msg.add_attachment(f.read(), maintype='image', subtype='jpeg', filename=os.path.basename(image_path))
-            
-            with smtplib.SMTP_SSL(self.SMTP_SERVER, self.SMTP_PORT) as smtp:
-                smtp.login(self.SENDER_EMAIL, self.EMAIL_PASSWORD)
-                smtp.send_message(msg)
-            
-            logging.info(f"Email sent to {receiver} with subject: {subject}")
-            return True
-        except Exception as e: 
-            self.set_status(self.T('status_email_fail', e))
-            logging.error(f"Failed to send email to {receiver}: {e}")
-            return False
-
-    def save_unknown_visitor(self, face_crop):
-        """Saves an image of an unknown person and sends an email alert."""
-        current_time = time.time()
-        # Throttle saving to prevent spamming with images of the same person
-        if (current_time - getattr(self, 'last_unknown_saved_time', 0)) > 15:
-            self.last_unknown_saved_time = current_time
-            filename = os.path.join(UNKNOWN_PATH, f"unknown_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
-            try:
-                cv2.imwrite(filename, face_crop)
-                logging.info(f"Unknown visitor image saved: {filename}")
-                if self.RECEIVER_EMAIL:
-                    threading.Thread(target=self.send_email, args=(self.RECEIVER_EMAIL, self.ALERT_EMAIL_SUBJECT, self.ALERT_EMAIL_BODY, filename), daemon=True).start()
-                    self.set_status(self.T('status_email_sent'))
-            except Exception as e:
-                logging.error(f"Failed to save unknown visitor image or send email: {e}")
-
-    def video_loop(self):
-        """The main loop for capturing video, processing frames, and performing recognition."""
-        video_capture = cv2.VideoCapture(self.CAMERA_INDEX)
-        if not video_capture.isOpened():
-            messagebox.showerror(self.T('export_fail_title'), self.T('export_fail_msg', f"Could not open camera with index {self.CAMERA_INDEX}. Check settings."))
-            logging.error(f"Could not open camera with index {self.CAMERA_INDEX}.")
+            server.start()
+            self.api_server = server
+        except OSError as e:
+            logging.error(f"Could not start the API server on port {self.settings.API_PORT}: {e}")
+            messagebox.showwarning(self.T('export_fail_title'), self.T('api_start_fail', self.settings.API_PORT, e))
+
+    def on_engine_event(self, event):
+        """Receives engine events on the engine thread and hands them over to the Tk thread."""
+        if event['type'] == 'frame':
+            # Only the newest frame matters; an older one not drawn yet goes straight back to the pool
+            with self.frame_lock:
+                dropped, self.latest_frame = self.latest_frame, event['frame']
+            if dropped is not None:
+                self.engine.release_frame(dropped)
             return
-        
-        self.set_status(self.T('status_camera_ok'))
-        logging.info(f"Camera opened with index: {self.CAMERA_INDEX}")
-
-        blink_counter = 0; liveness_verified = False; last_recognition_time = 0
-        frame_count = 0
-        while self.is_running:
-            ret, frame = video_capture.read()
-            if not ret: 
-                logging.warning("Failed to grab frame from camera.")
-                time.sleep(0.1); continue
-            
-            frame_count += 1
-            if self.PROCESS_FRAME_INTERVAL > 1 and frame_count % self.PROCESS_FRAME_INTERVAL != 0:
-                photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
-                self.canvas.create_image(0, 0, image=photo, anchor=tk.NW); self.canvas.image = photo 
-                time.sleep(0.01)
-                continue
-
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces_dlib = self.face_detector_dlib(gray, 0)
-
-            current_frame_has_face = False
-            if len(faces_dlib) > 0:
-                current_frame_has_face = True
-                face = max(faces_dlib, key=lambda rect: rect.width() * rect.height())
-                
-                x, y, w, h = face.left(), face.top(), face.width(), face.height()
-                face_crop_color = frame[y:y+h, x:x+w]
-
-                if face_crop_color.size == 0:
-                    logging.warning("Face crop is empty, skipping processing for this face.")
-                    continue
-
-                if not liveness_verified:
-                    self.set_status(self.T('status_liveness_check'))
-                    shape = self.landmark_predictor(gray, face)
-                    shape = shape_to_np(shape)
-                    ear = (self.eye_aspect_ratio(shape[self.lStart:self.lEnd]) + self.eye_aspect_ratio(shape[self.rStart:self.rEnd])) / 2.0
-                    
-                    if ear < self.EAR_THRESHOLD: blink_counter += 1
-                    else:
-                        if blink_counter >= EAR_CONSEC_FRAMES:
-                            liveness_verified = True
-                            self.set_status(self.T('status_liveness_success'))
-                            logging.info("Liveness verified!")
-                        blink_counter = 0
-                    
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 255), 2)
-                    cv2.putText(frame, "Blink!", (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 255, 255), 2)
-
-                if liveness_verified and time.time() - last_recognition_time > 5:
-                    logging.info("Attempting DeepFace recognition...")
-                    try:
-                        dfs = DeepFace.find(img_path=face_crop_color, db_path=DB_PATH, model_name=MODEL_NAME, detector_backend=self.DETECTOR_BACKEND, enforce_detection=False, silent=True)
-                        
-                        if isinstance(dfs, list) and len(dfs) > 0 and not dfs[0].empty:
-                            instance = dfs[0].iloc[0]
-                            distance = instance[f'{MODEL_NAME}_cosine']
-                            logging.info(f"DeepFace result: Identity: {instance['identity']}, Distance: {distance:.4f}")
-
-                            if distance < self.CONFIDENCE_THRESHOLD:
-                                recognized_name = os.path.basename(os.path.dirname(instance['identity']))
-                                self.mark_attendance(recognized_name)
-                                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                                cv2.putText(frame, recognized_name, (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 255, 0), 2)
-                            else: 
-                                self.save_unknown_visitor(face_crop_color)
-                                self.set_status(self.T('status_unknown'))
-                                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
-                                cv2.putText(frame, "Unknown", (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 0, 255), 2)
-                        else: 
-                            self.save_unknown_visitor(face_crop_color)
-                            self.set_status(self.T('status_unknown'))
-                            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 2)
-                            cv2.putText(frame, "Unknown", (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, (0, 0, 255), 2)
-                    except Exception as e: 
-                        logging.error(f"DeepFace recognition error: {e}")
-                    
-                    liveness_verified = False
-                    last_recognition_time = time.time()
-            
-            if not current_frame_has_face:
-                self.set_status(self.T('status_searching'))
-                liveness_verified = False
-                blink_counter = 0
+        try:
+            self.engine_events.put_nowait(event)
+        except queue.Full:
+            logging.warning(f"UI event queue full, dropping '{event['type']}' event.")
 
-            photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
-            self.canvas.create_image(0, 0, image=photo, anchor=tk.NW); self.canvas.image = photo 
-            time.sleep(0.01)
+    def poll_engine_events(self):
+        """Applies queued engine events and draws the newest frame (runs on the Tk thread)."""
+        while True:
+            try:
+                event = self.engine_events.get_nowait()
+            except queue.Empty:
+                break
+            if event['type'] == 'status':
+                self.set_status(self.T(event['key'], *event['args']))
+            elif event['type'] == 'check_in':
+                self.attendance_tree.insert('', tk.END, values=(event['name'], event['timestamp'].strftime('%H:%M:%S')))
+            elif event['type'] == 'attendance':
+                self.show_attendance(event['rows'])
+            elif event['type'] == 'error':
+                messagebox.showerror(self.T('export_fail_title'), self.T(event['key'], *event['args']))
+            elif event['type'] == 'settings':
+                self.apply_settings_change(event['changed'])
+            elif event['type'] == 'backup':
+                self.show_backup_result(event)
+            elif event['type'] == 'index_progress':
+                self.show_index_progress(event['done'], event['total'])
+            elif event['type'] == 'index_ready':
+                self.progress_bar.pack_forget()
+                if event['stats'] and event['stats']['indexed']:
+                    self.set_status(self.T('status_index_ready', event['stats']['indexed']))
+
+        with self.frame_lock:
+            frame, self.latest_frame = self.latest_frame, None
+        if frame is not None:
+            monitor = self.engine.monitor
+            try:
+                with monitor.stage('render'):
+                    self.render_frame(frame)
+            finally:
+                self.engine.release_frame(frame)
+            monitor.tick('rendered')
+        self.window.after(15, self.poll_engine_events)
+
+    def apply_settings_change(self, changed):
+        """Applies changed settings that belong to the window rather than the engine."""
+        if changed & API_SETTING_KEYS:
+            self.restart_api_server()
+        if 'selected_theme' in changed:
+            self.style.theme_use(self.settings.selected_theme)
+
+    def show_backup_result(self, event):
+        """Reports a finished backup: a dialog when it was requested from the menu, the status bar if a scheduled one failed."""
+        if event['manual']:
+            if event['error']:
+                messagebox.showerror(self.T('export_fail_title'), self.T('backup_fail', event['error']))
+            else:
+                messagebox.showinfo(self.T('export_success_title'), self.T('backup_success', event['path']))
+        elif event['error']:
+            self.set_status(self.T('status_backup_failed', event['error']))
 
-        video_capture.release()
-        logging.info("Video loop stopped.")
+    def show_index_progress(self, done, total):
+        """Shows how far the background update of the face index has got; recognition keeps running meanwhile."""
+        self.progress_bar.config(mode='determinate', maximum=total, value=done)
+        self.progress_bar.pack(fill=tk.X, padx=10, pady=5)
+        self.set_status(self.T('status_indexing_faces', done, total))
+
+    def render_frame(self, frame):
+        """Draws a BGR frame on the video canvas, reusing one RGBA buffer, Tk photo and canvas item."""
+        height, width = frame.shape[:2]
+        if self.rgba_buffer is None or self.rgba_buffer.shape[:2] != (height, width):
+            self.rgba_buffer = np.empty((height, width, 4), dtype=np.uint8)
+            self.video_photo = None
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=self.rgba_buffer)
+        image = Image.fromarray(self.rgba_buffer)  # RGBA arrays are wrapped by PIL, not copied
+        if self.video_photo is None:
+            self.video_photo = ImageTk.PhotoImage(image=image)
+            if self.video_item is None:
+                self.video_item = self.canvas.create_image(0, 0, image=self.video_photo, anchor=tk.NW)
+            else:
+                self.canvas.itemconfig(self.video_item, image=self.video_photo)
+        else:
+            self.video_photo.paste(image)
 
     def set_status(self, text): 
         """Updates the status bar text."""
@@ -529,12 +511,9 @@ class MainApp:
     def on_closing(self): 
         """Handles the application closing event gracefully."""
         logging.info("Closing application...")
-        self.is_running = False
-        if hasattr(self, 'video_thread') and self.video_thread.is_alive():
-            self.video_thread.join(timeout=1.0)
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
-            logging.info("Database connection closed.")
+        if self.api_server is not None:
+            self.api_server.stop()
+        self.engine.close()
         self.window.destroy()
 
 class SettingsWindow(Toplevel):
@@ -564,85 +543,198 @@ class SettingsWindow(Toplevel):
         email_frame = ttk.LabelFrame(main_frame, text="Email Configuration", bootstyle=INFO)
         email_frame.pack(fill=tk.X, pady=10)
         ttk.Label(email_frame, text=self.master_app.T('sender_email')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.sender_email_var = tk.StringVar(value=self.master_app.SENDER_EMAIL)
+        self.sender_email_var = tk.StringVar(value=self.master_app.settings.SENDER_EMAIL)
         ttk.Entry(email_frame, textvariable=self.sender_email_var).pack(fill=tk.X, padx=10, pady=5)
         ttk.Label(email_frame, text=self.master_app.T('app_password')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.email_password_var = tk.StringVar(value=self.master_app.EMAIL_PASSWORD)
+        self.email_password_var = tk.StringVar(value=self.master_app.settings.EMAIL_PASSWORD)
         ttk.Entry(email_frame, textvariable=self.email_password_var, show="*").pack(fill=tk.X, padx=10, pady=5)
         ttk.Label(email_frame, text=self.master_app.T('password_warning'), bootstyle=WARNING).pack(pady=(0,5), anchor=tk.W, padx=10)
         ttk.Label(email_frame, text=self.master_app.T('receiver_email')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.receiver_email_var = tk.StringVar(value=self.master_app.RECEIVER_EMAIL)
+        self.receiver_email_var = tk.StringVar(value=self.master_app.settings.RECEIVER_EMAIL)
         ttk.Entry(email_frame, textvariable=self.receiver_email_var).pack(fill=tk.X, padx=10, pady=5)
         ttk.Label(email_frame, text=self.master_app.T('smtp_server_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.smtp_server_var = tk.StringVar(value=self.master_app.SMTP_SERVER)
+        self.smtp_server_var = tk.StringVar(value=self.master_app.settings.SMTP_SERVER)
         ttk.Entry(email_frame, textvariable=self.smtp_server_var).pack(fill=tk.X, padx=10, pady=5)
         ttk.Label(email_frame, text=self.master_app.T('smtp_port_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.smtp_port_var = tk.StringVar(value=str(self.master_app.SMTP_PORT))
+        self.smtp_port_var = tk.StringVar(value=str(self.master_app.settings.SMTP_PORT))
         ttk.Entry(email_frame, textvariable=self.smtp_port_var).pack(fill=tk.X, padx=10, pady=5)
 
         # --- Technical Settings ---
         tech_frame = ttk.LabelFrame(main_frame, text="Technical Configuration", bootstyle=INFO)
         tech_frame.pack(fill=tk.X, pady=10)
         ttk.Label(tech_frame, text=self.master_app.T('camera_index_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.camera_index_var = tk.StringVar(value=str(self.master_app.CAMERA_INDEX))
+        self.camera_index_var = tk.StringVar(value=str(self.master_app.settings.CAMERA_INDEX))
         ttk.Entry(tech_frame, textvariable=self.camera_index_var).pack(fill=tk.X, padx=10, pady=5)
         
         ttk.Label(tech_frame, text=self.master_app.T('ear_threshold_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.ear_threshold_var = tk.StringVar(value=str(self.master_app.EAR_THRESHOLD))
+        self.ear_threshold_var = tk.StringVar(value=str(self.master_app.settings.EAR_THRESHOLD))
         ttk.Entry(tech_frame, textvariable=self.ear_threshold_var).pack(fill=tk.X, padx=10, pady=5)
 
         ttk.Label(tech_frame, text=self.master_app.T('confidence_threshold_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.confidence_threshold_var = tk.StringVar(value=str(self.master_app.CONFIDENCE_THRESHOLD))
+        self.confidence_threshold_var = tk.StringVar(value=str(self.master_app.settings.CONFIDENCE_THRESHOLD))
         ttk.Entry(tech_frame, textvariable=self.confidence_threshold_var).pack(fill=tk.X, padx=10, pady=5)
 
         ttk.Label(tech_frame, text=self.master_app.T('detector_backend_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.detector_backend_var = tk.StringVar(value=self.master_app.DETECTOR_BACKEND)
-        self.detector_backend_options = ["opencv", "ssd", "dlib", "mtcnn", "retinaface", "mediapipe"]
-        ttk.OptionMenu(tech_frame, self.detector_backend_var, self.master_app.DETECTOR_BACKEND, *self.detector_backend_options, bootstyle="info").pack(fill=tk.X, padx=10, pady=5)
+        self.detector_backend_var = tk.StringVar(value=self.master_app.settings.DETECTOR_BACKEND)
+        ttk.OptionMenu(tech_frame, self.detector_backend_var, self.master_app.settings.DETECTOR_BACKEND, *DETECTOR_BACKENDS, bootstyle="info").pack(fill=tk.X, padx=10, pady=5)
 
         ttk.Label(tech_frame, text=self.master_app.T('process_interval_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.process_interval_var = tk.StringVar(value=str(self.master_app.PROCESS_FRAME_INTERVAL))
+        self.process_interval_var = tk.StringVar(value=str(self.master_app.settings.PROCESS_FRAME_INTERVAL))
         ttk.Entry(tech_frame, textvariable=self.process_interval_var).pack(fill=tk.X, padx=10, pady=5)
 
+        self.adaptive_scheduling_var = tk.BooleanVar(value=self.master_app.settings.ADAPTIVE_SCHEDULING)
+        ttk.Checkbutton(tech_frame, text=self.master_app.T('adaptive_scheduling_label'), variable=self.adaptive_scheduling_var, bootstyle="round-toggle").pack(pady=(10,5), anchor=tk.W, padx=10)
+
+        ttk.Label(tech_frame, text=self.master_app.T('target_latency_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.target_latency_var = tk.StringVar(value=str(self.master_app.settings.TARGET_LATENCY_MS))
+        ttk.Entry(tech_frame, textvariable=self.target_latency_var).pack(fill=tk.X, padx=10, pady=5)
+
+        self.motion_gate_var = tk.BooleanVar(value=self.master_app.settings.MOTION_GATE_ENABLED)
+        ttk.Checkbutton(tech_frame, text=self.master_app.T('motion_gate_label'), variable=self.motion_gate_var, bootstyle="round-toggle").pack(pady=(10,5), anchor=tk.W, padx=10)
+
+        ttk.Label(tech_frame, text=self.master_app.T('motion_cooldown_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.motion_cooldown_var = tk.StringVar(value=str(self.master_app.settings.MOTION_COOLDOWN))
+        ttk.Entry(tech_frame, textvariable=self.motion_cooldown_var).pack(fill=tk.X, padx=10, pady=5)
+
+        # --- Camera Capture ---
+        camera_frame = ttk.LabelFrame(main_frame, text="Camera Capture", bootstyle=INFO)
+        camera_frame.pack(fill=tk.X, pady=10)
+        ttk.Label(camera_frame, text=self.master_app.T('camera_resolution_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        resolution_row = ttk.Frame(camera_frame)
+        resolution_row.pack(fill=tk.X, padx=10, pady=5)
+        self.camera_width_var = tk.StringVar(value=str(self.master_app.settings.CAMERA_WIDTH))
+        ttk.Entry(resolution_row, textvariable=self.camera_width_var, width=8).pack(side=tk.LEFT)
+        ttk.Label(resolution_row, text=" x ").pack(side=tk.LEFT)
+        self.camera_height_var = tk.StringVar(value=str(self.master_app.settings.CAMERA_HEIGHT))
+        ttk.Entry(resolution_row, textvariable=self.camera_height_var, width=8).pack(side=tk.LEFT)
+
+        ttk.Label(camera_frame, text=self.master_app.T('camera_fps_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.camera_fps_var = tk.StringVar(value=str(self.master_app.settings.CAMERA_FPS))
+        ttk.Entry(camera_frame, textvariable=self.camera_fps_var).pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(camera_frame, text=self.master_app.T('camera_fourcc_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.camera_fourcc_var = tk.StringVar(value=self.master_app.settings.CAMERA_FOURCC)
+        ttk.OptionMenu(camera_frame, self.camera_fourcc_var, self.master_app.settings.CAMERA_FOURCC, *FOURCC_OPTIONS, bootstyle="info").pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(camera_frame, text=self.master_app.T('camera_buffer_size_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.camera_buffer_size_var = tk.StringVar(value=str(self.master_app.settings.CAMERA_BUFFER_SIZE))
+        ttk.Entry(camera_frame, textvariable=self.camera_buffer_size_var).pack(fill=tk.X, padx=10, pady=5)
+
+        # --- Performance Monitoring ---
+        perf_frame = ttk.LabelFrame(main_frame, text="Performance Monitoring", bootstyle=INFO)
+        perf_frame.pack(fill=tk.X, pady=10)
+        self.perf_overlay_var = tk.BooleanVar(value=self.master_app.settings.PERF_OVERLAY)
+        ttk.Checkbutton(perf_frame, text=self.master_app.T('perf_overlay_label'), variable=self.perf_overlay_var, bootstyle="round-toggle").pack(pady=(10,5), anchor=tk.W, padx=10)
+
+        ttk.Label(perf_frame, text=self.master_app.T('metrics_export_path_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.metrics_export_path_var = tk.StringVar(value=self.master_app.settings.METRICS_EXPORT_PATH)
+        ttk.Entry(perf_frame, textvariable=self.metrics_export_path_var).pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(perf_frame, text=self.master_app.T('metrics_export_interval_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.metrics_export_interval_var = tk.StringVar(value=str(self.master_app.settings.METRICS_EXPORT_INTERVAL))
+        ttk.Entry(perf_frame, textvariable=self.metrics_export_interval_var).pack(fill=tk.X, padx=10, pady=5)
+
+        api_frame = ttk.LabelFrame(main_frame, text="HTTP API", bootstyle=INFO)
+        api_frame.pack(fill=tk.X, pady=10)
+        self.api_enabled_var = tk.BooleanVar(value=self.master_app.settings.API_ENABLED)
+        ttk.Checkbutton(api_frame, text=self.master_app.T('api_enabled_label'), variable=self.api_enabled_var, bootstyle="round-toggle").pack(pady=(10,5), anchor=tk.W, padx=10)
+
+        ttk.Label(api_frame, text=self.master_app.T('api_host_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.api_host_var = tk.StringVar(value=self.master_app.settings.API_HOST)
+        ttk.Entry(api_frame, textvariable=self.api_host_var).pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(api_frame, text=self.master_app.T('api_port_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.api_port_var = tk.StringVar(value=str(self.master_app.settings.API_PORT))
+        ttk.Entry(api_frame, textvariable=self.api_port_var).pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(api_frame, text=self.master_app.T('api_token_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.api_token_var = tk.StringVar(value=self.master_app.settings.API_TOKEN)
+        ttk.Entry(api_frame, textvariable=self.api_token_var, show="*").pack(fill=tk.X, padx=10, pady=5)
+
+        # --- Backups & Maintenance ---
+        backup_frame = ttk.LabelFrame(main_frame, text="Backups & Maintenance", bootstyle=INFO)
+        backup_frame.pack(fill=tk.X, pady=10)
+        self.backup_enabled_var = tk.BooleanVar(value=self.master_app.settings.BACKUP_ENABLED)
+        ttk.Checkbutton(backup_frame, text=self.master_app.T('backup_enabled_label'), variable=self.backup_enabled_var, bootstyle="round-toggle").pack(pady=(10,5), anchor=tk.W, padx=10)
+
+        ttk.Label(backup_frame, text=self.master_app.T('backup_dir_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.backup_dir_var = tk.StringVar(value=self.master_app.settings.BACKUP_DIR)
+        ttk.Entry(backup_frame, textvariable=self.backup_dir_var).pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(backup_frame, text=self.master_app.T('backup_interval_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.backup_interval_var = tk.StringVar(value=str(self.master_app.settings.BACKUP_INTERVAL_HOURS))
+        ttk.Entry(backup_frame, textvariable=self.backup_interval_var).pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(backup_frame, text=self.master_app.T('backup_keep_last_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.backup_keep_last_var = tk.StringVar(value=str(self.master_app.settings.BACKUP_KEEP_LAST))
+        ttk.Entry(backup_frame, textvariable=self.backup_keep_last_var).pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(backup_frame, text=self.master_app.T('backup_keep_daily_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.backup_keep_daily_var = tk.StringVar(value=str(self.master_app.settings.BACKUP_KEEP_DAILY))
+        ttk.Entry(backup_frame, textvariable=self.backup_keep_daily_var).pack(fill=tk.X, padx=10, pady=5)
+
+        self.backup_compress_var = tk.BooleanVar(value=self.master_app.settings.BACKUP_COMPRESS)
+        ttk.Checkbutton(backup_frame, text=self.master_app.T('backup_compress_label'), variable=self.backup_compress_var, bootstyle="round-toggle").pack(pady=(10,5), anchor=tk.W, padx=10)
+
+        ttk.Label(backup_frame, text=self.master_app.T('maintenance_interval_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
+        self.maintenance_interval_var = tk.StringVar(value=str(self.master_app.settings.MAINTENANCE_INTERVAL_HOURS))
+        ttk.Entry(backup_frame, textvariable=self.maintenance_interval_var).pack(fill=tk.X, padx=10, pady=5)
+
         # --- UI and Email Content Settings ---
         content_frame = ttk.LabelFrame(main_frame, text="Content & Appearance", bootstyle=INFO)
         content_frame.pack(fill=tk.X, pady=10)
         ttk.Label(content_frame, text=self.master_app.T('theme_label')).pack(pady=(5,0), anchor=tk.W, padx=10)
-        self.theme_var = tk.StringVar(value=self.master_app.selected_theme)
+        self.theme_var = tk.StringVar(value=self.master_app.settings.selected_theme)
         self.available_themes = self.master_app.style.theme_names()
-        ttk.OptionMenu(content_frame, self.theme_var, self.master_app.selected_theme, *self.available_themes, bootstyle="info").pack(fill=tk.X, padx=10, pady=5)
+        ttk.OptionMenu(content_frame, self.theme_var, self.master_app.settings.selected_theme, *self.available_themes, bootstyle="info").pack(fill=tk.X, padx=10, pady=5)
 
         ttk.Button(main_frame, text=self.master_app.T('save_settings'), command=self.save, bootstyle=SUCCESS).pack(pady=25, fill=tk.X)
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
     def save(self):
-        """Validates and saves all settings to the database."""
-        try:
-            settings_to_save = {
-                'sender_email': self.sender_email_var.get(), 'email_password': self.email_password_var.get(),
-                'receiver_email': self.receiver_email_var.get(), 'smtp_server': self.smtp_server_var.get(),
-                'smtp_port': str(int(self.smtp_port_var.get())), 'camera_index': str(int(self.camera_index_var.get())),
-                'ear_threshold': str(float(self.ear_threshold_var.get())), 'confidence_threshold': str(float(self.confidence_threshold_var.get())),
-                'detector_backend': self.detector_backend_var.get(), 'process_frame_interval': str(int(self.process_interval_var.get())),
-                'selected_theme': self.theme_var.get()
-            }
-            # Only update password if a new one is entered
-            new_password = self.password_var.get()
-            if new_password:
-                settings_to_save['admin_password'] = hashlib.sha256(new_password.encode()).hexdigest()
+        """Saves the settings; only changed values are written and the running system picks them up immediately."""
+        settings_to_save = {
+            'sender_email': self.sender_email_var.get(), 'email_password': self.email_password_var.get(),
+            'receiver_email': self.receiver_email_var.get(), 'smtp_server': self.smtp_server_var.get(),
+            'smtp_port': self.smtp_port_var.get(), 'camera_index': self.camera_index_var.get(),
+            'camera_width': self.camera_width_var.get(), 'camera_height': self.camera_height_var.get(),
+            'camera_fps': self.camera_fps_var.get(), 'camera_fourcc': self.camera_fourcc_var.get(),
+            'camera_buffer_size': self.camera_buffer_size_var.get(),
+            'ear_threshold': self.ear_threshold_var.get(), 'confidence_threshold': self.confidence_threshold_var.get(),
+            'detector_backend': self.detector_backend_var.get(), 'process_frame_interval': self.process_interval_var.get(),
+            'selected_theme': self.theme_var.get(),
+            'adaptive_scheduling': self.adaptive_scheduling_var.get(),
+            'target_latency_ms': self.target_latency_var.get(),
+            'motion_gate_enabled': self.motion_gate_var.get(),
+            'motion_cooldown': self.motion_cooldown_var.get(),
+            'perf_overlay': self.perf_overlay_var.get(),
+            'metrics_export_path': self.metrics_export_path_var.get().strip(),
+            'metrics_export_interval': self.metrics_export_interval_var.get(),
+            'api_enabled': self.api_enabled_var.get(),
+            'api_host': self.api_host_var.get().strip() or '127.0.0.1',
+            'api_port': self.api_port_var.get(),
+            'api_token': self.api_token_var.get().strip(),
+            'backup_enabled': self.backup_enabled_var.get(),
+            'backup_dir': self.backup_dir_var.get().strip() or 'db_backups',
+            'backup_interval_hours': self.backup_interval_var.get(),
+            'backup_keep_last': self.backup_keep_last_var.get(),
+            'backup_keep_daily': self.backup_keep_daily_var.get(),
+            'backup_compress': self.backup_compress_var.get(),
+            'maintenance_interval_hours': self.maintenance_interval_var.get()
+        }
+        # Only update password if a new one is entered
+        new_password = self.password_var.get()
+        if new_password:
+            settings_to_save['admin_password'] = hashlib.sha256(new_password.encode()).hexdigest()
 
-        except ValueError:
-            messagebox.showerror(self.master_app.T('export_fail_title'), "Invalid input for numeric fields. Please enter numbers.", parent=self)
+        try:
+            # API restarts and theme changes arrive as a 'settings' engine event
+            self.master_app.engine.save_settings(settings_to_save)
+        except SettingsError as e:
+            messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T('settings_invalid', e.key, e.message), parent=self)
             return
-
-        for key, value in settings_to_save.items():
-            self.master_app.cursor.execute("REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-        self.master_app.conn.commit()
-        self.master_app.load_settings()
-        self.master_app.style.theme_use(self.master_app.selected_theme)
         messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('settings_saved'), parent=self)
         self.destroy()
-        logging.info("Settings saved successfully.")
 
     def on_closing(self):
         self.master_app.window.focus_set()
@@ -707,13 +799,10 @@ class ManagementWindow(Toplevel):
         for i in self.emp_tree.get_children(): self.emp_tree.delete(i)
         self.absent_list.delete(0, tk.END)
 
-        self.master_app.cursor.execute("SELECT name, email FROM employees ORDER BY name")
-        all_employees = self.master_app.cursor.fetchall()
+        all_employees = self.master_app.store.list_employees()
         for emp in all_employees: self.emp_tree.insert('', tk.END, values=emp)
 
-        today_str = str(date.today())
-        self.master_app.cursor.execute("SELECT name FROM attendance WHERE date(timestamp) = ?", (today_str,))
-        present_today = {row[0] for row in self.master_app.cursor.fetchall()}
+        present_today = self.master_app.store.present_names()
         all_emp_names = {emp[0] for emp in all_employees}
         absent_today = sorted(list(all_emp_names - present_today))
         
@@ -744,62 +833,72 @@ class ManagementWindow(Toplevel):
                    command=lambda: self._capture_and_save_employee(name_var.get(), email_var.get(), add_window)).pack(pady=25, fill=tk.X)
 
     def _capture_and_save_employee(self, name, email, add_window):
-        """Handles the logic for capturing photos and saving a new employee."""
+        """Adds the employee and captures their photos from the live stream; recognition keeps running meanwhile."""
         if not name or name.isspace() or not email or email.isspace():
             messagebox.showerror(self.master_app.T('export_fail_title'), "Name and email cannot be empty.", parent=add_window)
             return
 
         try:
-            self.master_app.cursor.execute("INSERT INTO employees (name, email) VALUES (?, ?)", (name, email))
-            self.master_app.conn.commit()
-            logging.info(f"Employee '{name}' added to database.")
-            
-            self.master_app.is_running = False
-            if self.master_app.video_thread.is_alive():
-                self.master_app.video_thread.join(timeout=1.0)
-            
-            employee_dir = os.path.join(DB_PATH, name)
-            os.makedirs(employee_dir, exist_ok=True)
-
-            cap = cv2.VideoCapture(self.master_app.CAMERA_INDEX) 
-            if not cap.isOpened():
-                raise Exception(f"Could not open camera {self.master_app.CAMERA_INDEX}")
-
-            for i in range(3):
-                messagebox.showinfo(self.master_app.T('capture_title'), self.master_app.T('capture_prompt', i+1), parent=add_window)
-                ret, frame = cap.read()
-                if ret: 
-                    cv2.imwrite(os.path.join(employee_dir, f"{name}_{i+1}.jpg"), frame)
-                    logging.info(f"Captured image {i+1} for {name}.")
-                else:
-                    raise Exception("Failed to capture image from camera.")
-            
-            cap.release()
-            
-            pickle_file = os.path.join(DB_PATH, f"representations_{MODEL_NAME}.pkl")
-            if os.path.exists(pickle_file):
-                try:
-                    os.remove(pickle_file)
-                    logging.info(f"Removed DeepFace cache file: {pickle_file}")
-                except Exception as e:
-                    logging.error(f"Could not remove cache file {pickle_file}: {e}")
-                    messagebox.showwarning("Cache Warning", "Could not clear the face model cache. A manual restart might be required for the new user to be recognized.", parent=add_window)
-
-            messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('add_user_success_no_restart', name), parent=add_window)
-            self.refresh_data()
-            
+            self.master_app.store.add_employee(name, email)
         except sqlite3.IntegrityError:
             messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T('export_fail_msg', f"Employee '{name}' already exists."), parent=add_window)
             logging.warning(f"Attempted to add existing employee: {name}")
-        except Exception as e:
-            messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T('export_fail_msg', e), parent=add_window)
-            logging.error(f"Error during employee add/capture: {e}")
-            self.master_app.cursor.execute("DELETE FROM employees WHERE name = ?", (name,))
-            self.master_app.conn.commit()
-        finally:
-            self.master_app.is_running = True
-            self.master_app.start_processing_thread()
-            add_window.destroy()
+            return
+        try:
+            session = self.master_app.engine.start_enrolment(name)
+        except RuntimeError as e:
+            self.master_app.store.delete_employee(name)
+            messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T(str(e)), parent=add_window)
+            return
+
+        # Replace the form with live guidance (التوجيه أثناء الالتقاط)
+        for child in add_window.winfo_children(): child.destroy()
+        add_window.title(self.master_app.T('capture_title'))
+        add_window.geometry("450x560")
+        frame = ttk.Frame(add_window, padding=20)
+        frame.pack(fill=tk.BOTH, expand=True)
+        widgets = {
+            'pose': ttk.Label(frame, text="", font=("Helvetica", 14, "bold"), wraplength=400),
+            'preview': ttk.Label(frame),
+            'guidance': ttk.Label(frame, text="", wraplength=400),
+            'progress': ttk.Progressbar(frame, mode='determinate', maximum=session.status()['total_shots'], bootstyle=SUCCESS),
+        }
+        widgets['pose'].pack(pady=(0,10))
+        widgets['preview'].pack(pady=5)
+        widgets['guidance'].pack(pady=5)
+        widgets['progress'].pack(fill=tk.X, pady=10)
+        ttk.Button(frame, text=self.master_app.T('cancel'), bootstyle=SECONDARY, command=session.cancel).pack(fill=tk.X, pady=5)
+        add_window.protocol("WM_DELETE_WINDOW", session.cancel)
+        self._poll_enrolment(session, add_window, widgets)
+
+    def _poll_enrolment(self, session, add_window, widgets):
+        """Shows the session's guidance and preview until it finishes (Tk thread)."""
+        status = session.status()
+        if not session.finished:
+            if status['state'] == 'indexing':
+                widgets['pose'].config(text=self.master_app.T('enrol_indexing'))
+            else:
+                widgets['pose'].config(text=f"{self.master_app.T('enrol_shot_progress', status['shots'] + 1, status['total_shots'])}: {self.master_app.T(status['pose'])}")
+            widgets['guidance'].config(text=self.master_app.T(status['guidance']),
+                                       bootstyle=SUCCESS if status['guidance'] == 'enrol_good' else WARNING)
+            widgets['progress']['value'] = status['shots']
+            preview = session.preview
+            if preview is not None:
+                photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(preview, cv2.COLOR_BGR2RGB)))
+                widgets['preview'].config(image=photo); widgets['preview'].image = photo
+            add_window.after(100, self._poll_enrolment, session, add_window, widgets)
+            return
+
+        name = session.name
+        if status['state'] == 'done':
+            messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('add_user_success_no_restart', name), parent=add_window)
+        else:
+            self.master_app.store.delete_employee(name)
+            if status['state'] == 'failed':
+                error = self.master_app.T(status['error']) if status['error'] == 'enrol_timeout' else status['error']
+                messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T('export_fail_msg', error), parent=add_window)
+        add_window.destroy()
+        self.refresh_data()
 
     def edit_employee(self):
         """Edits the selected employee's email."""
@@ -810,10 +909,8 @@ class ManagementWindow(Toplevel):
         
         new_email = simpledialog.askstring("Edit Email", f"Enter new email for {name}:", initialvalue=current_email, parent=self)
         if new_email and not new_email.isspace():
-            self.master_app.cursor.execute("UPDATE employees SET email = ? WHERE name = ?", (new_email, name))
-            self.master_app.conn.commit()
+            self.master_app.store.update_employee_email(name, new_email)
             self.refresh_data()
-            logging.info(f"Employee '{name}' email updated to {new_email}.")
 
     def delete_employee(self):
         """Deletes an employee from the database and removes their images."""
@@ -822,21 +919,7 @@ class ManagementWindow(Toplevel):
         name = self.emp_tree.item(selected_item)['values'][0]
         
         if messagebox.askyesno(self.master_app.T('delete'), self.master_app.T('confirm_delete', name), parent=self):
-            self.master_app.cursor.execute("DELETE FROM employees WHERE name = ?", (name,))
-            self.master_app.cursor.execute("DELETE FROM attendance WHERE name = ?", (name,))
-            self.master_app.conn.commit()
-            logging.info(f"Employee '{name}' deleted from database.")
-            
-            employee_dir = os.path.join(DB_PATH, name)
-            if os.path.isdir(employee_dir):
-                shutil.rmtree(employee_dir)
-                logging.info(f"Deleted image directory: {employee_dir}")
-            
-            pickle_file = os.path.join(DB_PATH, f"representations_{MODEL_NAME}.pkl")
-            if os.path.exists(pickle_file):
-                os.remove(pickle_file)
-                logging.info("Removed DeepFace cache file due to user deletion.")
-
+            self.master_app.engine.delete_employee(name)
             self.refresh_data()
 
     def notify_absentees(self):
@@ -846,36 +929,22 @@ class ManagementWindow(Toplevel):
             messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('no_absentees'), parent=self)
             return
 
-        q_marks = ','.join('?'*len(absent_employees))
-        self.master_app.cursor.execute(f"SELECT name, email FROM employees WHERE name IN ({q_marks})", absent_employees)
-        absentees_with_emails = self.master_app.cursor.fetchall()
+        absentees_with_emails = self.master_app.store.employee_emails(absent_employees)
         
         sent_count = 0
         for name, email in absentees_with_emails:
             if email:
-                body = self.master_app.ABSENTEE_EMAIL_BODY.format(name=name)
-                threading.Thread(target=self.master_app.send_email, args=(email, self.master_app.ABSENTEE_EMAIL_SUBJECT, body), daemon=True).start()
+                body = self.master_app.settings.ABSENTEE_EMAIL_BODY.format(name=name)
+                self.master_app.engine.alerter.send_email_async(email, self.master_app.settings.ABSENTEE_EMAIL_SUBJECT, body)
                 sent_count += 1
         
         messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('absentee_email_sent'), parent=self)
         logging.info(f"Sent {sent_count} notification emails to absentees.")
 
     def backup_database(self):
-        """Creates a safe, timestamped backup of the SQLite database using the online backup API."""
-        backup_dir = "db_backups"
-        os.makedirs(backup_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = os.path.join(backup_dir, f"attendance_system_backup_{timestamp}.db")
-        try:
-            backup_conn = sqlite3.connect(backup_filename)
-            with backup_conn:
-                self.master_app.conn.backup(backup_conn)
-            backup_conn.close()
-            messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('backup_success', backup_filename), parent=self)
-            logging.info(f"Database backed up to: {backup_filename}")
-        except Exception as e:
-            messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T('backup_fail', e), parent=self)
-            logging.error(f"Failed to backup database: {e}")
+        """Asks the backup scheduler for a backup now; it runs in the background and the result arrives as a 'backup' event."""
+        self.master_app.engine.backups.request_backup()
+        messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('backup_started'), parent=self)
 
     def on_closing(self):
         self.master_app.window.focus_set()
@@ -895,7 +964,7 @@ class DashboardWindow(Toplevel):
         notebook.pack(expand=True, fill=tk.BOTH, padx=15, pady=15)
 
         try:
-            conn = sqlite3.connect(DATABASE_FILE)
+            conn = sqlite3.connect(self.master_app.store.path)
             self.df_attendance = pd.read_sql_query("SELECT name, timestamp FROM attendance", conn)
             conn.close()
             self.df_attendance['timestamp'] = pd.to_datetime(self.df_attendance['timestamp'])
@@ -912,6 +981,10 @@ class DashboardWindow(Toplevel):
         f2 = ttk.Frame(notebook)
         notebook.add(f2, text=self.master_app.T('weekly_chart_tab'))
         self.create_weekly_chart_tab(f2)
+
+        f3 = ttk.Frame(notebook)
+        notebook.add(f3, text=self.master_app.T('export_tab'))
+        self.create_export_tab(f3)
         
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -957,6 +1030,91 @@ class DashboardWindow(Toplevel):
             ttk.Label(parent_frame, text=f"Chart Error: {e}", bootstyle="danger").pack(pady=20)
             logging.error(f"Error loading weekly chart: {e}")
 
+    def create_export_tab(self, parent_frame):
+        """Creates the tab for exporting any date range to CSV or Parquet."""
+        frame = ttk.Frame(parent_frame, padding=15)
+        frame.pack(expand=True, fill=tk.BOTH)
+        today = date.today()
+
+        ttk.Label(frame, text=self.master_app.T('export_from_label')).pack(pady=(5,0), anchor=tk.W)
+        self.export_from_var = tk.StringVar(value=str(today.replace(day=1)))
+        ttk.Entry(frame, textvariable=self.export_from_var).pack(fill=tk.X, pady=5)
+
+        ttk.Label(frame, text=self.master_app.T('export_to_label')).pack(pady=(5,0), anchor=tk.W)
+        self.export_to_var = tk.StringVar(value=str(today))
+        ttk.Entry(frame, textvariable=self.export_to_var).pack(fill=tk.X, pady=5)
+
+        ttk.Label(frame, text=self.master_app.T('export_employee_label')).pack(pady=(5,0), anchor=tk.W)
+        employee_options = [self.master_app.T('export_all_employees')] + [name for name, _ in self.master_app.store.list_employees()]
+        self.export_employee_var = tk.StringVar(value=employee_options[0])
+        ttk.OptionMenu(frame, self.export_employee_var, employee_options[0], *employee_options, bootstyle="info").pack(fill=tk.X, pady=5)
+
+        ttk.Label(frame, text=self.master_app.T('export_format_label')).pack(pady=(5,0), anchor=tk.W)
+        self.export_format_var = tk.StringVar(value='csv')
+        ttk.OptionMenu(frame, self.export_format_var, 'csv', 'csv', 'parquet', bootstyle="info").pack(fill=tk.X, pady=5)
+
+        self.export_summary_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text=self.master_app.T('export_summary_label'), variable=self.export_summary_var, bootstyle="round-toggle").pack(pady=(10,5), anchor=tk.W)
+
+        self.export_progress = ttk.Progressbar(frame, mode='determinate', bootstyle=INFO)
+        self.export_progress.pack(fill=tk.X, pady=(15,5))
+        self.export_progress_label = ttk.Label(frame, text="")
+        self.export_progress_label.pack(anchor=tk.W)
+        self.export_button = ttk.Button(frame, text=self.master_app.T('export_range_btn'), command=self.export_range, bootstyle=INFO)
+        self.export_button.pack(pady=10, fill=tk.X)
+        self.export_job = None
+
+    def export_range(self):
+        """Streams the selected date range to a file on a background thread, reporting progress."""
+        try:
+            start = date.fromisoformat(self.export_from_var.get().strip())
+            end = date.fromisoformat(self.export_to_var.get().strip())
+        except ValueError:
+            messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T('export_date_invalid'), parent=self)
+            return
+        employee = self.export_employee_var.get()
+        names = [] if employee == self.master_app.T('export_all_employees') else [employee]
+        kind = 'summary' if self.export_summary_var.get() else 'rows'
+        fmt = self.export_format_var.get()
+
+        export_dir = "reports"
+        os.makedirs(export_dir, exist_ok=True)
+        filename = os.path.join(export_dir, f"attendance_{kind}_{start}_{end}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}")
+
+        # The worker thread only updates this dict; the Tk thread polls it
+        job = {'done': 0, 'total': 0, 'finished': False, 'error': None, 'cancelled': False}
+        def progress(done, total):
+            job['done'], job['total'] = done, total
+        def run():
+            try:
+                export_attendance(self.master_app.store.path, filename, fmt=fmt, kind=kind, start=start, end=end, names=names,
+                                  progress=progress, should_cancel=lambda: job['cancelled'])
+            except Exception as e:
+                job['error'] = e
+            job['finished'] = True
+
+        self.export_job = job
+        self.export_button.config(state=tk.DISABLED)
+        threading.Thread(target=run, daemon=True).start()
+        self.after(100, self._poll_export, job, filename)
+
+    def _poll_export(self, job, filename):
+        if job['cancelled']:
+            return
+        self.export_progress['value'] = 100.0 * job['done'] / job['total'] if job['total'] else 0
+        self.export_progress_label.config(text=f"{job['done']} / {job['total']}")
+        if not job['finished']:
+            self.after(100, self._poll_export, job, filename)
+            return
+        self.export_button.config(state=tk.NORMAL)
+        self.export_job = None
+        if job['error'] is not None:
+            messagebox.showerror(self.master_app.T('export_fail_title'), self.master_app.T('export_fail_msg', job['error']), parent=self)
+            logging.error(f"Failed to export attendance range: {job['error']}")
+        else:
+            self.export_progress['value'] = 100
+            messagebox.showinfo(self.master_app.T('export_success_title'), self.master_app.T('export_success_msg', filename), parent=self)
+
     def export_report(self, tree_data, report_type):
         """Exports data from the dashboard to a CSV file."""
         export_dir = "reports"
@@ -987,6 +1145,8 @@ class DashboardWindow(Toplevel):
             logging.error(f"Failed to export report: {e}")
 
     def on_closing(self):
+        if self.export_job is not None:
+            self.export_job['cancelled'] = True  # The worker removes the partial file
         self.master_app.window.focus_set()
         self.destroy()
 
@@ -1032,18 +1192,12 @@ class EmployeeProfileWindow(Toplevel):
         tree.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
 
         # Load all attendance records for this employee
-        self.main_app.cursor.execute(
-            "SELECT strftime('%Y-%m-%d', timestamp), strftime('%H:%M:%S', timestamp) FROM attendance WHERE name = ? ORDER BY timestamp DESC",
-            (self.employee_name,)
-        )
-        for record in self.main_app.cursor.fetchall():
+        for record in self.main_app.store.employee_attendance(self.employee_name):
             tree.insert('', tk.END, values=record)
 
     def get_employee_email(self):
         """Fetches the employee's email from the database."""
-        self.main_app.cursor.execute("SELECT email FROM employees WHERE name = ?", (self.employee_name,))
-        result = self.main_app.cursor.fetchone()
-        return result[0] if result else "N/A"
+        return self.main_app.store.employee_email(self.employee_name) or "N/A"
 
     def load_employee_photo(self):
         """Loads and displays the first available photo of the employee."""
@@ -1064,16 +1218,13 @@ class EmployeeProfileWindow(Toplevel):
         self.photo_label.config(text="No Image")
 
 
-# --- Helper Functions (وظائف مساعدة) ---
-def shape_to_np(shape, dtype="int"):
-    """Converts dlib's shape object to a NumPy array."""
-    coords = np.zeros((68, 2), dtype=dtype)
-    for i in range(0, 68):
-        coords[i] = (shape.part(i).x, shape.part(i).y)
-    return coords
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raqeeb attendance & security system.")
+    parser.add_argument('--connect', metavar='URL', help="Run as a display for the engine serving the API at URL, "
+                                                         "e.g. http://server:8765, instead of using a local camera.")
+    parser.add_argument('--token', default='', help="API token of the server, if it requires one.")
+    args = parser.parse_args()
     # Use a modern ttkbootstrap window
     root = ttk.Window(themename="superhero")
-    app = MainApp(root)
+    app = MainApp(root, server_url=args.connect, token=args.token)
     root.mainloop()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Raqeeb core - the GUI-independent recognition engine and its building blocks.
+(المكونات الأساسية لخط معالجة التعرف، مستقلة عن واجهة المستخدم)
+
+Nothing heavy is imported here: the names below load their module on first use, and modules
+that need dlib or DeepFace/TensorFlow (pipeline, engine, recognition) are only imported by the
+tools that run recognition. The export, merge and backup tools and the remote display client
+(raqeeb_core.client) work without them.
+"""
+
+import importlib
+
+# Public name -> module it lives in. Loaded on first access (PEP 562), so `import raqeeb_core.export`
+# or raqeeb_core.client does not pull in dlib through the pipeline.
+_EXPORTS = {
+    'AdaptiveFrameScheduler': 'scheduling', 'FRAME_SKIP': 'scheduling', 'FRAME_TRACK': 'scheduling',
+    'FRAME_DETECT': 'scheduling', 'MODE_IDLE': 'scheduling', 'MODE_ACTIVE': 'scheduling',
+    'MotionGate': 'motion',
+    'PerformanceMonitor': 'metrics', 'RollingHistogram': 'metrics', 'STAGES': 'metrics',
+    'AttendanceStore': 'store',
+    'RecognitionPipeline': 'pipeline', 'FrameResult': 'pipeline', 'draw_annotations': 'pipeline',
+    'load_dlib_models': 'pipeline',
+    'Settings': 'settings', 'SettingsRegistry': 'settings', 'SettingsError': 'settings', 'DEFAULT_SETTINGS': 'settings',
+    'Alerter': 'alerts',
+    'RaqeebEngine': 'engine',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""Entry point for `python -m raqeeb_core` (headless service mode)."""
+
+import sys
+
+from .service import main
+
+sys.exit(main())
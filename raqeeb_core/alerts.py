@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Email alerts and unknown-visitor snapshots (التنبيهات الأمنية).
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime
+from email.message import EmailMessage
+
+import cv2
+
+from .constants import UNKNOWN_PATH
+
+UNKNOWN_SAVE_INTERVAL = 15  # Seconds between two unknown-visitor snapshots
+
+
+class Alerter:
+    """
+    Sends emails and records unknown visitors.
+    (إرسال رسائل البريد الإلكتروني وحفظ صور الزوار غير المعروفين)
+
+    `get_settings` returns the current Settings object, so changes apply without a restart.
+    `on_status(key, *args)` reports user-facing status changes (e.g. 'status_email_sent').
+    """
+    def __init__(self, get_settings, unknown_dir=UNKNOWN_PATH, on_status=None):
+        self.get_settings = get_settings
+        self.unknown_dir = unknown_dir
+        self.on_status = on_status or (lambda key, *args: None)
+        self.last_unknown_saved_time = 0
+
+    def send_email(self, receiver, subject, body, image_path=None):
+        """Sends an email alert. Can optionally attach an image."""
+        settings = self.get_settings()
+        if not settings.SENDER_EMAIL or not settings.EMAIL_PASSWORD:
+            logging.warning("Email not sent: Sender email or password not configured in settings.")
+            return False
+        try:
+            msg = EmailMessage()
+            msg['Subject'] = subject
+            msg['From'] = settings.SENDER_EMAIL
+            msg['To'] = receiver
+            msg.set_content(body)
+            if image_path and os.path.exists(image_path):
+                with open(image_path, 'rb') as f:
+                    msg.add_attachment(f.read(), maintype='image', subtype='jpeg', filename=os.path.basename(image_path))
+
+            with smtplib.SMTP_SSL(settings.SMTP_SERVER, settings.SMTP_PORT) as smtp:
+                smtp.login(settings.SENDER_EMAIL, settings.EMAIL_PASSWORD)
+                smtp.send_message(msg)
+
+            logging.info(f"Email sent to {receiver} with subject: {subject}")
+            return True
+        except Exception as e:
+            self.on_status('status_email_fail', e)
+            logging.error("Failed to send email to %s: %s", receiver, e)
+            return False
+
+    def send_email_async(self, receiver, subject, body, image_path=None):
+        """Sends an email from a background thread."""
+        threading.Thread(target=self.send_email, args=(receiver, subject, body, image_path), daemon=True).start()
+
+    def save_unknown_visitor(self, face_crop):
+        """Saves an image of an unknown person and sends an email alert. Returns the file path, or None if throttled."""
+        current_time = time.time()
+        # Throttle saving to prevent spamming with images of the same person
+        if (current_time - self.last_unknown_saved_time) <= UNKNOWN_SAVE_INTERVAL:
+            return None
+        self.last_unknown_saved_time = current_time
+        filename = os.path.join(self.unknown_dir, f"unknown_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg")
+        try:
+            cv2.imwrite(filename, face_crop)
+            logging.info(f"Unknown visitor image saved: {filename}")
+            settings = self.get_settings()
+            if settings.RECEIVER_EMAIL:
+                self.send_email_async(settings.RECEIVER_EMAIL, settings.ALERT_EMAIL_SUBJECT, settings.ALERT_EMAIL_BODY, filename)
+                self.on_status('status_email_sent')
+            return filename
+        except Exception as e:
+            logging.error("Failed to save unknown visitor image or send email: %s", e)
+            return None
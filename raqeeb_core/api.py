@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP API for attendance queries and live events (واجهة HTTP المحلية).
+
+A small asyncio server built on the standard library, running on its own thread:
+    GET /api/health
+    GET /api/employees?after_id=0&limit=100
+    GET /api/attendance?date=2025-07-14&name=...&from=...&to=...&after_id=0&limit=100
+    GET /api/events          server-sent events: check_in and unknown visitors, pushed as they happen
+                             (?types=check_in,unknown,status also streams the status bar text keys)
+    GET /api/stream          the annotated camera video as MJPEG (multipart/x-mixed-replace)
+
+Queries use read-only SQLite connections, so HR/payroll integrations never take the writer's lock.
+Pages are keyed by row id: pass the returned `next_after_id` to get the next page.
+The events and the video stream are what a door display needs (see raqeeb_core.client).
+If an API token is configured it must be sent as `Authorization: Bearer <token>` or `?token=<token>`.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, date, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+import cv2
+
+from .store import connect_read_only
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+PUSHED_EVENTS = ('check_in', 'unknown')  # What /api/events sends without ?types=
+STREAMABLE_EVENTS = PUSHED_EVENTS + ('status',)
+STREAM_MAX_FPS = 10
+STREAM_JPEG_QUALITY = 80
+HEARTBEAT_INTERVAL = 15.0  # Seconds between SSE keep-alive comments
+REQUEST_TIMEOUT = 10.0
+
+REASONS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error'}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class ReadOnlyQueries:
+    """Paginated queries on read-only connections, one per worker thread."""
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect_read_only(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _page(rows, limit, columns):
+        items = [dict(zip(columns, row)) for row in rows[:limit]]
+        return {'items': items, 'next_after_id': items[-1]['id'] if len(rows) > limit else None}
+
+    def employees(self, after_id=0, limit=DEFAULT_PAGE_SIZE):
+        rows = self._connection().execute(
+            "SELECT id, name, email FROM employees WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit + 1)).fetchall()
+        return self._page(rows, limit, ('id', 'name', 'email'))
+
+    def attendance(self, after_id=0, limit=DEFAULT_PAGE_SIZE, name=None, start=None, end=None):
+        """`start`/`end` are inclusive dates."""
+        sql = "SELECT id, name, timestamp FROM attendance WHERE id > ?"
+        params = [after_id]
+        if start:
+            sql += " AND timestamp >= ?"; params.append(str(start))
+        if end:
+            sql += " AND timestamp < ?"; params.append(str(end + timedelta(days=1)))
+        if name:
+            sql += " AND name = ?"; params.append(name)
+        sql += " ORDER BY id LIMIT ?"; params.append(limit + 1)
+        rows = self._connection().execute(sql, params).fetchall()
+        return self._page(rows, limit, ('id', 'name', 'timestamp'))
+
+
+class EventBroadcaster:
+    """
+    Fans engine events out to SSE clients. `publish` may be called from any thread;
+    a short history lets reconnecting clients catch up via Last-Event-ID.
+    Clients that fall `client_queue_size` events behind are disconnected rather than slowing everyone down.
+    """
+    def __init__(self, loop, history=256, client_queue_size=100):
+        self.loop = loop
+        self.history = deque(maxlen=history)
+        self.client_queue_size = client_queue_size
+        self.clients = set()
+        self.next_id = 1
+
+    def publish(self, event):
+        if event['type'] not in STREAMABLE_EVENTS:
+            return
+        if event['type'] == 'unknown' and not event.get('image_path'):
+            return  # Throttled repeat of a visitor that was already recorded
+        self.loop.call_soon_threadsafe(self._publish, event)
+
+    def _publish(self, event):
+        message = (self.next_id, event['type'], _event_json(event))
+        self.next_id += 1
+        self.history.append(message)
+        for client in list(self.clients):
+            if message[1] not in client.types:
+                continue
+            try:
+                client.put_nowait(message)
+            except asyncio.QueueFull:
+                self.clients.discard(client)
+                client.overflowed = True
+                logging.warning("API event client is too slow, disconnecting it.")
+
+    def subscribe(self, last_event_id=None, types=PUSHED_EVENTS):
+        client = asyncio.Queue(maxsize=self.client_queue_size)
+        client.overflowed = False
+        client.types = frozenset(types)
+        if last_event_id is not None:
+            for message in self.history:
+                if message[0] > last_event_id and message[1] in client.types:
+                    client.put_nowait(message)
+        self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        self.clients.discard(client)
+
+
+class FrameStreamer:
+    """
+    JPEG-encodes the engine's annotated frames for /api/stream clients, on its own thread and only
+    while someone is watching. At most `max_fps` frames per second are encoded; the others go
+    straight back to the engine's pool. Clients are asyncio.Events set when a new JPEG is ready.
+    """
+    def __init__(self, engine, loop, max_fps=STREAM_MAX_FPS, quality=STREAM_JPEG_QUALITY):
+        self.engine = engine
+        self.loop = loop
+        self.min_period = 1.0 / max_fps
+        self.quality = quality
+        self.clients = set()
+        self.latest = None  # (timestamp, jpeg bytes)
+        self._cond = threading.Condition()
+        self._pending = None  # (frame, timestamp) waiting to be encoded
+        self._last_accepted = 0.0
+        self._watching = False
+        self._closed = False
+        self._thread = None
+
+    def add_client(self):
+        """Registers a stream client (on the event loop); the first one subscribes to the engine's frames."""
+        client = asyncio.Event()
+        self.clients.add(client)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="raqeeb-api-stream", daemon=True)
+            self._thread.start()
+        if not self._watching:
+            self._watching = True
+            self.engine.subscribe(self._on_event, frames=True)
+        return client
+
+    def remove_client(self, client):
+        self.clients.discard(client)
+        if not self.clients and self._watching:
+            self._watching = False
+            self.engine.unsubscribe(self._on_event)
+
+    def close(self):
+        if self._watching:
+            self._watching = False
+            self.engine.unsubscribe(self._on_event)
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _on_event(self, event):
+        # Engine thread: keep only the newest frame, never encode here
+        if event['type'] != 'frame':
+            return
+        now = time.monotonic()
+        with self._cond:
+            if not self._watching or self._closed or now - self._last_accepted < self.min_period:
+                self.engine.release_frame(event['frame'])
+                return
+            self._last_accepted = now
+            dropped, self._pending = self._pending, (event['frame'], event['timestamp'])
+            self._cond.notify()
+        if dropped is not None:
+            self.engine.release_frame(dropped[0])
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._closed)
+                pending, self._pending = self._pending, None
+            if pending is None:
+                return
+            frame, timestamp = pending
+            try:
+                ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            finally:
+                self.engine.release_frame(frame)
+            if ok:
+                self.latest = (timestamp, jpeg.tobytes())
+                self.loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        for client in self.clients:
+            client.set()
+
+
+class ApiServer:
+    """
+    Serves the local API for a RaqeebEngine from a background thread.
+    (خادم الواجهة البرمجية المحلية)
+    """
+    def __init__(self, engine, host='127.0.0.1', port=8765, token=''):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.token = token
+        self.queries = ReadOnlyQueries(engine.store.path)
+        self.loop = None
+        self.broadcaster = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+        self._start_error = None
+
+    def start(self):
+        """Starts serving. Raises OSError if the port cannot be bound."""
+        self._started.clear()
+        self._start_error = None
+        self._thread = threading.Thread(target=self._run, name="raqeeb-api", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            raise self._start_error
+        self.engine.subscribe(self.broadcaster.publish)
+        logging.info(f"API server listening on http://{self.host}:{self.port}")
+
+    def stop(self, timeout=2.0):
+        if self.loop is None or self._thread is None:
+            return
+        self.engine.unsubscribe(self.broadcaster.publish)
+        self.loop.call_soon_threadsafe(self.streamer.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        logging.info("API server stopped.")
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.broadcaster = EventBroadcaster(self.loop)
+        self.streamer = FrameStreamer(self.engine, self.loop)
+        try:
+            self._server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]  # The one picked by the OS if port was 0
+        except OSError as e:
+            self._start_error = e
+            self.loop.close()
+            self._started.set()
+            return
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    # --- HTTP handling ---
+    async def _handle(self, reader, writer):
+        try:
+            method, target, headers = await asyncio.wait_for(self._read_request(reader), REQUEST_TIMEOUT)
+            url = urlsplit(target)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if method != 'GET':
+                await self._send_json(writer, 405, {'error': 'only GET is supported'})
+            elif url.path == '/api/health':
+                await self._send_json(writer, 200, {'status': 'ok', 'running': self.engine.is_running})
+            elif not self._authorized(headers, params):
+                await self._send_json(writer, 401, {'error': 'missing or invalid token'})
+            elif url.path == '/api/events':
+                try:
+                    types = _types_param(params)
+                except BadRequest as e:
+                    await self._send_json(writer, 400, {'error': str(e)})
+                else:
+                    await self._stream_events(writer, headers, types)
+            elif url.path == '/api/stream':
+                await self._stream_frames(writer)
+            elif url.path in ('/api/employees', '/api/attendance'):
+                try:
+                    body = await self._query(url.path, params)
+                except BadRequest as e:
+                    await self._send_json(writer, 400, {'error': str(e)})
+                else:
+                    await self._send_json(writer, 200, body)
+            else:
+                await self._send_json(writer, 404, {'error': 'not found'})
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # Malformed request or the client went away
+        except asyncio.CancelledError:
+            pass  # Server shutting down
+        except Exception as e:
+            logging.error("API request failed: %s", e)
+            try:
+                await self._send_json(writer, 500, {'error': 'internal error'})
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+        headers = {}
+        for _ in range(100):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        return method, target, headers
+
+    def _authorized(self, headers, params):
+        if not self.token:
+            return True
+        auth = headers.get('authorization', '')
+        supplied = auth[7:] if auth.lower().startswith('bearer ') else params.get('token', '')
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    async def _query(self, path, params):
+        after_id = _int_param(params, 'after_id', 0)
+        limit = min(max(_int_param(params, 'limit', DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        if path == '/api/employees':
+            return await asyncio.to_thread(self.queries.employees, after_id, limit)
+        start = end = _date_param(params, 'date')
+        start = _date_param(params, 'from') or start
+        end = _date_param(params, 'to') or end
+        return await asyncio.to_thread(self.queries.attendance, after_id, limit, params.get('name'), start, end)
+
+    @staticmethod
+    async def _send_json(writer, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+        await writer.drain()
+
+    async def _stream_events(self, writer, headers, types):
+        try:
+            last_event_id = int(headers['last-event-id'])
+        except (KeyError, ValueError):
+            last_event_id = None
+        client = self.broadcaster.subscribe(last_event_id, types)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                         b"Connection: close\r\n\r\nretry: 3000\n\n")
+            status = self.engine.status
+            if 'status' in types and status is not None:
+                # The current status, without an id: a display that just connected shows it right away
+                data = _event_json({'type': 'status', 'key': status[0], 'args': status[1]})
+                writer.write(f"event: status\ndata: {data}\n\n".encode('utf-8'))
+            await writer.drain()
+            while True:
+                try:
+                    event_id, event_type, data = await asyncio.wait_for(client.get(), HEARTBEAT_INTERVAL)
+                    writer.write(f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n".encode('utf-8'))
+                except asyncio.TimeoutError:
+                    if client.overflowed:
+                        break
+                    writer.write(b": keep-alive\n\n")
+                await writer.drain()
+                if client.overflowed and client.empty():
+                    break  # The client reconnects with Last-Event-ID and replays what it missed
+        finally:
+            self.broadcaster.unsubscribe(client)
+
+
+    async def _stream_frames(self, writer):
+        client = self.streamer.add_client()
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            while True:
+                try:
+                    await asyncio.wait_for(client.wait(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue  # Camera idle or reconnecting; a dead client shows up on the next write
+                client.clear()
+                timestamp, jpeg = self.streamer.latest
+                # A slow client waits in drain() and then gets the newest frame; frames never queue up
+                writer.write(f"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n"
+                             f"X-Timestamp: {timestamp:.3f}\r\n\r\n".encode('latin-1') + jpeg + b"\r\n")
+                await writer.drain()
+        finally:
+            self.streamer.remove_client(client)
+
+
+def _event_json(event):
+    """The SSE data for an engine event."""
+    payload = {'type': event['type'], 'timestamp': _isoformat(event.get('timestamp'))}
+    if event['type'] == 'status':
+        payload['key'] = event['key']
+        payload['args'] = list(event['args'])
+    elif event['type'] == 'check_in':
+        payload.update(name=event['name'], distance=event.get('distance'), liveness=event.get('liveness'))
+    else:
+        payload.update(image=os.path.basename(event['image_path']), liveness=event.get('liveness'))
+    return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _types_param(params):
+    if not params.get('types'):
+        return PUSHED_EVENTS
+    types = tuple(t.strip() for t in params['types'].split(',') if t.strip())
+    unknown = set(types) - set(STREAMABLE_EVENTS)
+    if unknown:
+        raise BadRequest(f"unknown event types: {', '.join(sorted(unknown))} (available: {', '.join(STREAMABLE_EVENTS)})")
+    return types
+
+
+def _int_param(params, key, default):
+    try:
+        return int(params.get(key, default))
+    except ValueError:
+        raise BadRequest(f"'{key}' must be an integer")
+
+
+def _date_param(params, key):
+    if not params.get(key):
+        return None
+    try:
+        return date.fromisoformat(params[key])
+    except ValueError:
+        raise BadRequest(f"'{key}' must be a date (YYYY-MM-DD)")
+
+
+def _isoformat(value):
+    return value.isoformat(sep=' ', timespec='seconds') if isinstance(value, datetime) else value
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Scheduled database backups and maintenance (النسخ الاحتياطي والصيانة المجدولة).
+
+Backups are copied a few hundred pages at a time with SQLite's online backup API, so
+recognition keeps writing while a copy is made. The copy is read through the store's own
+connection: SQLite then carries that connection's writes over into the copy, whereas a write
+from any other connection would restart it from the first page. Each copy is
+checked, optionally gzipped, and only then moved into place under its final name. Old copies
+are pruned by a retention policy: the newest `keep_last` copies plus the newest copy of each of
+the last `keep_daily` days. ANALYZE and, when enough pages are free, VACUUM run while nobody is
+in front of the camera.
+"""
+
+import gzip
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+BACKUP_PREFIX = 'attendance_system_backup_'
+BACKUP_NAME = re.compile(re.escape(BACKUP_PREFIX) + r'(\d{8}_\d{6})\.db(\.gz)?$')
+PAGES_PER_STEP = 256  # About 1 MiB with the default page size
+VACUUM_FREE_RATIO = 0.1  # Rewrite the file only when at least this share of its pages is unused
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+def backup_database(source, dest_path, compress=False, pages=PAGES_PER_STEP, pause=0.005, should_stop=None):
+    """
+    Copies the database behind the `source` connection to `dest_path` (plus '.gz' if `compress`)
+    and returns the path written. Between steps of `pages` pages the source is unlocked for `pause`
+    seconds. Raises BackupCancelled if `should_stop()` returns True, and sqlite3.DatabaseError if
+    the copy fails its check.
+    """
+    final_path = dest_path + '.gz' if compress else dest_path
+    part_path = dest_path + '.part'
+    target = sqlite3.connect(part_path)
+
+    def progress(status, remaining, total):
+        if should_stop and should_stop():
+            raise BackupCancelled()
+
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=pause)
+            result = target.execute("PRAGMA quick_check").fetchone()[0]
+            if result != 'ok':
+                raise sqlite3.DatabaseError(f"backup copy failed its integrity check: {result}")
+        finally:
+            target.close()
+        if compress:
+            with open(part_path, 'rb') as raw, gzip.open(final_path + '.part', 'wb', compresslevel=6) as packed:
+                shutil.copyfileobj(raw, packed, 1024 * 1024)
+            os.replace(final_path + '.part', final_path)
+            os.remove(part_path)
+        else:
+            os.replace(part_path, final_path)
+    except BaseException:
+        for leftover in (part_path, final_path + '.part'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return final_path
+
+
+def list_backups(backup_dir):
+    """Returns [(datetime, path)] of the backups in `backup_dir`, newest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    backups = []
+    for name in os.listdir(backup_dir):
+        match = BACKUP_NAME.match(name)
+        if match:
+            backups.append((datetime.strptime(match.group(1), '%Y%m%d_%H%M%S'), os.path.join(backup_dir, name)))
+    return sorted(backups, reverse=True)
+
+
+def prune_backups(backup_dir, keep_last=7, keep_daily=30, now=None):
+    """
+    Deletes backups outside the retention policy and returns their paths. Kept are the newest
+    `keep_last` backups and the newest backup of each of the last `keep_daily` days. The newest
+    backup is always kept.
+    """
+    now = now or datetime.now()
+    backups = list_backups(backup_dir)
+    keep = {path for _, path in backups[:max(keep_last, 1)]}
+    first_day = (now - timedelta(days=keep_daily)).date()
+    seen_days = set()
+    for taken_at, path in backups:
+        day = taken_at.date()
+        if day > first_day and day not in seen_days:
+            seen_days.add(day)
+            keep.add(path)
+    removed = []
+    for _, path in backups:
+        if path not in keep:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError as e:
+                logging.warning(f"Could not remove old backup {path}: {e}")
+    return removed
+
+
+def maintain_database(store):
+    """Refreshes the query planner statistics and compacts the file if enough pages are free. Returns True if it vacuumed."""
+    with store.lock:
+        store.conn.execute("ANALYZE")
+        page_count = store.conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = store.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        vacuumed = page_count > 0 and free_pages / page_count >= VACUUM_FREE_RATIO
+        if vacuumed:
+            store.conn.execute("VACUUM")
+        # Give the space the WAL file took during the day back to the disk
+        store.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        store.conn.commit()
+    logging.info(f"Database maintenance done: ANALYZE{', VACUUM' if vacuumed else ''} "
+                 f"({free_pages} of {page_count} pages were free).")
+    return vacuumed
+
+
+class BackupScheduler:
+    """
+    Background thread that backs up the database and runs maintenance on the schedule in the settings.
+    (جدولة النسخ الاحتياطي والصيانة في الخلفية)
+
+    `get_settings()` returns the current Settings; `is_idle()` says whether maintenance may lock the
+    database now. `on_event(event)` receives {'type': 'backup', 'path': ..., 'error': ..., 'manual': bool}
+    after each backup. `request_backup()` asks for one right away; it never blocks the caller.
+    """
+    def __init__(self, store, get_settings, is_idle=lambda: True, on_event=None, poll_interval=60.0):
+        self.store = store
+        self.get_settings = get_settings
+        self.is_idle = is_idle
+        self.on_event = on_event
+        self.poll_interval = poll_interval
+        self.last_maintenance = time.time()  # Not right at startup
+        self._manual = False
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="raqeeb-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stops the thread; a backup in progress is abandoned and its partial file removed."""
+        self._running = False
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+
+    def request_backup(self):
+        self._manual = True
+        self._wake.set()
+
+    def wake(self):
+        """Re-evaluates the schedule now, e.g. after the settings changed."""
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if not self._running:
+                break
+            settings = self.get_settings()
+            manual, self._manual = self._manual, False
+            if manual or (settings.BACKUP_ENABLED and self._backup_due(settings)):
+                self.run_backup(settings, manual)
+            if settings.MAINTENANCE_INTERVAL_HOURS and time.time() - self.last_maintenance >= settings.MAINTENANCE_INTERVAL_HOURS * 3600 \
+                    and self.is_idle():
+                try:
+                    maintain_database(self.store)
+                except sqlite3.Error as e:
+                    logging.error(f"Database maintenance failed: {e}")
+                self.last_maintenance = time.time()
+
+    def _backup_due(self, settings):
+        # The newest file on disk decides, so restarting the app does not cause an extra backup
+        backups = list_backups(settings.BACKUP_DIR)
+        return not backups or datetime.now() - backups[0][0] >= timedelta(hours=settings.BACKUP_INTERVAL_HOURS)
+
+    def run_backup(self, settings, manual=False):
+        """Makes one backup and applies the retention policy. Returns the backup path, or None if it failed."""
+        path, error = None, None
+        started = time.perf_counter()
+        try:
+            os.makedirs(settings.BACKUP_DIR, exist_ok=True)
+            name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+            path = backup_database(self.store.conn, os.path.join(settings.BACKUP_DIR, name), compress=settings.BACKUP_COMPRESS,
+                                   should_stop=lambda: not self._running)
+            logging.info(f"Database backed up to {path} in {time.perf_counter() - started:.1f} s.")
+            for removed in prune_backups(settings.BACKUP_DIR, settings.BACKUP_KEEP_LAST, settings.BACKUP_KEEP_DAILY):
+                logging.info(f"Removed old backup {removed}")
+        except BackupCancelled:
+            logging.info("Backup abandoned on shutdown.")
+            return None
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Failed to backup database: {e}")
+            path, error = None, str(e)
+        if self.on_event:
+            self.on_event({'type': 'backup', 'path': path, 'error': error, 'manual': manual})
+        return path
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmark harness (أداة قياس الأداء دون اتصال).
+
+Replays a recorded video file or an image sequence through the same RecognitionPipeline
+used by the live app, with no Tk and a throw-away attendance database, and reports
+throughput, per-stage latency, recognition accuracy and peak RSS.
+
+With --soak the source is replayed in a loop for the given number of seconds, including the
+display copy and annotations of the live loop, and memory is sampled throughout: resident
+size drift per hour, and the bytes allocated per frame on a sample of frames traced by tracemalloc.
+
+Usage:
+    python -m raqeeb_core.benchmark entrance.mp4 --ground-truth entrance_gt.csv
+    python -m raqeeb_core.benchmark frames/ --fps 15 --detector-backend opencv --json report.json
+    python -m raqeeb_core.benchmark entrance.mp4 --soak 3600
+
+Ground-truth file: CSV with a `frame,name` header. Each row gives the identity visible from
+that frame on (0-based frame index), until the next row. Use an empty name for "nobody" and
+`unknown` for a person who is not enrolled.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from bisect import bisect_right
+
+import cv2
+import numpy as np
+
+from .buffers import FramePool
+from .constants import DB_PATH, MODEL_NAME, SHAPE_PREDICTOR_PATH
+from .face_index import index_path_for
+from .metrics import PerformanceMonitor
+from .pipeline import RecognitionPipeline, draw_annotations, load_dlib_models
+from .store import AttendanceStore
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def iter_frames(source, fps=30.0):
+    """
+    Yields (index, timestamp_seconds, frame) from a video file, an image folder or a glob pattern.
+    Video frames are decoded into the same buffer each time; copy a frame to keep it.
+    """
+    if os.path.isdir(source) or any(c in source for c in '*?['):
+        pattern = os.path.join(source, '*') if os.path.isdir(source) else source
+        paths = sorted(p for p in glob.glob(pattern) if p.lower().endswith(IMAGE_EXTENSIONS))
+        if not paths:
+            raise FileNotFoundError(f"No images found for '{source}'")
+        for index, path in enumerate(paths):
+            frame = cv2.imread(path)
+            if frame is None:
+                logging.warning(f"Skipping unreadable image: {path}")
+                continue
+            yield index, index / fps, frame
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Could not open video '{source}'")
+    video_fps = capture.get(cv2.CAP_PROP_FPS) or fps
+    index = 0
+    frame = None
+    try:
+        while True:
+            ret, frame = capture.read(frame)
+            if not ret:
+                break
+            yield index, index / video_fps, frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def load_ground_truth(path):
+    """Loads a `frame,name` CSV into a lookup function frame_index -> name ('' for nobody)."""
+    rows = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            rows.append((int(row['frame']), (row.get('name') or '').strip()))
+    rows.sort()
+    starts = [r[0] for r in rows]
+
+    def label_at(frame_index):
+        i = bisect_right(starts, frame_index) - 1
+        return rows[i][1] if i >= 0 else ''
+    return label_at
+
+
+def replay_frames(source, fps=30.0, loop=False):
+    """Like iter_frames, but with `loop` starts over at the end with timestamps that keep increasing."""
+    offset = 0.0
+    while True:
+        last = None
+        for index, timestamp, frame in iter_frames(source, fps):
+            last = timestamp
+            yield index, offset + timestamp, frame
+        if not loop or last is None:
+            return
+        offset += last + 1.0 / fps
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MiB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+    except (OSError, ValueError, AttributeError):  # Not Linux
+        import psutil
+        return psutil.Process().memory_info().rss / (1024.0 * 1024.0)
+
+
+class MemorySampler:
+    """
+    Soak-test memory tracking: RSS every `interval` seconds, and `traced_frames` frames (every
+    `trace_every`-th after `warmup` frames) traced with tracemalloc. Tracing is kept to that early
+    sample because switching it on and off itself grows RSS and would hide real drift.
+    """
+    def __init__(self, interval=1.0, warmup=100, trace_every=10, traced_frames=100):
+        self.interval = interval
+        self.warmup = warmup
+        self.trace_every = trace_every
+        self.traced_frames = traced_frames
+        self.rss = []          # (elapsed_s, MiB)
+        self.transient = []    # Peak bytes allocated while processing a traced frame
+        self.retained = []     # Bytes a traced frame left allocated afterwards
+        self._frames = 0
+        self._last_sample = None
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sample(self._started)
+
+    def before_frame(self):
+        self._frames += 1
+        if (self._frames > self.warmup and self._frames % self.trace_every == 0
+                and len(self.transient) < self.traced_frames):
+            tracemalloc.start()
+
+    def after_frame(self):
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.transient.append(peak)
+            self.retained.append(current)
+        now = time.perf_counter()
+        if now - self._last_sample >= self.interval:
+            self._sample(now)
+
+    def _sample(self, now):
+        self._last_sample = now
+        self.rss.append((now - self._started, current_rss_mb()))
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._sample(time.perf_counter())
+        times = np.array([t for t, _ in self.rss])
+        rss = np.array([m for _, m in self.rss])
+        # Skip the first fifth: caches, the first buffers and the traced sample are allocated while warming up
+        warm = times >= times[-1] * 0.2
+        drift = float(np.polyfit(times[warm] / 3600.0, rss[warm], 1)[0]) if np.count_nonzero(warm) >= 3 else None
+        transient = np.array(self.transient or [0]) / 1024.0
+        retained = np.array(self.retained or [0]) / 1024.0
+        return {
+            'duration_s': float(times[-1]), 'rss_start_mb': float(rss[0]), 'rss_end_mb': float(rss[-1]),
+            'rss_max_mb': float(rss.max()), 'rss_drift_mb_per_hour': drift, 'traced_frames': len(self.transient),
+            'transient_kib_per_frame_p50': float(np.percentile(transient, 50)),
+            'transient_kib_per_frame_p95': float(np.percentile(transient, 95)),
+            'retained_kib_per_frame_mean': float(retained.mean()),
+        }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+    except ImportError:  # Windows has no resource module
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024.0 * 1024.0)
+
+
+class AccuracyTracker:
+    """Scores every recognition decision against the ground truth."""
+    def __init__(self, label_at):
+        self.label_at = label_at
+        self.decisions = 0
+        self.correct = 0
+        self.false_accepts = 0   # Wrong employee, or an employee accepted for an unknown person
+        self.false_rejects = 0   # Enrolled employee reported as unknown
+        self.no_ground_truth = 0
+        self.recognized_people = set()
+        self.expected_people = set()
+
+    def expect(self, frame_index):
+        name = self.label_at(frame_index)
+        if name and name != 'unknown':
+            self.expected_people.add(name)
+
+    def score(self, frame_index, event):
+        expected = self.label_at(frame_index)
+        predicted = event.get('name') if event['type'] != 'unknown' else 'unknown'
+        self.decisions += 1
+        if not expected:
+            self.no_ground_truth += 1
+        elif predicted == expected:
+            self.correct += 1
+            if predicted != 'unknown':
+                self.recognized_people.add(predicted)
+        elif predicted == 'unknown':
+            self.false_rejects += 1
+        else:
+            self.false_accepts += 1
+
+    def summary(self):
+        scored = self.decisions - self.no_ground_truth
+        return {
+            'decisions': self.decisions, 'correct': self.correct,
+            'false_accepts': self.false_accepts, 'false_rejects': self.false_rejects,
+            'without_ground_truth': self.no_ground_truth,
+            'accuracy': self.correct / scored if scored else None,
+            'people_expected': len(self.expected_people),
+            'people_recognized': len(self.recognized_people),
+        }
+
+
+def run_benchmark(source, faces_dir=DB_PATH, shape_predictor_path=SHAPE_PREDICTOR_PATH, ground_truth=None,
+                  fps=30.0, max_frames=None, soak_seconds=None, **pipeline_options):
+    """Replays `source` through a fresh RecognitionPipeline and returns the report as a dict."""
+    from .recognition import DeepFaceRecognizer  # Imported here: pulls in TensorFlow
+
+    face_detector, landmark_predictor = load_dlib_models(shape_predictor_path)
+    detector_backend = pipeline_options.pop('detector_backend', 'mtcnn')
+    accuracy = AccuracyTracker(load_ground_truth(ground_truth)) if ground_truth else None
+    # A soak runs for hours: keep the latency window bounded so the report itself does not grow
+    monitor = PerformanceMonitor(window=5000 if soak_seconds else 100000)
+    frames = processed = 0
+    events = {'check_in': 0, 'recognized': 0, 'unknown': 0}
+    memory = MemorySampler() if soak_seconds else None
+    display_pool = FramePool(size=2)
+
+    with tempfile.TemporaryDirectory(prefix='raqeeb_bench_') as tmp_dir:
+        # The index is brought up to date in a copy: the app's own index was built with the app's
+        # detector backend, and a benchmark run must never change it
+        index_path = index_path_for(faces_dir, MODEL_NAME)
+        bench_index_path = os.path.join(tmp_dir, os.path.basename(index_path))
+        if os.path.exists(index_path):
+            shutil.copyfile(index_path, bench_index_path)
+        recognizer = DeepFaceRecognizer(faces_dir=faces_dir, model_name=MODEL_NAME, detector_backend=detector_backend,
+                                        index_path=bench_index_path)
+        recognizer.build_model()
+        recognizer.refresh_index()  # Outside the timed loop: enrolment is not what is being measured
+        store = AttendanceStore(os.path.join(tmp_dir, 'benchmark.db'))
+        pipeline = RecognitionPipeline(face_detector, landmark_predictor, recognizer, store, monitor=monitor, **pipeline_options)
+        if memory:
+            memory.start()
+        started = time.perf_counter()
+        try:
+            for index, timestamp, frame in replay_frames(source, fps, loop=bool(soak_seconds)):
+                if max_frames is not None and frames >= max_frames:
+                    break
+                if soak_seconds and time.perf_counter() - started >= soak_seconds:
+                    break
+                if memory:
+                    memory.before_frame()
+                result = pipeline.process(frame, timestamp)
+                if memory:
+                    # The live loop's display path: annotate a pooled copy, never the decoded frame
+                    with monitor.stage('render'):
+                        display = display_pool.acquire(frame.shape)
+                        np.copyto(display, frame)
+                        draw_annotations(display, result.annotations)
+                        display_pool.release(display)
+                    memory.after_frame()
+                frames += 1
+                processed += result.processed
+                if accuracy:
+                    accuracy.expect(index)
+                for event in result.events:
+                    events[event['type']] += 1
+                    if accuracy:
+                        accuracy.score(index, event)
+        finally:
+            elapsed = time.perf_counter() - started
+            memory_report = memory.stop() if memory else None
+            pipeline.close()
+            store.close()
+
+    stages = {name: {k: (v * 1000 if k in ('mean', 'p50', 'p95', 'p99', 'max') else v) for k, v in summary.items() if k not in ('sum', 'buckets')}
+              for name, summary in monitor.snapshot()['stages'].items()}
+    return {
+        'source': source, 'frames': frames, 'processed_frames': processed,
+        'wall_time_s': elapsed, 'throughput_fps': frames / elapsed if elapsed > 0 else 0.0,
+        'stages_ms': stages, 'events': events,
+        'accuracy': accuracy.summary() if accuracy else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'memory': memory_report,
+        'settings': dict(pipeline_options, detector_backend=detector_backend),
+    }
+
+
+def print_report(report):
+    print(f"Source:            {report['source']}")
+    print(f"Frames:            {report['frames']} ({report['processed_frames']} processed)")
+    print(f"Wall time:         {report['wall_time_s']:.2f} s")
+    print(f"Throughput:        {report['throughput_fps']:.1f} frames/s")
+    print(f"Peak RSS:          {report['peak_rss_mb']:.1f} MiB")
+    print(f"Events:            {report['events']}")
+    print("\nStage latency (ms)       count      p50      p95      p99")
+    for stage, s in report['stages_ms'].items():
+        if 'p50' in s:
+            print(f"  {stage:<20} {s['count']:>8} {s['p50']:>8.2f} {s['p95']:>8.2f} {s['p99']:>8.2f}")
+    if report['memory']:
+        m = report['memory']
+        drift = f"{m['rss_drift_mb_per_hour']:+.1f} MiB/h" if m['rss_drift_mb_per_hour'] is not None else "n/a (run longer)"
+        print(f"\nSoak duration:     {m['duration_s']:.0f} s")
+        print(f"RSS:               {m['rss_start_mb']:.1f} -> {m['rss_end_mb']:.1f} MiB (max {m['rss_max_mb']:.1f}), drift {drift}")
+        print(f"Allocated/frame:   {m['transient_kib_per_frame_p50']:.1f} KiB p50, {m['transient_kib_per_frame_p95']:.1f} KiB p95, "
+              f"{m['retained_kib_per_frame_mean']:.2f} KiB retained ({m['traced_frames']} frames traced)")
+    if report['accuracy']:
+        a = report['accuracy']
+        accuracy = f"{a['accuracy'] * 100:.1f}%" if a['accuracy'] is not None else "n/a"
+        print(f"\nAccuracy:          {accuracy} ({a['correct']}/{a['decisions'] - a['without_ground_truth']} decisions)")
+        print(f"False accepts:     {a['false_accepts']}")
+        print(f"False rejects:     {a['false_rejects']}")
+        print(f"People recognized: {a['people_recognized']}/{a['people_expected']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded video through the Raqeeb recognition pipeline.")
+    parser.add_argument('source', help="Video file, folder of images, or a glob pattern such as 'frames/*.jpg'.")
+    parser.add_argument('--ground-truth', help="CSV file with frame,name rows for accuracy scoring.")
+    parser.add_argument('--faces-dir', default=DB_PATH, help="Folder of known faces (default: %(default)s).")
+    parser.add_argument('--shape-predictor', default=SHAPE_PREDICTOR_PATH)
+    parser.add_argument('--fps', type=float, default=30.0, help="Frame rate assumed for image sequences.")
+    parser.add_argument('--max-frames', type=int)
+    parser.add_argument('--detector-backend', default='mtcnn')
+    parser.add_argument('--process-interval', type=int, default=1)
+    parser.add_argument('--ear-threshold', type=float, default=0.25)
+    parser.add_argument('--confidence-threshold', type=float, default=0.4)
+    parser.add_argument('--target-latency-ms', type=int, default=150)
+    parser.add_argument('--no-adaptive', action='store_true', help="Use the fixed frame interval instead of the adaptive scheduler.")
+    parser.add_argument('--no-motion-gate', action='store_true')
+    parser.add_argument('--soak', type=float, metavar='SECONDS',
+                        help="Loop the source for this long and report memory drift and per-frame allocations.")
+    parser.add_argument('--json', help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    report = run_benchmark(
+        args.source, faces_dir=args.faces_dir, shape_predictor_path=args.shape_predictor,
+        ground_truth=args.ground_truth, fps=args.fps, max_frames=args.max_frames, soak_seconds=args.soak,
+        detector_backend=args.detector_backend, process_frame_interval=args.process_interval,
+        ear_threshold=args.ear_threshold, confidence_threshold=args.confidence_threshold,
+        target_latency=args.target_latency_ms / 1000.0, adaptive_scheduling=not args.no_adaptive,
+        motion_gate_enabled=not args.no_motion_gate)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
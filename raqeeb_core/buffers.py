@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Reusable frame buffers (مخازن إطارات قابلة لإعادة الاستخدام).
+
+A 24/7 camera loop that allocates a few full-size arrays per frame keeps the allocator busy
+and lets the process footprint creep up. Frames are instead decoded and copied into a small,
+fixed set of buffers that are handed between threads and returned when done.
+"""
+
+import threading
+
+import numpy as np
+
+
+class FramePool:
+    """
+    A fixed number of reusable arrays shared between threads.
+    (مجمع مخازن الإطارات)
+
+    `acquire(shape, refs)` returns a free buffer of that shape, held by `refs` holders, or None
+    when every buffer is still held, so the caller skips the work instead of allocating more.
+    Each holder calls `release(buffer)`. Releasing an array the pool does not own is a no-op.
+    """
+    def __init__(self, size=3, dtype=np.uint8):
+        self.size = size
+        self.dtype = dtype
+        self.allocations = 0
+        self._lock = threading.Lock()
+        self._entries = []  # [array, refs]
+
+    def acquire(self, shape, refs=1):
+        shape = tuple(shape)
+        with self._lock:
+            spare = None
+            for entry in self._entries:
+                if entry[1] == 0:
+                    if entry[0].shape == shape:
+                        entry[1] = refs
+                        return entry[0]
+                    spare = entry
+            if len(self._entries) < self.size:
+                entry = [None, 0]
+                self._entries.append(entry)
+            elif spare is not None:
+                entry = spare  # The resolution changed; replace a free buffer of the old size
+            else:
+                return None
+            entry[0] = np.empty(shape, dtype=self.dtype)
+            entry[1] = refs
+            self.allocations += 1
+            return entry[0]
+
+    def adopt(self, array, refs=1):
+        """Takes an array allocated elsewhere (e.g. the first decoded frame) into the pool, if there is room."""
+        with self._lock:
+            if len(self._entries) >= self.size:
+                return False
+            self._entries.append([array, refs])
+            self.allocations += 1
+            return True
+
+    def release(self, buffer):
+        with self._lock:
+            for entry in self._entries:
+                if entry[0] is buffer:
+                    entry[1] = max(0, entry[1] - 1)
+                    return
+
+    def in_use(self):
+        with self._lock:
+            return sum(1 for _, refs in self._entries if refs)
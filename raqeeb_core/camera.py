@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Camera capture with a dedicated grab thread (التقاط الفيديو من الكاميرا).
+
+USB cameras queue frames in the driver; a loop that reads, then spends 100 ms on recognition,
+then reads again gets frames that are already old. The grab thread keeps draining the camera
+with grab() and only decodes (retrieve()) when the consumer is waiting, so the frame handed
+out is always the newest one and frames that would be dropped are never decoded. Frames are
+decoded into a small FramePool, so the steady state allocates no new frame arrays.
+"""
+
+import logging
+import threading
+import time
+
+import cv2
+
+from .buffers import FramePool
+
+FOURCC_OPTIONS = ('auto', 'MJPG', 'YUYV', 'H264')
+
+STATE_CONNECTED = 'connected'
+STATE_RECONNECTING = 'reconnecting'
+
+
+class CameraStream:
+    """
+    Newest-frame camera reader with automatic reconnection.
+    (قارئ الكاميرا: أحدث إطار فقط مع إعادة الاتصال التلقائي)
+
+    width/height/fps of 0 and an empty fourcc keep the driver defaults. When reads fail
+    `max_failures` times in a row the camera is released and reopened with exponential backoff
+    (`initial_backoff` doubling up to `max_backoff` seconds). `on_state(state)` reports
+    STATE_RECONNECTING / STATE_CONNECTED from the grab thread.
+
+    A frame returned by `read()` is a pooled buffer: it stays valid until the next `read()`.
+    Callers that keep it longer must copy it.
+    """
+    def __init__(self, source, width=0, height=0, fps=0, fourcc='', buffer_size=1,
+                 initial_backoff=0.5, max_backoff=10.0, max_failures=5, on_state=None):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc if fourcc != 'auto' else ''
+        self.buffer_size = buffer_size
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+        self.on_state = on_state or (lambda state: None)
+        self.actual = {}
+        self.grabbed = 0
+        self.dropped = 0      # Grabbed but never decoded because the consumer was busy
+        self.reconnects = 0
+        self._capture = None
+        self._pool = FramePool(size=3)
+        self._shape = None
+        self._held = None  # Frame returned by the last read(), released on the next one
+        self._cond = threading.Condition()
+        self._frame = None
+        self._grabbed_at = None
+        self._seq = 0
+        self._read_seq = 0
+        self._wanted = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self):
+        """Opens and configures the camera. Returns False if it cannot be opened."""
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            capture.release()
+            return False
+        self._configure(capture)
+        self._capture = capture
+        return True
+
+    def _configure(self, capture):
+        # FOURCC first: some drivers only offer high resolutions/frame rates in MJPG
+        if self.fourcc:
+            capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.fourcc))
+        if self.width:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if self.fps:
+            capture.set(cv2.CAP_PROP_FPS, self.fps)
+        if self.buffer_size and not capture.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size):
+            logging.info("Camera backend does not support CAP_PROP_BUFFERSIZE; relying on the grab thread to drop stale frames.")
+        fourcc = int(capture.get(cv2.CAP_PROP_FOURCC))
+        self.actual = {
+            'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': round(capture.get(cv2.CAP_PROP_FPS), 1),
+            'fourcc': ''.join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip('\x00') if fourcc > 0 else '',
+        }
+        logging.info(f"Camera {self.source} configured: {self.actual}")
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError(f"Camera {self.source} is already running.")  # Possibly a stop() that timed out
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="raqeeb-camera", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """
+        Stops the grab thread and releases the camera. Once started, the capture belongs to the
+        grab thread: if it is stuck in a driver call for longer than `timeout`, it releases the
+        capture itself when the call returns, never while the call is still using it.
+        """
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logging.warning("Camera %s did not stop within %.1f s; it is released when the driver returns.",
+                                self.source, timeout)
+                return
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def read(self, timeout=1.0):
+        """
+        Returns (frame, grabbed_at) for a frame newer than the previous read, or (None, None)
+        on timeout (e.g. while reconnecting). `grabbed_at` is the wall-clock time of the grab.
+        """
+        if self._held is not None:
+            self._pool.release(self._held)
+            self._held = None
+        self._wanted.set()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq != self._read_seq or self._stop.is_set(), timeout):
+                return None, None
+            if self._stop.is_set():
+                return None, None
+            self._read_seq = self._seq
+            self._held = self._frame
+            return self._frame, self._grabbed_at
+
+    def _retrieve(self):
+        """Decodes the grabbed frame into a free pool buffer."""
+        buffer = self._pool.acquire(self._shape) if self._shape is not None else None
+        ok, frame = self._capture.retrieve(buffer)
+        if frame is not buffer:
+            # First frame, a new resolution, or a backend that always allocates
+            if buffer is not None:
+                self._pool.release(buffer)
+            if ok:
+                self._pool.adopt(frame)
+        if ok:
+            self._shape = frame.shape
+        elif buffer is not None and frame is buffer:
+            self._pool.release(buffer)
+        return ok, frame
+
+    def _run(self):
+        failures = 0
+        backoff = self.initial_backoff
+        try:
+            while not self._stop.is_set():
+                if self._capture is None:
+                    if self._stop.wait(backoff):
+                        break
+                    if self.open():
+                        self.reconnects += 1
+                        failures, backoff = 0, self.initial_backoff
+                        logging.info(f"Camera {self.source} reconnected.")
+                        self.on_state(STATE_CONNECTED)
+                    else:
+                        backoff = min(backoff * 2, self.max_backoff)
+                        logging.warning("Camera %s still unavailable, retrying in %.1f s.", self.source, backoff)
+                    continue
+
+                ok = self._capture.grab()
+                grabbed_at = time.time()
+                if ok and self._wanted.is_set():
+                    ok, frame = self._retrieve()
+                    if ok:
+                        self._wanted.clear()
+                        with self._cond:
+                            if self._seq != self._read_seq:
+                                self._pool.release(self._frame)  # Published but never read
+                            self._frame, self._grabbed_at = frame, grabbed_at
+                            self._seq += 1
+                            self._cond.notify_all()
+                elif ok:
+                    self.dropped += 1
+                if ok:
+                    self.grabbed += 1
+                    failures = 0
+                    continue
+
+                failures += 1
+                if failures >= self.max_failures:
+                    logging.warning("Camera %s stopped delivering frames; reconnecting.", self.source)
+                    self._capture.release()
+                    self._capture = None
+                    self.on_state(STATE_RECONNECTING)
+                else:
+                    self._stop.wait(0.05)
+        finally:
+            if self._capture is not None:
+                self._capture.release()
+                self._capture = None
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Thin display client for an engine on another machine (عميل شاشة العرض عن بُعد).
+
+A door display needs neither the camera, dlib nor TensorFlow: it connects to an engine that
+serves the HTTP API (python -m raqeeb_core --api-port 8765 --api-host 0.0.0.0 on the server) and
+shows the annotated video from /api/stream, the status text and check-ins from /api/events, and
+today's attendance from /api/attendance. RemoteEngine offers the part of RaqeebEngine's interface
+the main window uses, so Raqeeb.py --connect runs the same window against it.
+
+Both streams reconnect on their own with a growing delay while the server is unreachable.
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, datetime
+from urllib.parse import urlencode
+
+import cv2
+import numpy as np
+
+from .metrics import PerformanceMonitor
+from .settings import Settings
+
+STREAM_EVENTS = ('status', 'check_in')
+READ_TIMEOUT = 30.0  # Longer than the server's 15 s heartbeat, so only a dead connection times out
+
+
+class RemoteEngine:
+    """
+    Stands in for RaqeebEngine on a display that shows a remote engine's camera.
+    (بديل المحرك لشاشة تعرض كاميرا محرك على جهاز آخر)
+
+    Subscribers receive the same event dicts as from the engine ('frame', 'status', 'check_in'),
+    plus {'type': 'attendance', 'rows': [(name, 'HH:MM:SS')]} with today's attendance each time
+    the event stream (re)connects. Frames are fresh arrays; release_frame() is a no-op.
+    """
+    def __init__(self, base_url, token='', initial_backoff=1.0, max_backoff=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.settings = Settings({})  # The display's own defaults; the engine's settings stay on the server
+        self.monitor = PerformanceMonitor()
+        self.is_running = False
+        self._subscribers = []
+        self._threads = []
+        self._known_rows = set()  # Rows of the last attendance load, so replayed check-ins are not shown twice
+
+    # --- Lifecycle (دورة التشغيل) ---
+    def load_models(self):
+        """Nothing to load on a display."""
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._threads = [threading.Thread(target=self._keep_reading, args=(self._read_events, 'events'),
+                                          name="raqeeb-client-events", daemon=True),
+                         threading.Thread(target=self._keep_reading, args=(self._read_frames, 'stream'),
+                                          name="raqeeb-client-frames", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self, timeout=0.5):
+        """
+        Stops reading. The readers notice after their next frame or server heartbeat (a response
+        cannot be closed under a thread blocked reading it); they are daemon threads, so waiting
+        for them is not needed to exit.
+        """
+        self.is_running = False
+        for thread in self._threads:
+            thread.join(timeout)
+
+    # --- Events (الأحداث) ---
+    def subscribe(self, callback, frames=False):
+        self._subscribers.append((callback, frames))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, frames) for cb, frames in self._subscribers if cb != callback]
+
+    def emit(self, event):
+        is_frame = event['type'] == 'frame'
+        for callback, wants_frames in list(self._subscribers):
+            if is_frame and not wants_frames:
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                logging.error("Client subscriber failed on '%s' event: %s", event['type'], e)
+
+    def release_frame(self, frame):
+        pass
+
+    # --- HTTP ---
+    def _open(self, path, params=None, timeout=READ_TIMEOUT):
+        url = self.base_url + path + ('?' + urlencode(params) if params else '')
+        request = urllib.request.Request(url, headers={'Authorization': f"Bearer {self.token}"} if self.token else {})
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def todays_attendance(self):
+        """Returns today's (name, 'HH:MM:SS') rows from the server, oldest first."""
+        rows, after_id = [], 0
+        while after_id is not None:
+            with self._open('/api/attendance', {'date': date.today().isoformat(), 'after_id': after_id, 'limit': 1000}) as response:
+                page = json.load(response)
+            rows.extend((item['name'], str(item['timestamp'])[11:19]) for item in page['items'])
+            after_id = page['next_after_id']
+        return rows
+
+    def _keep_reading(self, read, what):
+        backoff = self.initial_backoff
+        while self.is_running:
+            started = time.monotonic()
+            try:
+                read()
+            except (OSError, ValueError) as e:
+                if not self.is_running:
+                    break
+                if isinstance(e, urllib.error.HTTPError) and e.code == 401:
+                    logging.error(f"The server at {self.base_url} rejected the API token.")
+                else:
+                    logging.warning("Lost the %s connection to %s: %s", what, self.base_url, e)
+                if what == 'events':
+                    self.emit({'type': 'status', 'key': 'status_server_unreachable', 'args': (self.base_url,)})
+            if not self.is_running:
+                break
+            if time.monotonic() - started > self.max_backoff:
+                backoff = self.initial_backoff  # It was connected for a while; retry quickly
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _read_events(self):
+        with self._open('/api/events', {'types': ','.join(STREAM_EVENTS)}) as response:
+            # Subscribed first, then loaded: nothing that happens in between is missed
+            rows = self.todays_attendance()
+            self._known_rows = set(rows)
+            self.emit({'type': 'attendance', 'rows': rows})
+            event_type, data = None, []
+            for raw in response:
+                if not self.is_running:
+                    return
+                line = raw.decode('utf-8').rstrip('\r\n')
+                if line:
+                    field, _, value = line.partition(':')
+                    value = value[1:] if value.startswith(' ') else value
+                    if field == 'event':
+                        event_type = value
+                    elif field == 'data':
+                        data.append(value)
+                    continue
+                if event_type and data:
+                    self._dispatch(event_type, json.loads('\n'.join(data)))
+                event_type, data = None, []
+            raise ConnectionError("the server closed the event stream")
+
+    def _dispatch(self, event_type, payload):
+        if event_type == 'status':
+            self.emit({'type': 'status', 'key': payload['key'], 'args': tuple(payload['args'])})
+        elif event_type == 'check_in':
+            timestamp = datetime.fromisoformat(payload['timestamp'])
+            row = (payload['name'], timestamp.strftime('%H:%M:%S'))
+            if row in self._known_rows:
+                return
+            self.emit({'type': 'check_in', 'name': payload['name'], 'timestamp': timestamp,
+                       'distance': payload.get('distance'), 'liveness': payload.get('liveness')})
+
+    def _read_frames(self):
+        with self._open('/api/stream') as response:
+            while self.is_running:
+                line = response.readline()
+                if not line:
+                    raise ConnectionError("the server closed the video stream")
+                if not line.startswith(b'--'):
+                    continue
+                headers = {}
+                while True:
+                    line = response.readline().strip()
+                    if not line:
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if not length:
+                    continue
+                jpeg = response.read(length)
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame is not None:
+                    self.monitor.tick('captured')
+                    self.emit({'type': 'frame', 'frame': frame, 'timestamp': float(headers.get('x-timestamp', time.time()))})
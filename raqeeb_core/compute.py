@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+CPU thread budget for the native libraries (توزيع موارد المعالج).
+
+TensorFlow, OpenCV and the enrolment process pool each size their thread pools on their own,
+which on a kiosk either leaves most cores idle or has them fighting over the same cores. A
+ThreadPlan decides the split once at startup: TensorFlow's intra-/inter-op pools for the
+embedding model, OpenCV's pool for the small per-frame operations, and the number of enrolment
+worker processes. Live embeddings run on a background thread, so the camera loop (dlib
+detection, landmarks) keeps a core to itself while TensorFlow works.
+
+Usage:
+    python -m raqeeb_core.compute              # show the plan for this machine and the settings
+    python -m raqeeb_core.compute --calibrate  # time candidate thread counts and save the fastest
+
+Calibration only tunes TensorFlow's intra-op pool (the threads a single embedding is split
+across) and OpenCV's pool. The inter-op pool barely matters for one model called one face at a
+time, so it and the number of enrolment workers keep their settings. Calibration starts a fresh
+process for each TensorFlow candidate, because TensorFlow only reads its thread counts once.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import cv2
+import numpy as np
+
+from .constants import DATABASE_FILE, MODEL_NAME
+
+# Candidates within this share of the fastest count as equally fast; the one with fewer threads wins
+CALIBRATION_TOLERANCE = 0.1
+# ThreadPlan attribute -> setting key, for every setting a plan covers
+PLAN_SETTINGS = {'tf_intra_op': 'tf_intra_op_threads', 'tf_inter_op': 'tf_inter_op_threads',
+                 'opencv': 'opencv_threads', 'enrol_workers': 'enrol_workers',
+                 'background_recognition': 'background_recognition'}
+# The plan attributes calibration measures; the rest are left as configured
+CALIBRATED = ('tf_intra_op', 'opencv')
+
+
+class ThreadPlan:
+    """Thread counts per stage. 0 in a setting means 'pick for this machine'."""
+    def __init__(self, tf_intra_op, tf_inter_op, opencv, enrol_workers, background_recognition=True):
+        self.tf_intra_op = tf_intra_op
+        self.tf_inter_op = tf_inter_op
+        self.opencv = opencv
+        self.enrol_workers = enrol_workers
+        self.background_recognition = background_recognition
+
+    @classmethod
+    def for_cpus(cls, cpus=None):
+        cpus = cpus or os.cpu_count() or 2
+        # One core for the camera loop and one for the grab thread and the UI; the rest go to the model
+        return cls(tf_intra_op=max(1, cpus - 2), tf_inter_op=min(2, cpus), opencv=min(2, cpus),
+                   enrol_workers=max(1, cpus - 1))
+
+    @classmethod
+    def from_settings(cls, settings, cpus=None):
+        auto = cls.for_cpus(cpus)
+        return cls(tf_intra_op=settings.TF_INTRA_OP_THREADS or auto.tf_intra_op,
+                   tf_inter_op=settings.TF_INTER_OP_THREADS or auto.tf_inter_op,
+                   opencv=settings.OPENCV_THREADS or auto.opencv,
+                   enrol_workers=settings.ENROL_WORKERS or auto.enrol_workers,
+                   background_recognition=settings.BACKGROUND_RECOGNITION)
+
+    def to_settings(self, attributes=None):
+        """Returns {setting key: stored value} for `attributes` (default: all of them), as SettingsRegistry.update takes."""
+        return {PLAN_SETTINGS[name]: str(int(getattr(self, name))) for name in (attributes or PLAN_SETTINGS)}
+
+    def __repr__(self):
+        return (f"ThreadPlan(tf_intra_op={self.tf_intra_op}, tf_inter_op={self.tf_inter_op}, opencv={self.opencv}, "
+                f"enrol_workers={self.enrol_workers}, background_recognition={self.background_recognition})")
+
+
+def configure_tensorflow(intra_op, inter_op):
+    """
+    Sets TensorFlow's thread pools. Before TensorFlow is imported the environment variables it reads
+    at startup are enough; once it is running the counts can no longer change and a warning is logged.
+    """
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(intra_op)
+    os.environ['TF_NUM_INTEROP_THREADS'] = str(inter_op)
+    os.environ.setdefault('OMP_NUM_THREADS', str(intra_op))  # oneDNN kernels
+    tf = sys.modules.get('tensorflow')
+    if tf is None:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError:
+        logging.warning("TensorFlow is already running; its thread counts take effect after a restart.")
+
+
+def apply_thread_plan(plan):
+    """Applies `plan` to OpenCV (effective immediately) and TensorFlow (see configure_tensorflow)."""
+    cv2.setNumThreads(plan.opencv)
+    configure_tensorflow(plan.tf_intra_op, plan.tf_inter_op)
+    logging.info(f"Compute resources: {plan}")
+
+
+# --- Calibration (المعايرة) ---
+def _time_embedding(model_name, intra_op, inter_op, runs):
+    """Runs in a fresh process: median seconds for one embedding with the given TensorFlow thread counts."""
+    configure_tensorflow(intra_op, inter_op)
+    from deepface import DeepFace
+    from .recognition import embed_batch
+    model = DeepFace.build_model(model_name)
+    face = np.random.default_rng(0).random((*model.input_shape[:2], 3), dtype=np.float32)
+    embed_batch(model, [face])  # The first call builds the graph
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        embed_batch(model, [face])
+        times.append(time.perf_counter() - started)
+    return float(np.median(times))
+
+
+def _time_opencv(threads, runs, size=(720, 1280)):
+    """Median seconds for the camera loop's per-frame OpenCV work at `threads` threads."""
+    cv2.setNumThreads(threads)
+    frame = np.random.default_rng(0).integers(0, 255, (*size, 3), dtype=np.uint8)
+    gray = np.empty(size, dtype=np.uint8)
+    display = np.empty_like(frame)
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        small = cv2.resize(gray, (320, 180), interpolation=cv2.INTER_AREA)
+        cv2.GaussianBlur(small, (21, 21), 0)
+        np.copyto(display, frame)
+        cv2.cvtColor(display, cv2.COLOR_BGR2RGBA)
+        times.append(time.perf_counter() - started)
+    return float(np.median(times))
+
+
+def fastest(timings, tolerance=CALIBRATION_TOLERANCE):
+    """Picks the smallest thread count in {threads: seconds} whose time is within `tolerance` of the best."""
+    best = min(timings.values())
+    return min(count for count, seconds in timings.items() if seconds <= best * (1 + tolerance))
+
+
+def candidate_thread_counts(cpus):
+    return sorted({1, 2, max(1, cpus // 2), max(1, cpus - 2), cpus})
+
+
+def calibrated_plan(base, timings):
+    """
+    Returns a copy of `base` with every CALIBRATED attribute set to the fastest count in
+    `timings` ({attribute: {threads: seconds}}); attributes without timings are kept.
+    """
+    plan = ThreadPlan(base.tf_intra_op, base.tf_inter_op, base.opencv, base.enrol_workers, base.background_recognition)
+    for name in CALIBRATED:
+        if timings.get(name):
+            setattr(plan, name, fastest(timings[name]))
+    return plan
+
+
+def calibrate(model_name=MODEL_NAME, cpus=None, runs=20, progress=None, base=None):
+    """
+    Times the embedding model for several TensorFlow intra-op thread counts (each in its own
+    process) and OpenCV's per-frame work for several pool sizes, and returns
+    (ThreadPlan, {'tf_intra_op': {threads: seconds}, 'opencv': {threads: seconds}}).
+    The plan is `base` (default: the automatic plan) with only those two counts replaced.
+    `progress(stage, threads, seconds)` is called after each measurement.
+    """
+    cpus = cpus or os.cpu_count() or 2
+    base = base or ThreadPlan.for_cpus(cpus)
+    timings = {'tf_intra_op': {}, 'opencv': {}}
+    # Leave the camera loop's core alone while measuring, as it will be when running
+    for threads in [count for count in candidate_thread_counts(cpus) if count <= max(1, cpus - 1)]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            seconds = executor.submit(_time_embedding, model_name, threads, base.tf_inter_op, runs).result()
+        timings['tf_intra_op'][threads] = seconds
+        if progress:
+            progress('tf_intra_op', threads, seconds)
+    for threads in candidate_thread_counts(cpus):
+        seconds = _time_opencv(threads, runs * 5)
+        timings['opencv'][threads] = seconds
+        if progress:
+            progress('opencv', threads, seconds)
+    cv2.setNumThreads(base.opencv)
+    return calibrated_plan(base, timings), timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show or calibrate how Raqeeb divides the CPU between its native libraries.")
+    parser.add_argument('--database', default=DATABASE_FILE, help="SQLite database file (default: %(default)s).")
+    parser.add_argument('--calibrate', action='store_true', help="Measure TensorFlow intra-op and OpenCV thread counts and save the fastest to the settings.")
+    parser.add_argument('--dry-run', action='store_true', help="With --calibrate, print the result without saving it.")
+    parser.add_argument('--runs', type=int, default=20, help="Timed runs per candidate (default: %(default)s).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    from .settings import SettingsRegistry
+    from .store import AttendanceStore
+    store = AttendanceStore(args.database)
+    try:
+        registry = SettingsRegistry(store)
+        print(f"CPUs: {os.cpu_count()}")
+        current = ThreadPlan.from_settings(registry.current)
+        print(f"Current plan: {current}")
+        if not args.calibrate:
+            return 0
+
+        def report(stage, threads, seconds):
+            print(f"  {stage:<12} {threads:>3} threads  {seconds * 1000:8.2f} ms")
+
+        try:
+            plan, _ = calibrate(MODEL_NAME, runs=args.runs, progress=report, base=current)
+        except Exception as e:
+            print(f"Calibration failed: {e}", file=sys.stderr)
+            return 1
+        print(f"Calibrated plan: {plan}")
+        if not args.dry_run:
+            registry.update(plan.to_settings(CALIBRATED))  # Not the inter-op or enrolment counts someone may have set
+            print("Saved. Restart Raqeeb for the TensorFlow thread counts to take effect.")
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Shared constants (الثوابت المشتركة).
+"""
+
+DB_PATH = 'known_faces'
+UNKNOWN_PATH = 'unknown_visitors'
+MODEL_NAME = "ArcFace"  # Recommended model for high accuracy
+DATABASE_FILE = 'attendance_system.db'
+SHAPE_PREDICTOR_PATH = 'shape_predictor_68_face_landmarks.dat' # dlib model for facial landmarks
+RECOGNITION_COOLDOWN = 5  # Seconds between two recognition attempts
@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+The recognition engine: camera loop, recognizer, attendance store, alerting and settings,
+with no GUI dependencies. It runs headless (see raqeeb_core.service) or with the Tk app
+attached as a client through `subscribe()`.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .alerts import Alerter
+from .backup import BackupScheduler
+from .buffers import FramePool
+from .camera import CameraStream, STATE_RECONNECTING
+from .compute import ThreadPlan, apply_thread_plan
+from .constants import DB_PATH, UNKNOWN_PATH, MODEL_NAME, DATABASE_FILE, SHAPE_PREDICTOR_PATH
+from .enrol import EnrolmentSession
+from .face_index import FaceIndex, index_path_for
+from .logs import log_context
+from .metrics import PerformanceMonitor
+from .pipeline import RecognitionPipeline, draw_annotations, load_dlib_models
+from .settings import SettingsRegistry
+from .store import AttendanceStore
+
+
+# Settings the camera loop applies between frames
+CAMERA_KEYS = frozenset({'camera_index', 'camera_width', 'camera_height', 'camera_fps', 'camera_fourcc', 'camera_buffer_size'})
+PIPELINE_KEYS = frozenset({'ear_threshold', 'confidence_threshold', 'process_frame_interval', 'adaptive_scheduling',
+                           'target_latency_ms', 'motion_gate_enabled', 'motion_cooldown', 'background_recognition'})
+METRICS_KEYS = frozenset({'metrics_export_path', 'metrics_export_interval'})
+BACKUP_KEYS = frozenset({'backup_enabled', 'backup_dir', 'backup_interval_hours', 'backup_keep_last', 'backup_keep_daily',
+                         'backup_compress', 'maintenance_interval_hours', 'maintenance_idle_minutes'})
+TENSORFLOW_KEYS = frozenset({'tf_intra_op_threads', 'tf_inter_op_threads'})
+INDEX_PROGRESS_INTERVAL = 0.25  # Seconds between index_progress events
+
+
+class RaqeebEngine:
+    """
+    GUI-independent core of the attendance & security system.
+    (المحرك الأساسي للنظام، مستقل عن واجهة المستخدم)
+
+    Subscribers receive event dicts on the engine thread and must not block:
+        {'type': 'status', 'key': ..., 'args': (...)}       user-facing status changes
+        {'type': 'check_in', 'name': ..., 'timestamp': ...}  attendance newly marked
+        {'type': 'recognized', 'name': ..., ...}             already marked today
+        {'type': 'unknown', 'image_path': ..., 'box': ..., 'during_enrolment': bool, ...}
+                                                             unknown visitor; no image or alert for
+                                                             the person being enrolled
+        {'type': 'error', 'key': ..., 'args': (...)}         e.g. the camera could not be opened
+        {'type': 'settings', 'changed': frozenset, 'version': n}  settings were changed
+        {'type': 'backup', 'path': ..., 'error': ..., 'manual': bool}  a backup finished or failed
+        {'type': 'index_progress', 'done': n, 'total': n}    photos embedded by a background index update
+        {'type': 'index_ready', 'stats': {...} or None}      the update finished (None: it failed)
+        {'type': 'frame', 'frame': ..., 'timestamp': ...}    annotated frame (frame subscribers only)
+
+    Frame events carry a pooled display copy: each frame subscriber must call
+    `release_frame(frame)` once it has drawn (or dropped) it, or no further frames are rendered.
+    """
+    def __init__(self, database_file=DATABASE_FILE, faces_dir=DB_PATH, unknown_dir=UNKNOWN_PATH,
+                 shape_predictor_path=SHAPE_PREDICTOR_PATH):
+        self.faces_dir = faces_dir
+        self.unknown_dir = unknown_dir
+        self.shape_predictor_path = shape_predictor_path
+        os.makedirs(faces_dir, exist_ok=True)
+        os.makedirs(unknown_dir, exist_ok=True)
+
+        self.store = AttendanceStore(database_file)
+        self.settings_registry = SettingsRegistry(self.store)
+        self.monitor = PerformanceMonitor(export_path=self.settings.METRICS_EXPORT_PATH,
+                                          export_interval=self.settings.METRICS_EXPORT_INTERVAL)
+        self.alerter = Alerter(lambda: self.settings, unknown_dir, on_status=self._emit_status)
+        self.backups = BackupScheduler(self.store, lambda: self.settings, is_idle=self._is_idle, on_event=self.emit)
+        self._last_activity = time.time()  # Last time a face was seen; maintenance waits for a quiet spell
+
+        self.face_detector = None
+        self.landmark_predictor = None
+        self.recognizer = None
+        self.is_running = False
+        self._thread = None
+        self._subscribers = []  # (callback, wants_frames)
+        self._display_pool = FramePool(size=3)  # Annotated copies handed to frame subscribers
+        self._last_status = None
+        self._enrolments = []   # Active EnrolmentSessions fed from the camera loop
+        self._enrolments_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._pending_settings = set()  # Changed keys the camera loop still has to apply
+        self._pending_lock = threading.Lock()
+        registry = self.settings_registry
+        registry.subscribe(self._on_metrics_settings, keys=METRICS_KEYS)
+        registry.subscribe(self._on_detector_settings, keys={'detector_backend'})
+        registry.subscribe(self._on_loop_settings, keys=CAMERA_KEYS | PIPELINE_KEYS)
+        registry.subscribe(lambda settings, changed: self.backups.wake(), keys=BACKUP_KEYS)
+        registry.subscribe(self._on_compute_settings, keys=TENSORFLOW_KEYS | {'opencv_threads'})
+        registry.subscribe(lambda settings, changed: self.emit(
+            {'type': 'settings', 'changed': changed, 'version': settings.version}))
+
+    # --- Lifecycle (دورة التشغيل) ---
+    def load_models(self):
+        """Loads dlib and the embedding model. Raises FileNotFoundError if the shape predictor is missing."""
+        if not os.path.exists(self.shape_predictor_path):
+            raise FileNotFoundError(f"Shape predictor file not found: '{self.shape_predictor_path}'")
+        # Before TensorFlow is imported, which is when it sizes its thread pools
+        apply_thread_plan(ThreadPlan.from_settings(self.settings))
+        from .recognition import DeepFaceRecognizer  # Imported here: pulls in TensorFlow
+        self.face_detector, self.landmark_predictor = load_dlib_models(self.shape_predictor_path)
+        self.recognizer = DeepFaceRecognizer(faces_dir=self.faces_dir, model_name=MODEL_NAME,
+                                             detector_backend=self.settings.DETECTOR_BACKEND)
+        self.recognizer.build_model()
+        # Photos added to the faces folder while the app was closed are embedded in the background;
+        # recognition starts right away with the faces already in the index
+        self.refresh_face_index_in_background()
+
+    def start(self):
+        """Starts the camera/recognition loop, and the backup scheduler, in background threads."""
+        self.backups.start()
+        if self._thread is not None and self._thread.is_alive():
+            logging.warning("Processing thread is already running.")
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self.run, name="raqeeb-engine", daemon=True)
+        self._thread.start()
+        logging.info("Video processing thread started.")
+
+    def stop(self, timeout=2.0):
+        """Stops the loop and waits for the camera to be released."""
+        self.is_running = False
+        if self._thread is not None and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def close(self):
+        self.stop()
+        self.backups.stop()
+        self.store.close()
+        logging.info("Database connection closed.")
+
+    # --- Events (الأحداث) ---
+    def subscribe(self, callback, frames=False):
+        """Registers `callback(event)`. Frame events are only delivered when `frames` is True."""
+        self._subscribers.append((callback, frames))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, frames) for cb, frames in self._subscribers if cb != callback]
+
+    def emit(self, event):
+        """Sends a non-frame event to every subscriber."""
+        for callback, _ in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                logging.error("Engine subscriber failed on '%s' event: %s", event['type'], e)
+
+    def _emit_frame(self, event, callbacks):
+        # `callbacks` is the snapshot the frame's references were counted from, so a subscriber
+        # leaving meanwhile still gets (and releases) this last frame
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                logging.error("Engine subscriber failed on 'frame' event: %s", e)
+                self.release_frame(event['frame'])  # It will never release its reference
+
+    def _emit_status(self, key, *args):
+        if (key, args) == self._last_status:
+            return
+        self._last_status = (key, args)
+        self.emit({'type': 'status', 'key': key, 'args': args})
+
+    def _is_idle(self):
+        return not self.is_running or time.time() - self._last_activity >= self.settings.MAINTENANCE_IDLE_MINUTES * 60
+
+    def _frame_subscribers(self):
+        return [callback for callback, frames in self._subscribers if frames]
+
+    @property
+    def status(self):
+        """The last status sent, as (translation_key, args), or None."""
+        return self._last_status
+
+    def release_frame(self, frame):
+        """Returns a frame received in a 'frame' event to the pool (any thread)."""
+        self._display_pool.release(frame)
+
+    # --- Settings & employees (الإعدادات والموظفون) ---
+    @property
+    def settings(self):
+        """The current Settings snapshot."""
+        return self.settings_registry.current
+
+    def reload_settings(self):
+        """Re-reads the settings table (e.g. after an external edit) and applies whatever changed."""
+        self.settings_registry.reload()
+        return self.settings
+
+    def save_settings(self, values):
+        """
+        Validates and saves settings, writing only the changed keys, and returns the set of changed keys.
+        Running subsystems are reconfigured in place. Raises settings.SettingsError for invalid values.
+        """
+        # Keep the numbers from before the change in the log, then start fresh so regressions show up clearly
+        snapshot = self.monitor.snapshot()
+        changed = self.settings_registry.update(values)
+        if changed:
+            logging.info(f"Performance snapshot before settings change: {snapshot}")
+            self.monitor.reset()
+            logging.info("Settings saved successfully.")
+        return changed
+
+    def _on_metrics_settings(self, settings, changed):
+        self.monitor.export_path = settings.METRICS_EXPORT_PATH
+        self.monitor.export_interval = settings.METRICS_EXPORT_INTERVAL
+
+    def _on_detector_settings(self, settings, changed):
+        # Used for the next face crop; the embedding model itself does not change
+        if self.recognizer is not None:
+            self.recognizer.detector_backend = settings.DETECTOR_BACKEND
+
+    def _on_compute_settings(self, settings, changed):
+        plan = ThreadPlan.from_settings(settings)
+        cv2.setNumThreads(plan.opencv)
+        if changed & TENSORFLOW_KEYS:
+            logging.info("TensorFlow thread counts changed; they take effect after a restart.")
+
+    def _on_loop_settings(self, settings, changed):
+        # Applied by the camera loop between frames, so the pipeline is only touched from its own thread
+        with self._pending_lock:
+            self._pending_settings |= changed
+
+    @staticmethod
+    def _pipeline_options(settings):
+        return dict(ear_threshold=settings.EAR_THRESHOLD, confidence_threshold=settings.CONFIDENCE_THRESHOLD,
+                    process_frame_interval=settings.PROCESS_FRAME_INTERVAL,
+                    adaptive_scheduling=settings.ADAPTIVE_SCHEDULING, target_latency=settings.TARGET_LATENCY_MS / 1000.0,
+                    motion_gate_enabled=settings.MOTION_GATE_ENABLED, motion_cooldown=settings.MOTION_COOLDOWN,
+                    background_recognition=settings.BACKGROUND_RECOGNITION)
+
+    def refresh_face_index(self, progress=None):
+        """Embeds new or changed photos in the faces folder so they are recognised right away."""
+        if self.recognizer is not None:
+            with self._index_lock:  # One refresh at a time; a second one finds nothing left to embed
+                return self.recognizer.refresh_index(progress=progress)
+
+    def refresh_face_index_in_background(self):
+        """
+        Runs refresh_face_index on its own thread, sending {'type': 'index_progress', 'done', 'total'}
+        events (at most a few per second) and {'type': 'index_ready', 'stats'} when it is done.
+        Recognition keeps using the current index until then.
+        """
+        last_sent = [0.0]
+
+        def progress(done, total):
+            now = time.monotonic()
+            if done == total or now - last_sent[0] >= INDEX_PROGRESS_INTERVAL:
+                last_sent[0] = now
+                self.emit({'type': 'index_progress', 'done': done, 'total': total})
+
+        def refresh():
+            try:
+                stats = self.refresh_face_index(progress=progress)
+            except Exception as e:
+                logging.error("Updating the face index failed: %s", e)
+                stats = None
+            self.emit({'type': 'index_ready', 'stats': stats})
+
+        thread = threading.Thread(target=refresh, name="raqeeb-index", daemon=True)
+        thread.start()
+        return thread
+
+    def delete_employee(self, name):
+        """Deletes an employee's records and face images."""
+        self.store.delete_employee(name)
+        employee_dir = os.path.join(self.faces_dir, name)
+        if os.path.isdir(employee_dir):
+            shutil.rmtree(employee_dir)
+            logging.info(f"Deleted image directory: {employee_dir}")
+        if self.recognizer is not None:
+            self.recognizer.remove_person(name)
+        else:
+            index_path = index_path_for(self.faces_dir, MODEL_NAME)
+            index = FaceIndex.load(index_path, MODEL_NAME)
+            index.remove_name(name)
+            index.save(index_path)
+
+    # --- Live enrolment (التسجيل من البث المباشر) ---
+    def start_enrolment(self, name):
+        """
+        Starts enrolling `name` from the running camera stream and returns the EnrolmentSession.
+        Recognition keeps running; the photos are added to the face index once captured.
+        """
+        if not self.is_running or self.face_detector is None:
+            raise RuntimeError("enrol_camera_not_running")
+        session = EnrolmentSession(name, os.path.join(self.faces_dir, name), self.face_detector,
+                                   on_saved=lambda s: self.refresh_face_index(), landmark_predictor=self.landmark_predictor)
+        with self._enrolments_lock:
+            self._enrolments = self._enrolments + [session]
+        session.start()
+        logging.info(f"Live enrolment started for {name}.")
+        return session
+
+    def _feed_enrolments(self, frame, now):
+        with self._enrolments_lock:
+            self._enrolments = [s for s in self._enrolments if not s.finished]
+            sessions = self._enrolments
+        for session in sessions:
+            session.feed(frame, now)
+
+    # --- Camera loop (حلقة الكاميرا) ---
+    def run(self):
+        """The main loop for capturing video, processing frames, and performing recognition."""
+        settings = self.settings
+        with self._pending_lock:
+            self._pending_settings.clear()  # Everything below is built from the current snapshot
+        camera = self._camera_for(settings)
+        if not camera.open():
+            logging.error(f"Could not open camera with index {settings.CAMERA_INDEX}.")
+            self.emit({'type': 'error', 'key': 'export_fail_msg',
+                       'args': (f"Could not open camera with index {settings.CAMERA_INDEX}. Check settings.",)})
+            self.is_running = False
+            return
+
+        self._last_status = None
+        self._emit_status('status_camera_ok')
+        log_context(camera=settings.CAMERA_INDEX)  # Tags every record of this thread
+        logging.info(f"Camera opened with index: {settings.CAMERA_INDEX}")
+
+        monitor = self.monitor
+        self.recognizer.detector_backend = settings.DETECTOR_BACKEND
+        pipeline = RecognitionPipeline(self.face_detector, self.landmark_predictor, self.recognizer, self.store,
+                                       monitor=monitor, **self._pipeline_options(settings))
+        camera.start()
+        try:
+            while self.is_running:
+                if self._pending_settings:
+                    camera = self._apply_pending_settings(camera, pipeline)
+                # Blocks until the grab thread has a frame newer than the last one; no polling sleeps
+                with monitor.stage('capture'):
+                    frame, grabbed_at = camera.read(timeout=1.0)
+                if frame is None:
+                    continue  # Reconnecting; the grab thread reports it through _on_camera_state
+
+                # Time the frame was grabbed, so scheduling and cooldowns follow the camera clock
+                now = grabbed_at
+                monitor.maybe_export(time.time())
+                if self._enrolments:
+                    self._feed_enrolments(frame, now)
+                result = pipeline.process(frame, now)
+                if result.face_box is not None:
+                    self._last_activity = now
+                if result.processed:
+                    monitor.record('glass_to_decision', time.time() - grabbed_at)
+                for event in result.events:
+                    self._handle_pipeline_event(event)
+                if result.status:
+                    self._emit_status(*result.status)
+
+                frame_subscribers = self._frame_subscribers()
+                if frame_subscribers and pipeline.scheduler.should_render(now):
+                    # Annotations go on a pooled copy, never on the capture buffer; None means the UI
+                    # still holds every copy, so this frame is simply not shown
+                    display = self._display_pool.acquire(frame.shape, refs=len(frame_subscribers))
+                    if display is not None:
+                        monitor.set_gauge('scheduler_mode', pipeline.scheduler.mode)
+                        monitor.set_gauge('detect_interval', pipeline.scheduler.detect_interval)
+                        monitor.set_gauge('camera_dropped', camera.dropped)
+                        monitor.set_gauge('camera_reconnects', camera.reconnects)
+                        np.copyto(display, frame)
+                        draw_annotations(display, result.annotations)
+                        if self.settings.PERF_OVERLAY:
+                            monitor.draw_overlay(display, now)
+                        self._emit_frame({'type': 'frame', 'frame': display, 'timestamp': now}, frame_subscribers)
+        finally:
+            camera.stop()
+            pipeline.close()
+            logging.info(f"Video loop stopped. Camera: {camera.actual}, grabbed {camera.grabbed}, "
+                         f"dropped {camera.dropped}, reconnects {camera.reconnects}. "
+                         f"Scheduler state: {pipeline.scheduler.summary()}")
+
+    def _camera_for(self, settings):
+        return CameraStream(settings.CAMERA_INDEX, width=settings.CAMERA_WIDTH, height=settings.CAMERA_HEIGHT,
+                            fps=settings.CAMERA_FPS, fourcc=settings.CAMERA_FOURCC,
+                            buffer_size=settings.CAMERA_BUFFER_SIZE, on_state=self._on_camera_state)
+
+    def _apply_pending_settings(self, camera, pipeline):
+        """Reconfigures the pipeline and, if a capture setting changed, reopens the camera. Returns the camera in use."""
+        with self._pending_lock:
+            changed, self._pending_settings = self._pending_settings, set()
+        settings = self.settings
+        if changed & PIPELINE_KEYS:
+            pipeline.configure(**self._pipeline_options(settings))
+            logging.info(f"Pipeline reconfigured: {', '.join(sorted(changed & PIPELINE_KEYS))}")
+        if changed & CAMERA_KEYS:
+            camera.stop()
+            camera = self._camera_for(settings)
+            log_context(camera=settings.CAMERA_INDEX)
+            if camera.open():
+                self._emit_status('status_camera_ok')
+            else:
+                # The grab thread keeps retrying with backoff, as after a disconnect
+                logging.error("Could not open camera with index %s; retrying.", settings.CAMERA_INDEX)
+                self._emit_status('status_camera_reconnecting')
+            camera.start()
+        return camera
+
+    def _on_camera_state(self, state):
+        if state == STATE_RECONNECTING:
+            self._emit_status('status_camera_reconnecting')
+        else:
+            self._emit_status('status_camera_ok')
+
+    def _handle_pipeline_event(self, event):
+        """Saves/alerts unknown visitors and forwards pipeline events to subscribers."""
+        if event['type'] == 'unknown':
+            face_crop = event.pop('face_crop')
+            sessions = self._enrolments
+            event['during_enrolment'] = bool(sessions)
+            now = event['timestamp'].timestamp()
+            if any(session.is_enrolee(event['box'], now) for session in sessions):
+                event['image_path'] = None  # The person being enrolled is not an intruder
+            else:
+                event['image_path'] = self.alerter.save_unknown_visitor(face_crop)
+        self.emit(event)
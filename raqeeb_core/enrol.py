@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk enrolment and re-indexing of the known faces folder (تسجيل الوجوه وإعادة الفهرسة).
+
+Walks known_faces/<name>/*.jpg, decodes, detects and aligns the images in a process pool,
+runs the embedding model on batches in the main process and writes the face index atomically.
+Only new or modified images are embedded; a checkpoint is saved as it goes, so an interrupted
+run resumes where it stopped.
+
+Usage:
+    python -m raqeeb_core.enrol                      # index new/changed images
+    python -m raqeeb_core.enrol --full --workers 8   # rebuild everything
+    python -m raqeeb_core.enrol --restart            # discard an interrupted run's checkpoint first
+
+Use the same --detector-backend as the live app (Settings) so enrolment and recognition align faces alike.
+
+EnrolmentSession enrols a single person from the live camera stream without stopping recognition.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from .compute import ThreadPlan, configure_tensorflow
+from .constants import DATABASE_FILE, DB_PATH, MODEL_NAME
+from .face_index import FaceIndex, index_path_for
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_CHECKPOINT_EVERY = 256
+
+# Live enrolment: one photo per pose, each the best-scoring frame seen while the pose was held
+ENROLMENT_POSES = ('enrol_look_straight', 'enrol_turn_left', 'enrol_turn_right')
+# Head yaw each pose must show: the nose offset from between the eyes in eye distances, as in
+# liveness.landmark_signals; it is positive when the person turns to their own left
+POSE_YAW = {'enrol_look_straight': (-0.1, 0.1), 'enrol_turn_left': (0.15, 0.5), 'enrol_turn_right': (-0.5, -0.15)}
+MIN_FACE_RATIO = 0.18     # Face width / frame width below which the person is asked to come closer
+IDEAL_FACE_RATIO = 0.35   # Larger faces than this don't score higher
+MIN_SHARPNESS = 60.0      # Laplacian variance of the 128x128 face crop; below this the frame is blurred
+FACE_MEMORY = 2.0         # Seconds an enrolled face's last position is used to recognise it as the enrolee
+
+
+def checkpoint_path_for(index_path):
+    return os.path.splitext(index_path)[0] + '.partial.npz'
+
+
+def scan_faces_dir(faces_dir=DB_PATH):
+    """Returns (name, relative_path, mtime) for every image in the per-employee folders."""
+    images = []
+    for name in sorted(os.listdir(faces_dir)):
+        person_dir = os.path.join(faces_dir, name)
+        if not os.path.isdir(person_dir):
+            continue
+        for filename in sorted(os.listdir(person_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                rel_path = os.path.join(name, filename)
+                images.append((name, rel_path, os.path.getmtime(os.path.join(faces_dir, rel_path))))
+    return images
+
+
+def read_image(path):
+    """cv2.imread that also works for non-ASCII (e.g. Arabic) folder names on Windows."""
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _prepare_job(job):
+    """Worker: decodes and aligns one image. Returns (face, error)."""
+    path, detector_backend, target_size = job
+    from .recognition import prepare_face  # Imported here: each worker loads DeepFace once
+    try:
+        img = read_image(path)
+        if img is None:
+            return None, "unreadable image"
+        face = prepare_face(img, detector_backend, target_size)
+        return (face, None) if face is not None else (None, "no face found")
+    except Exception as e:
+        return None, str(e)
+
+
+def build_index(faces_dir=DB_PATH, model_name=MODEL_NAME, detector_backend='mtcnn', model=None, workers=None,
+                batch_size=DEFAULT_BATCH_SIZE, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, full=False, progress=None,
+                index_path=None):
+    """
+    Brings the face index of `faces_dir` up to date and returns a stats dict.
+
+    `workers=0` prepares images in this process (e.g. a few photos from the GUI); otherwise a pool of
+    `workers` processes is used (default: all cores but one, which runs the model).
+    `progress(done, total)` is called after each image. `index_path` defaults to the index next to
+    the faces folder, the one the app uses.
+    """
+    index_path = index_path or index_path_for(faces_dir, model_name)
+    checkpoint_path = checkpoint_path_for(index_path)
+    if os.path.exists(checkpoint_path):
+        index = FaceIndex.load(checkpoint_path, model_name)
+        logging.info(f"Resuming from checkpoint {checkpoint_path} ({len(index)} faces).")
+    elif full:
+        index = FaceIndex(model_name)
+    else:
+        index = FaceIndex.load(index_path, model_name)
+
+    images = scan_faces_dir(faces_dir)
+    on_disk = {rel_path for _, rel_path, _ in images}
+    removed = [path for path in index.paths if path not in on_disk]
+    index.remove_paths(removed + [path for path in index.failed if path not in on_disk])
+    indexed_mtimes = index.mtimes_by_path()
+    # Images that failed before are only retried once they change (or with full=True)
+    known_failures = [image for image in images if index.failed.get(image[1]) == image[2]]
+    todo = [image for image in images if indexed_mtimes.get(image[1]) != image[2] and index.failed.get(image[1]) != image[2]]
+    stats = {'images': len(images), 'indexed': 0, 'unchanged': len(images) - len(todo) - len(known_failures),
+             'removed': len(removed), 'failed': 0, 'known_failures': len(known_failures)}
+
+    if todo:
+        if model is None:
+            from deepface import DeepFace
+            model = DeepFace.build_model(model_name)
+        from .recognition import embed_batch
+        jobs = [(os.path.join(faces_dir, rel_path), detector_backend, model.input_shape) for _, rel_path, _ in todo]
+        if workers is None:
+            workers = ThreadPlan.for_cpus().enrol_workers
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        results = executor.map(_prepare_job, jobs, chunksize=4) if executor else map(_prepare_job, jobs)
+        pending = []
+        since_checkpoint = 0
+
+        def flush():
+            nonlocal since_checkpoint
+            if not pending:
+                return
+            embeddings = embed_batch(model, [face for _, _, _, face in pending])
+            index.add([p[0] for p in pending], [p[1] for p in pending], [p[2] for p in pending], embeddings)
+            stats['indexed'] += len(pending)
+            since_checkpoint += len(pending)
+            pending.clear()
+            if since_checkpoint >= checkpoint_every:
+                index.save(checkpoint_path)
+                since_checkpoint = 0
+
+        try:
+            for done, ((name, rel_path, mtime), (face, error)) in enumerate(zip(todo, results), start=1):
+                if face is None:
+                    stats['failed'] += 1
+                    index.mark_failed(rel_path, mtime)
+                    logging.warning(f"Skipping {rel_path}: {error}")
+                else:
+                    pending.append((name, rel_path, mtime, face))
+                    if len(pending) >= batch_size:
+                        flush()
+                if progress:
+                    progress(done, len(todo))
+            flush()
+        except BaseException:
+            # Keep what was embedded so far; the next run resumes from it
+            if stats['indexed']:
+                index.save(checkpoint_path)
+                logging.warning(f"Indexing interrupted; checkpoint saved to {checkpoint_path}.")
+            raise
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    index.save(index_path)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    logging.info(f"Face index updated: {stats}")
+    return stats
+
+
+def score_frame(frame, face_detector, detect_width=320):
+    """
+    Rates a frame as an enrolment photo. Returns (guidance_key, score, box): score is None unless
+    exactly one face is large and sharp enough; it grows with sharpness and face size.
+    """
+    height, width = frame.shape[:2]
+    scale = min(1.0, detect_width / width)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    faces = face_detector(small, 0)
+    if len(faces) == 0:
+        return 'enrol_no_face', None, None
+    if len(faces) > 1:
+        return 'enrol_one_person', None, None
+    rect = faces[0]
+    x, y = max(0, int(rect.left() / scale)), max(0, int(rect.top() / scale))
+    w, h = int(rect.width() / scale), int(rect.height() / scale)
+    box = (x, y, w, h)
+    size_ratio = w / width
+    if size_ratio < MIN_FACE_RATIO:
+        return 'enrol_move_closer', None, box
+    face = gray[y:y + h, x:x + w]
+    if face.size == 0:
+        return 'enrol_no_face', None, None
+    # Fixed crop size so sharpness doesn't depend on how close the person stands
+    sharpness = cv2.Laplacian(cv2.resize(face, (128, 128)), cv2.CV_64F).var()
+    if sharpness < MIN_SHARPNESS:
+        return 'enrol_hold_still', None, box
+    return 'enrol_good', sharpness * min(size_ratio / IDEAL_FACE_RATIO, 1.0), box
+
+
+def head_yaw(frame, box, landmark_predictor):
+    """The yaw of the face in `box` (see POSE_YAW), from its 68 landmarks."""
+    import dlib
+    from .liveness import landmark_signals
+    from .pipeline import shape_to_np
+    x, y, w, h = box
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return landmark_signals(shape_to_np(landmark_predictor(gray, dlib.rectangle(x, y, x + w, y + h))))[2]
+
+
+def pose_guidance(pose, yaw):
+    """'enrol_good' when `yaw` matches `pose`, otherwise the prompt that turns the head there."""
+    if pose not in POSE_YAW:
+        return 'enrol_good'
+    low, high = POSE_YAW[pose]
+    if low <= yaw <= high:
+        return 'enrol_good'
+    if pose != 'enrol_look_straight' and (yaw > high if high > 0 else yaw < low):
+        return 'enrol_turn_less'
+    return pose
+
+
+def write_image(path, image):
+    """cv2.imwrite that also works for non-ASCII folder names on Windows."""
+    ok, data = cv2.imencode(os.path.splitext(path)[1] or '.jpg', image)
+    if not ok:
+        raise OSError(f"Could not encode image for {path}")
+    data.tofile(path)
+
+
+class EnrolmentSession:
+    """
+    Enrols one person from frames handed over by the running camera loop.
+    (تسجيل موظف من بث الكاميرا المباشر دون إيقاف التعرف)
+
+    `feed()` is called on the engine thread and only keeps the newest frame; scoring runs on the
+    session's own thread, so the camera loop is never slowed down. For each pose the sharpest,
+    largest face seen during `pose_seconds` of good frames is saved. With a `landmark_predictor`, a
+    frame only counts for a pose when the head yaw matches it (POSE_YAW); until then the guidance
+    keeps asking the person to turn. `on_saved(session)` runs once all photos are written (e.g. to
+    update the face index). The GUI polls `status()`.
+    """
+    def __init__(self, name, person_dir, face_detector, poses=ENROLMENT_POSES, pose_seconds=1.5, timeout=60.0,
+                 on_saved=None, landmark_predictor=None):
+        self.name = name
+        self.person_dir = person_dir
+        self.face_detector = face_detector
+        self.landmark_predictor = landmark_predictor
+        self.poses = poses
+        self.pose_seconds = pose_seconds
+        self.timeout = timeout
+        self.on_saved = on_saved
+        self.state = 'capturing'  # -> 'indexing' -> 'done' | 'failed' | 'cancelled'
+        self.error = None
+        self.saved_paths = []
+        self.guidance = 'enrol_no_face'
+        self.preview = None
+        self.face_box = None      # Where the enrolee's face was last seen, and when
+        self.face_seen_at = None
+        self._lock = threading.Lock()
+        self._pending = None
+        self._frame_ready = threading.Event()
+        self._cancelled = threading.Event()
+        self._created_dir = not os.path.isdir(person_dir)
+        self._thread = threading.Thread(target=self._run, name=f"raqeeb-enrol-{name}", daemon=True)
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._frame_ready.set()
+
+    def feed(self, frame, now):
+        """Offers a camera frame (engine thread). Copied only when the scorer is ready for a new one."""
+        if self.state != 'capturing':
+            return
+        with self._lock:
+            if self._pending is None:
+                self._pending = (frame.copy(), now)
+                self._frame_ready.set()
+
+    def is_enrolee(self, box, now):
+        """True if a face at `box` at time `now` is the person being enrolled, going by where they were last seen."""
+        if self.face_box is None or abs(now - self.face_seen_at) > FACE_MEMORY:
+            return False
+        x, y, w, h = self.face_box
+        bx, by, bw, bh = box
+        dx, dy = (x + w / 2.0) - (bx + bw / 2.0), (y + h / 2.0) - (by + bh / 2.0)
+        return dx * dx + dy * dy <= (0.5 * max(w, 1)) ** 2
+
+    def status(self):
+        return {'state': self.state, 'pose': self.poses[min(len(self.saved_paths), len(self.poses) - 1)],
+                'shots': len(self.saved_paths), 'total_shots': len(self.poses), 'guidance': self.guidance,
+                'error': self.error}
+
+    def _run(self):
+        deadline = time.time() + self.timeout
+        best = None          # (score, frame) for the current pose
+        good_since = None    # When the current pose first produced a usable frame
+        try:
+            os.makedirs(self.person_dir, exist_ok=True)
+            while len(self.saved_paths) < len(self.poses):
+                if self._cancelled.is_set():
+                    self.state = 'cancelled'
+                    return
+                if time.time() > deadline:
+                    raise TimeoutError('enrol_timeout')
+                if not self._frame_ready.wait(0.2):
+                    continue
+                with self._lock:
+                    pending, self._pending = self._pending, None
+                    self._frame_ready.clear()
+                if pending is None:
+                    continue
+                frame, now = pending
+                self.guidance, score, box = score_frame(frame, self.face_detector)
+                if box is not None:
+                    self.face_box, self.face_seen_at = box, now
+                if score is not None and self.landmark_predictor is not None:
+                    pose = self.poses[len(self.saved_paths)]
+                    self.guidance = pose_guidance(pose, head_yaw(frame, box, self.landmark_predictor))
+                    if self.guidance != 'enrol_good':
+                        score = None  # Sharp, but not turned the way this pose asks
+                self._update_preview(frame, box)
+                if score is not None:
+                    if best is None or score > best[0]:
+                        best = (score, frame)
+                    if good_since is None:
+                        good_since = now
+                if good_since is not None and now - good_since >= self.pose_seconds:
+                    path = os.path.join(self.person_dir, f"{self.name}_{len(self.saved_paths) + 1}.jpg")
+                    write_image(path, best[1])
+                    self.saved_paths.append(path)
+                    logging.info(f"Enrolment photo {len(self.saved_paths)} saved for {self.name} (score {best[0]:.0f}).")
+                    best, good_since = None, None
+
+            self.state = 'indexing'
+            if self.on_saved:
+                self.on_saved(self)
+            self.state = 'done'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+            logging.error(f"Enrolment of {self.name} failed: {e}")
+        finally:
+            if self.state in ('failed', 'cancelled'):
+                self._discard_photos()
+
+    def _update_preview(self, frame, box, width=320):
+        scale = width / frame.shape[1]
+        preview = cv2.resize(frame, (width, int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        if box is not None:
+            x, y, w, h = (int(v * scale) for v in box)
+            color = (0, 255, 0) if self.guidance == 'enrol_good' else (0, 255, 255)
+            cv2.rectangle(preview, (x, y), (x + w, y + h), color, 2)
+        self.preview = preview
+
+    def _discard_photos(self):
+        if self._created_dir and os.path.isdir(self.person_dir):
+            shutil.rmtree(self.person_dir, ignore_errors=True)
+        else:
+            for path in self.saved_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def _print_progress(done, total):
+    print(f"\r{done}/{total} images ({100.0 * done / total:.0f}%)", end='', file=sys.stderr, flush=True)
+
+
+def _thread_plan(database):
+    """The ThreadPlan from the app's settings, or this machine's defaults when there is no database yet."""
+    if not os.path.exists(database):
+        return ThreadPlan.for_cpus()
+    from .settings import Settings
+    from .store import connect_read_only
+    conn = connect_read_only(database)
+    try:
+        return ThreadPlan.from_settings(Settings(dict(conn.execute("SELECT key, value FROM settings"))))
+    except sqlite3.Error:
+        return ThreadPlan.for_cpus()
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrol the known faces folder into the Raqeeb face index.")
+    parser.add_argument('--faces-dir', default=DB_PATH, help="Folder with one sub-folder of photos per employee (default: %(default)s).")
+    parser.add_argument('--detector-backend', default='mtcnn')
+    parser.add_argument('--workers', type=int, help="Processes decoding/aligning images (default: the enrol_workers "
+                                                    "setting, else all cores but one; 0 = none).")
+    parser.add_argument('--database', default=DATABASE_FILE, help="Database holding the thread settings, if it exists (default: %(default)s).")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Faces per embedding model call.")
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY)
+    parser.add_argument('--full', action='store_true', help="Re-embed every image instead of only new or changed ones.")
+    parser.add_argument('--restart', action='store_true', help="Discard the checkpoint of an interrupted run.")
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    plan = _thread_plan(args.database)
+    configure_tensorflow(plan.tf_intra_op, plan.tf_inter_op)
+    workers = plan.enrol_workers if args.workers is None else args.workers
+    checkpoint_path = checkpoint_path_for(index_path_for(args.faces_dir, MODEL_NAME))
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    try:
+        stats = build_index(args.faces_dir, MODEL_NAME, args.detector_backend, workers=workers,
+                            batch_size=args.batch_size, checkpoint_every=args.checkpoint_every, full=args.full,
+                            progress=None if args.quiet else _print_progress)
+    except KeyboardInterrupt:
+        print("\nInterrupted. Run the same command again to resume.", file=sys.stderr)
+        return 130
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"{stats['images']} images: {stats['indexed']} embedded, {stats['unchanged']} unchanged, "
+          f"{stats['removed']} removed, {stats['failed']} failed"
+          + (f", {stats['known_failures']} skipped as failed before (--full retries them)" if stats['known_failures'] else ""))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
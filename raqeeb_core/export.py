@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming attendance export (تصدير تقارير الحضور).
+
+Rows are read from an indexed, read-only SQLite cursor and written chunk by chunk,
+so memory stays flat no matter how large the date range is.
+
+Usage:
+    python -m raqeeb_core.export attendance_h1.csv --from 2025-01-01 --to 2025-06-30
+    python -m raqeeb_core.export july.parquet --from 2025-07-01 --to 2025-07-31 --name "Ali" --name "Sara"
+    python -m raqeeb_core.export days_per_employee.csv --from 2025-07-01 --to 2025-07-31 --summary
+
+The format follows the file extension (.csv or .parquet). Parquet needs pyarrow (`pip install pyarrow`).
+"""
+
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+from .constants import DATABASE_FILE
+from .store import connect_read_only
+
+DEFAULT_CHUNK_SIZE = 5000
+FORMATS = ('csv', 'parquet')
+
+# Output columns of each report kind
+COLUMNS = {
+    'rows': ('id', 'name', 'date', 'time'),
+    'summary': ('name', 'days', 'first_check_in', 'last_check_in'),
+}
+
+
+def _build_query(kind, start=None, end=None, names=None):
+    """Returns (select_sql, count_sql, params) for the given filters. `start`/`end` are inclusive dates."""
+    where, params = [], []
+    if start:
+        where.append("timestamp >= ?"); params.append(str(start))
+    if end:
+        where.append("timestamp < ?"); params.append(str(end + timedelta(days=1)))
+    if names:
+        where.append(f"name IN ({','.join('?' * len(names))})"); params.extend(names)
+    where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+    if kind == 'summary':
+        # Aggregated by SQLite, so only one row per employee ever reaches Python
+        select_sql = ("SELECT name, COUNT(DISTINCT substr(timestamp, 1, 10)), MIN(timestamp), MAX(timestamp) "
+                      f"FROM attendance{where_sql} GROUP BY name ORDER BY name")
+        count_sql = f"SELECT COUNT(DISTINCT name) FROM attendance{where_sql}"
+    else:
+        select_sql = ("SELECT id, name, substr(timestamp, 1, 10), substr(timestamp, 12, 8) "
+                      f"FROM attendance{where_sql} ORDER BY timestamp, id")
+        count_sql = f"SELECT COUNT(*) FROM attendance{where_sql}"
+    return select_sql, count_sql, params
+
+
+def iter_chunks(conn, kind='rows', start=None, end=None, names=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields lists of at most `chunk_size` tuples with the columns in COLUMNS[kind]."""
+    select_sql, _, params = _build_query(kind, start, end, names)
+    cursor = conn.execute(select_sql, params)
+    try:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        cursor.close()
+
+
+class _CsvWriter:
+    def __init__(self, path, columns):
+        # utf-8-sig so Excel shows Arabic names correctly, like the dashboard export
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, chunk):
+        self.writer.writerows(chunk)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        self.pa = pa
+        types = {'id': pa.int64(), 'days': pa.int64()}
+        self.schema = pa.schema([(column, types.get(column, pa.string())) for column in columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression='snappy')
+
+    def write(self, chunk):
+        # One row group per chunk
+        columns = list(zip(*chunk))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(values, type=field.type) for values, field in zip(columns, self.schema)], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_attendance(db_path, out_path, fmt=None, kind='rows', start=None, end=None, names=None,
+                      chunk_size=DEFAULT_CHUNK_SIZE, progress=None, should_cancel=None):
+    """
+    Streams attendance for the date range / employees into `out_path` and returns the number of rows written.
+
+    `progress(done, total)` is called after every chunk. If `should_cancel()` returns True the export
+    stops and the partial file is removed. The file is written under a temporary name and only
+    renamed into place when complete, so schedulers never pick up half-written reports.
+    """
+    fmt = fmt or os.path.splitext(out_path)[1].lstrip('.').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}' (use one of: {', '.join(FORMATS)})")
+    if start and end and start > end:
+        raise ValueError("The start date is after the end date.")
+    names = list(names or [])
+
+    conn = connect_read_only(db_path)
+    tmp_path = out_path + '.part'
+    writer = None
+    done = 0
+    try:
+        _, count_sql, params = _build_query(kind, start, end, names)
+        total = conn.execute(count_sql, params).fetchone()[0]
+        writer = (_ParquetWriter if fmt == 'parquet' else _CsvWriter)(tmp_path, COLUMNS[kind])
+        if progress:
+            progress(0, total)
+        for chunk in iter_chunks(conn, kind, start, end, names, chunk_size):
+            if should_cancel and should_cancel():
+                raise InterruptedError("Export cancelled.")
+            writer.write(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+        writer.close()
+        writer = None
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        conn.close()
+    logging.info(f"Exported {done} {kind} rows to {out_path}")
+    return done
+
+
+def _print_progress(done, total):
+    percent = 100.0 * done / total if total else 100.0
+    print(f"\r{done}/{total} rows ({percent:.0f}%)", end='', file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Raqeeb attendance records to CSV or Parquet.")
+    parser.add_argument('output', help="Output file; .csv or .parquet selects the format.")
+    parser.add_argument('--database', default=DATABASE_FILE, help="SQLite database file (default: %(default)s).")
+    parser.add_argument('--from', dest='start', type=date.fromisoformat, help="First day to include (YYYY-MM-DD).")
+    parser.add_argument('--to', dest='end', type=date.fromisoformat, help="Last day to include (YYYY-MM-DD).")
+    parser.add_argument('--name', action='append', help="Only this employee; repeat for several.")
+    parser.add_argument('--format', choices=FORMATS, help="Override the format implied by the file extension.")
+    parser.add_argument('--summary', action='store_true', help="One row per employee (days attended) instead of every check-in.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--quiet', action='store_true', help="Do not print progress.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        rows = export_attendance(args.database, args.output, fmt=args.format, kind='summary' if args.summary else 'rows',
+                                 start=args.start, end=args.end, names=args.name, chunk_size=args.chunk_size,
+                                 progress=None if args.quiet else _print_progress)
+    except (ValueError, RuntimeError, OSError, sqlite3.Error) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Wrote {rows} rows to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
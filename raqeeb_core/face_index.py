@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Face store: the embeddings of every image in the known faces folder (مخزن بصمات الوجوه).
+
+Replaces DeepFace's representations pickle. The whole index is one .npz file written atomically,
+and a search is a single matrix-vector product over L2-normalised embeddings.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+from .constants import MODEL_NAME
+
+
+def index_path_for(faces_dir, model_name=MODEL_NAME):
+    return os.path.join(faces_dir, f"face_index_{model_name}.npz")
+
+
+def normalize(embeddings):
+    """L2-normalises rows so that cosine distance is 1 - dot product."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+class FaceIndex:
+    """
+    Embeddings with the employee name, image path (relative to the faces folder) and file mtime of each.
+    (فهرس بصمات الوجوه للبحث السريع)
+
+    Updates build new arrays and swap them in as one tuple, so `search` can run on the video
+    thread while an enrolment adds faces from another thread.
+
+    Images in which no face could be found are remembered with their mtime in `failed`, so an
+    update skips them until the file changes instead of running face detection on them again.
+    """
+    def __init__(self, model_name=MODEL_NAME, dim=0):
+        self.model_name = model_name
+        self._data = (np.empty((0, dim), dtype=np.float32), np.empty(0, dtype=object),
+                      np.empty(0, dtype=object), np.empty(0, dtype=np.float64))
+        self.failed = {}  # relative image path -> mtime of the version that failed
+
+    def __len__(self):
+        return len(self._data[1])
+
+    @property
+    def names(self):
+        return self._data[1]
+
+    @property
+    def paths(self):
+        return self._data[2]
+
+    def mtimes_by_path(self):
+        _, _, paths, mtimes = self._data
+        return dict(zip(paths, mtimes))
+
+    # --- Persistence (الحفظ والتحميل) ---
+    @classmethod
+    def load(cls, path, model_name=MODEL_NAME):
+        """Loads an index file. Returns an empty index if it is missing, unreadable, or built with another model."""
+        index = cls(model_name)
+        if not os.path.exists(path):
+            return index
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['model_name']) != model_name:
+                    logging.warning(f"Face index {path} was built with {data['model_name']}, ignoring it.")
+                    return index
+                index._data = (data['embeddings'].astype(np.float32), data['names'].astype(object),
+                               data['paths'].astype(object), data['mtimes'].astype(np.float64))
+                if 'failed_paths' in data:  # Absent from indexes written before failures were kept
+                    index.failed = dict(zip(data['failed_paths'].astype(object), data['failed_mtimes'].astype(float)))
+        except Exception as e:
+            logging.error(f"Could not read face index {path}: {e}")
+        return index
+
+    def save(self, path):
+        """Writes the index to a temporary file and renames it into place, so readers never see a partial file."""
+        embeddings, names, paths, mtimes = self._data
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, model_name=np.array(self.model_name), embeddings=embeddings,
+                     names=names.astype(str), paths=paths.astype(str), mtimes=mtimes,
+                     failed_paths=np.array(list(self.failed), dtype=str),
+                     failed_mtimes=np.array(list(self.failed.values()), dtype=np.float64))
+        os.replace(tmp_path, path)
+
+    # --- Updates (التحديث) ---
+    def add(self, names, paths, mtimes, embeddings):
+        """Adds faces, replacing any existing entries for the same image paths."""
+        if not len(paths):
+            return
+        self.remove_paths(paths)
+        old_embeddings, old_names, old_paths, old_mtimes = self._data
+        embeddings = normalize(embeddings)
+        if len(old_names) == 0:
+            old_embeddings = old_embeddings.reshape(0, embeddings.shape[1])
+        self._data = (np.concatenate([old_embeddings, embeddings]),
+                      np.concatenate([old_names, np.array(names, dtype=object)]),
+                      np.concatenate([old_paths, np.array(paths, dtype=object)]),
+                      np.concatenate([old_mtimes, np.asarray(mtimes, dtype=np.float64)]))
+
+    def _keep(self, mask):
+        self._data = tuple(array[mask] for array in self._data)
+
+    def remove_paths(self, paths):
+        for path in paths:
+            self.failed.pop(path, None)
+        if len(self):
+            self._keep(~np.isin(self._data[2], list(paths)))
+
+    def remove_name(self, name):
+        prefix = name + os.sep
+        self.failed = {path: mtime for path, mtime in self.failed.items() if not path.startswith(prefix)}
+        if len(self):
+            self._keep(self._data[1] != name)
+
+    def mark_failed(self, path, mtime):
+        """Records that no face was found in this version of the image."""
+        self.failed[path] = mtime
+
+    # --- Search (البحث) ---
+    def search(self, embedding):
+        """Returns (name, cosine_distance, path) of the closest face, or (None, None, None) if the index is empty."""
+        embeddings, names, paths, _ = self._data
+        if len(names) == 0:
+            return None, None, None
+        distances = 1.0 - embeddings @ normalize(embedding)
+        best = int(np.argmin(distances))
+        return names[best], float(distances[best]), paths[best]
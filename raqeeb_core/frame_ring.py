@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+Shared-memory frame transport between processes (نقل الإطارات عبر الذاكرة المشتركة).
+
+Passing camera frames to other processes through a multiprocessing.Queue pickles and copies
+every 1080p frame (about 6 MB) twice. A SharedFrameRing is instead a fixed ring of frame slots
+in one multiprocessing.shared_memory block: the capture process writes each frame into a slot
+once, and detector or recognizer processes read it where it lies, or copy out only the face
+region they need.
+
+Each slot starts with a small header: the frame id (0 while the slot is being written), the
+capture timestamp and the shape. Readers read the header before and after using a slot, so a
+frame that was overwritten in the meantime is detected instead of being used half old, half
+new. This relies on stores reaching shared memory in program order, as they do on x86.
+
+Usage:
+    python -m raqeeb_core.frame_ring                    # compare with a multiprocessing.Queue
+    python -m raqeeb_core.frame_ring --size 1280x720 --frames 600
+"""
+
+import argparse
+import logging
+import sys
+import time
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from .camera import CameraStream
+
+RING_MAGIC = b'RAQEEBFR'
+RING_VERSION = 1
+ALIGN = 64  # Cache line; every region and slot starts on one
+
+_RING_HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('slots', '<u4'), ('readers', '<u4'), ('pad', '<u4'),
+                         ('slot_bytes', '<u8'), ('last_id', '<u8'), ('last_slot', '<u8'),
+                         ('written', '<u8'), ('dropped', '<u8')])
+_SLOT_HEADER = np.dtype([('state', '<u8'), ('timestamp', '<f8'), ('height', '<u4'), ('width', '<u4'),
+                         ('channels', '<u4'), ('pad', '<u4')])
+
+# Only the creator unlinks the block; an attached process must not do it when it exits
+_ATTACH_OPTIONS = {'track': False} if sys.version_info >= (3, 13) else {}
+
+
+def _aligned(size):
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _layout(slots, readers):
+    """Offsets of the reader holds, the slot headers and the frame data in the block."""
+    holds = _aligned(_RING_HEADER.itemsize)
+    headers = holds + _aligned(8 * readers)
+    data = headers + _aligned(_SLOT_HEADER.itemsize * slots)
+    return holds, headers, data
+
+
+class FrameRef:
+    """A published frame: id, capture timestamp, shape and the ring slot holding it."""
+    def __init__(self, frame_id, timestamp, shape, slot):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.shape = shape
+        self.slot = slot
+
+    def __repr__(self):
+        return f"FrameRef(frame_id={self.frame_id}, timestamp={self.timestamp:.3f}, shape={self.shape}, slot={self.slot})"
+
+
+class SharedFrameRing:
+    """
+    Fixed ring of uint8 frame slots in a shared-memory block, one writer and any number of readers.
+    (حلقة إطارات مشتركة: كاتب واحد وعدة قرّاء)
+
+    The writer calls `write(frame, timestamp)`, or `reserve(shape)` and `publish(timestamp)` to
+    decode straight into a slot. Readers get a FrameRef from `latest()` or `wait()`, then
+    `view(ref)` for the frame itself (no copy) or `roi(ref, box)` for a copied crop, and check
+    `valid(ref)` after using a view. A reader attached with a `reader` index marks the frame it
+    holds; the writer does not reuse that slot while another one is free, so a ring with a slot
+    per reader plus two rarely overwrites a frame in use. The newest frame is never overwritten
+    before the next one is published.
+
+    Views returned by view() point into the block: drop them before close().
+    """
+    def __init__(self, shm, owner=False, reader=None):
+        self._shm = shm
+        self.owner = owner
+        self._header = np.ndarray((), _RING_HEADER, shm.buf)
+        if bytes(self._header['magic']) != RING_MAGIC or int(self._header['version']) != RING_VERSION:
+            self._header = None
+            shm.close()
+            raise ValueError(f"Shared memory block '{shm.name}' is not a Raqeeb frame ring")
+        self.slots = int(self._header['slots'])
+        self.readers = int(self._header['readers'])
+        self.slot_bytes = int(self._header['slot_bytes'])
+        if reader is not None and not 0 <= reader < self.readers:
+            self._header = None
+            shm.close()
+            raise ValueError(f"reader must be between 0 and {self.readers - 1}")
+        self.reader = reader
+        holds, headers, self._data_offset = _layout(self.slots, self.readers)
+        self._holds = np.ndarray((self.readers,), '<u8', shm.buf, holds)
+        self._slot_headers = np.ndarray((self.slots,), _SLOT_HEADER, shm.buf, headers)
+        self._reserved = None  # (slot, shape) between reserve() and publish()
+
+    @classmethod
+    def create(cls, max_shape=(1080, 1920, 3), slots=4, readers=4, name=None):
+        """Creates a ring whose slots fit frames of up to `max_shape` (any shape with as many bytes fits)."""
+        if slots < 2:
+            raise ValueError("a frame ring needs at least two slots")
+        slot_bytes = _aligned(int(np.prod(max_shape)))
+        data = _layout(slots, readers)[2]
+        shm = shared_memory.SharedMemory(name=name, create=True, size=data + slots * slot_bytes)
+        header = np.ndarray((), _RING_HEADER, shm.buf)
+        header['version'] = RING_VERSION
+        header['slots'] = slots
+        header['readers'] = readers
+        header['slot_bytes'] = slot_bytes
+        header['last_slot'] = slots - 1  # The first frame goes into slot 0
+        header['magic'] = RING_MAGIC  # Last: attaching before this point fails cleanly
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, reader=None):
+        """Opens an existing ring by name; `reader` is this process's index for holding frames, if any."""
+        return cls(shared_memory.SharedMemory(name=name, **_ATTACH_OPTIONS), owner=False, reader=reader)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def last_id(self):
+        return int(self._header['last_id'])
+
+    @property
+    def written(self):
+        return int(self._header['written'])
+
+    @property
+    def dropped(self):
+        """Frames the writer could not place because every other slot was held by a reader."""
+        return int(self._header['dropped'])
+
+    def _array(self, slot, shape):
+        return np.ndarray(shape, np.uint8, self._shm.buf, self._data_offset + slot * self.slot_bytes)
+
+    # --- Writer (الكاتب) ---
+    def reserve(self, shape):
+        """
+        Claims the next free slot for a frame of `shape` and returns it as a writable array, or
+        None (counted in `dropped`) if every slot but the newest is held. Raises ValueError if the
+        frame is larger than a slot.
+        """
+        shape = tuple(int(n) for n in shape)
+        if int(np.prod(shape)) > self.slot_bytes:
+            raise ValueError(f"frame of shape {shape} does not fit in a {self.slot_bytes}-byte slot")
+        held = {int(frame_id) for frame_id in self._holds if frame_id}
+        last_slot = int(self._header['last_slot'])
+        for step in range(1, self.slots):
+            slot = (last_slot + step) % self.slots
+            if int(self._slot_headers['state'][slot]) not in held:
+                break
+        else:
+            self._header['dropped'] += 1
+            return None
+        self._slot_headers['state'][slot] = 0  # Readers now see the slot as being written
+        self._reserved = (slot, shape)
+        return self._array(slot, shape)
+
+    def publish(self, timestamp):
+        """Publishes the frame written into the reserved slot and returns its id."""
+        slot, shape = self._reserved
+        self._reserved = None
+        frame_id = int(self._header['last_id']) + 1
+        header = self._slot_headers[slot]
+        header['timestamp'] = timestamp
+        header['height'], header['width'] = shape[0], shape[1]
+        header['channels'] = shape[2] if len(shape) > 2 else 0
+        header['state'] = frame_id  # After the data and shape, so a reader seeing the id sees the frame
+        self._header['last_slot'] = slot
+        self._header['last_id'] = frame_id
+        self._header['written'] += 1
+        return frame_id
+
+    def write(self, frame, timestamp):
+        """Copies `frame` into the ring; returns its id, or None if it was dropped."""
+        target = self.reserve(frame.shape)
+        if target is None:
+            return None
+        np.copyto(target, frame)
+        return self.publish(timestamp)
+
+    # --- Readers (القرّاء) ---
+    def latest(self):
+        """
+        Returns a FrameRef for the newest frame, or None if none has been published. With a
+        reader index the frame stays held until the next latest()/wait() or release().
+        """
+        for _ in range(self.slots):
+            frame_id = int(self._header['last_id'])
+            if frame_id == 0:
+                return None
+            slot = int(self._header['last_slot'])
+            if self.reader is not None:
+                self._holds[self.reader] = frame_id
+            ref = self._ref(slot, frame_id)
+            if ref is not None:
+                return ref
+        # The writer kept moving on while we looked; the caller simply tries again
+        self.release()
+        return None
+
+    def _ref(self, slot, frame_id):
+        header = self._slot_headers[slot]
+        if int(header['state']) != frame_id:
+            return None
+        shape = (int(header['height']), int(header['width']))
+        if header['channels']:
+            shape += (int(header['channels']),)
+        timestamp = float(header['timestamp'])
+        if int(header['state']) != frame_id:
+            return None
+        return FrameRef(frame_id, timestamp, shape, slot)
+
+    def wait(self, after_id=0, timeout=1.0, poll=0.001):
+        """Waits for a frame newer than `after_id` and returns latest(), or None on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            # There is no condition variable that processes can share by name, so poll the header
+            if int(self._header['last_id']) > after_id:
+                ref = self.latest()
+                if ref is not None and ref.frame_id > after_id:
+                    return ref
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(poll)
+
+    def view(self, ref):
+        """The frame itself, read in place. Check valid(ref) after reading it."""
+        return self._array(ref.slot, ref.shape)
+
+    def valid(self, ref):
+        """True while the slot still holds the frame `ref` refers to."""
+        return int(self._slot_headers['state'][ref.slot]) == ref.frame_id
+
+    def roi(self, ref, box):
+        """Copies the (x, y, w, h) region of the frame, clipped to it; None if the frame was overwritten."""
+        x, y, w, h = box
+        height, width = ref.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        crop = self.view(ref)[y0:min(height, y + h), x0:min(width, x + w)].copy()
+        return crop if self.valid(ref) else None
+
+    def read(self, ref):
+        """Copies the whole frame; None if it was overwritten."""
+        frame = self.view(ref).copy()
+        return frame if self.valid(ref) else None
+
+    def release(self):
+        """Lets the writer reuse the slot this reader holds."""
+        if self.reader is not None:
+            self._holds[self.reader] = 0
+
+    def close(self):
+        self.release()
+        self._header = self._holds = self._slot_headers = None
+        self._shm.close()
+
+    def unlink(self):
+        """Frees the block once every process has closed it. Only the creator calls this."""
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+
+def capture_to_ring(ring_name, source, stop, camera_options=None):
+    """Process target: reads `source` with a CameraStream and publishes its frames into the ring until `stop` is set."""
+    ring = SharedFrameRing.attach(ring_name)
+    camera = CameraStream(source, **(camera_options or {}))
+    if not camera.open():
+        logging.error(f"Could not open camera {source}; retrying in the background.")
+    camera.start()
+    try:
+        while not stop.is_set():
+            frame, grabbed_at = camera.read(timeout=0.5)
+            if frame is None:
+                continue
+            try:
+                ring.write(frame, grabbed_at)
+            except ValueError as e:
+                logging.error(f"Stopping capture: {e}. Create the ring with a larger max_shape.")
+                break
+    finally:
+        camera.stop()
+        ring.close()
+
+
+class CaptureProcess:
+    """
+    Camera capture in its own process, publishing into a new SharedFrameRing.
+    (التقاط الكاميرا في عملية مستقلة)
+
+    After start(), other processes open the frames with SharedFrameRing.attach(capture.name, reader=i),
+    each with its own reader index below `readers`.
+    """
+    def __init__(self, source, max_shape=(1080, 1920, 3), slots=6, readers=4, camera_options=None):
+        self.source = source
+        self.max_shape = max_shape
+        self.slots = slots
+        self.readers = readers
+        self.camera_options = camera_options
+        self.ring = None
+        self._stop = None
+        self._process = None
+
+    @property
+    def name(self):
+        return self.ring.name
+
+    def start(self):
+        context = get_context('spawn')
+        self.ring = SharedFrameRing.create(self.max_shape, slots=self.slots, readers=self.readers)
+        self._stop = context.Event()
+        self._process = context.Process(target=capture_to_ring, name="raqeeb-capture", daemon=True,
+                                        args=(self.ring.name, self.source, self._stop, self.camera_options))
+        self._process.start()
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def stop(self, timeout=5.0):
+        """Stops the capture process and frees the ring; readers must have closed theirs."""
+        if self._process is not None:
+            self._stop.set()
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+            self._process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
+
+
+# --- Transport benchmark (قياس أداء النقل) ---
+def _queue_producer(frames_queue, shape, count):
+    frame = np.random.default_rng(0).integers(0, 255, shape, dtype=np.uint8)
+    for _ in range(count):
+        frames_queue.put((time.time(), frame))
+    frames_queue.put(None)
+
+
+def _ring_producer(ring_name, shape, count, done):
+    frame = np.random.default_rng(0).integers(0, 255, shape, dtype=np.uint8)
+    with SharedFrameRing.attach(ring_name) as ring:
+        for _ in range(count):
+            ring.write(frame, time.time())
+        done.set()
+
+
+def _face_crop(shape):
+    height, width = shape[:2]
+    return (width // 2 - 80, height // 2 - 80, 160, 160)
+
+
+def benchmark_transport(shape=(1080, 1920, 3), count=300):
+    """
+    Sends `count` frames from a producer process and receives them here, once through a
+    multiprocessing.Queue and once through a SharedFrameRing, and returns per-transport
+    {'frames', 'seconds', 'fps', 'latency_ms_p50', 'latency_ms_p95', 'consumer_cpu_ms_per_frame'}.
+    The consumer takes a face-sized crop from each frame, as a recognizer process would.
+    """
+    context = get_context('spawn')
+    box = _face_crop(shape)
+    results = {}
+
+    def summary(latencies, started, cpu_started):
+        seconds = time.perf_counter() - started
+        latencies = np.array(latencies) * 1000.0
+        return {'frames': len(latencies), 'seconds': round(seconds, 3), 'fps': round(len(latencies) / seconds, 1),
+                'latency_ms_p50': round(float(np.percentile(latencies, 50)), 2),
+                'latency_ms_p95': round(float(np.percentile(latencies, 95)), 2),
+                'consumer_cpu_ms_per_frame': round((time.process_time() - cpu_started) * 1000.0 / max(1, len(latencies)), 3)}
+
+    frames_queue = context.Queue(maxsize=4)
+    producer = context.Process(target=_queue_producer, args=(frames_queue, shape, count), daemon=True)
+    producer.start()
+    latencies = []
+    item = frames_queue.get()  # Wait for the producer to be up before timing
+    started, cpu_started = time.perf_counter(), time.process_time()
+    while item is not None:
+        sent_at, frame = item
+        x, y, w, h = box
+        frame[y:y + h, x:x + w].copy()
+        latencies.append(time.time() - sent_at)
+        item = frames_queue.get()
+    results['queue'] = summary(latencies, started, cpu_started)
+    producer.join()
+
+    with SharedFrameRing.create(shape, slots=4, readers=1) as ring:
+        reader = SharedFrameRing.attach(ring.name, reader=0)
+        done = context.Event()
+        producer = context.Process(target=_ring_producer, args=(ring.name, shape, count, done), daemon=True)
+        producer.start()
+        latencies, torn = [], 0
+        ref = reader.wait(timeout=30.0)
+        started, cpu_started = time.perf_counter(), time.process_time()
+        while ref is not None:
+            if reader.roi(ref, box) is None:
+                torn += 1
+            latencies.append(time.time() - ref.timestamp)
+            if done.is_set() and reader.last_id == ref.frame_id:
+                break
+            ref = reader.wait(ref.frame_id, timeout=5.0)
+        results['shared_memory'] = summary(latencies, started, cpu_started)
+        # The ring hands out the newest frame: frames the reader was too slow for are skipped, not queued
+        results['shared_memory'].update(published=ring.written, overwritten_while_read=torn)
+        producer.join()
+        reader.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare moving camera frames between processes through a queue and through shared memory.")
+    parser.add_argument('--size', default='1920x1080', help="Frame size as WIDTHxHEIGHT (default: %(default)s).")
+    parser.add_argument('--frames', type=int, default=300, help="Frames to send (default: %(default)s).")
+    args = parser.parse_args(argv)
+
+    try:
+        width, height = (int(n) for n in args.size.lower().split('x'))
+    except ValueError:
+        parser.error("--size must look like 1920x1080")
+    try:
+        results = benchmark_transport((height, width, 3), args.frames)
+    except OSError as e:
+        print(f"Benchmark failed: {e}", file=sys.stderr)
+        return 1
+    for transport, result in results.items():
+        print(f"{transport}:")
+        for key, value in result.items():
+            print(f"  {key:<26} {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
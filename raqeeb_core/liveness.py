@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-frame liveness scoring (التحقق من الحيوية عبر عدة إطارات).
+
+Each landmark pass adds a time-stamped sample of eye openness (EAR), mouth openness (MAR)
+and a head-pose proxy to a per-face ring buffer. Blinks are found from the time series
+(a dip below the open-eye baseline that reopens within a blink's duration), so the result
+does not depend on how many frames per second are processed, and supporting micro-movements
+of the head and mouth raise the confidence.
+"""
+
+import numpy as np
+
+# dlib 68-point indices: per eye the (p2, p6), (p3, p5), (p1, p4) pairs of the EAR formula
+EYE_PAIRS = np.array([[[37, 41], [38, 40], [36, 39]],
+                      [[43, 47], [44, 46], [42, 45]]])
+# Inner lip vertical pairs, then the mouth corners
+MOUTH_PAIRS = np.array([[61, 67], [62, 66], [63, 65], [60, 64]])
+RIGHT_EYE = slice(36, 42)
+LEFT_EYE = slice(42, 48)
+NOSE_TIP = 30
+
+SIGNALS = ('ear', 'mar', 'yaw', 'pitch')
+
+
+def landmark_signals(shape):
+    """Returns (ear, mar, yaw, pitch) for a (68, 2) landmark array; yaw/pitch are the nose offset in eye distances."""
+    points = np.asarray(shape, dtype=np.float32)
+    eyes = np.linalg.norm(points[EYE_PAIRS[..., 0]] - points[EYE_PAIRS[..., 1]], axis=-1)
+    ear = ((eyes[:, 0] + eyes[:, 1]) / np.maximum(2.0 * eyes[:, 2], 1e-6)).mean()
+    mouth = np.linalg.norm(points[MOUTH_PAIRS[:, 0]] - points[MOUTH_PAIRS[:, 1]], axis=-1)
+    mar = mouth[:3].mean() / max(mouth[3], 1e-6)
+    left, right = points[LEFT_EYE].mean(axis=0), points[RIGHT_EYE].mean(axis=0)
+    yaw, pitch = (points[NOSE_TIP] - (left + right) / 2.0) / max(float(np.linalg.norm(left - right)), 1e-6)
+    return float(ear), float(mar), float(yaw), float(pitch)
+
+
+class LivenessResult:
+    def __init__(self, verified=False, confidence=0.0, blinks=0, timed_out=False):
+        self.verified = verified
+        self.confidence = confidence
+        self.blinks = blinks
+        self.timed_out = timed_out
+
+
+class LivenessTracker:
+    """
+    Ring buffer of liveness signals for the face being tracked.
+    (مخزن دائري لإشارات الحيوية للوجه الحالي)
+
+    A sample counts as "eyes closed" only when it is below both `ear_threshold` and
+    `relative_drop` of the face's own open-eye baseline, i.e. below the lower of the two: for
+    people whose eyes are narrow when open the relative limit applies, and small flickers of an
+    EAR that hovers around the threshold do not count. A baseline under `min_open_ear` (eyes
+    never seen open, e.g. a photo) rules blinks out. A blink is a closed
+    run with open samples on both sides no more than `max_blink` seconds apart. Verification
+    needs a blink and a confidence of at least `min_confidence`; if neither happens within
+    `timeout` seconds, `evaluate()` reports `timed_out` and the caller starts over.
+    """
+    def __init__(self, ear_threshold=0.25, window=4.0, timeout=8.0, max_blink=0.8, min_confidence=0.6,
+                 relative_drop=0.8, min_open_ear=0.15, capacity=128):
+        self.ear_threshold = ear_threshold
+        self.window = window
+        self.timeout = timeout
+        self.max_blink = max_blink
+        self.min_confidence = min_confidence
+        self.relative_drop = relative_drop
+        self.min_open_ear = min_open_ear
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros((capacity, len(SIGNALS)), dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self._next = 0
+        self._count = 0
+        self.started_at = None
+
+    def __len__(self):
+        return self._count
+
+    def add(self, now, signals):
+        if self.started_at is None:
+            self.started_at = now
+        self._times[self._next] = now
+        self._values[self._next] = signals
+        self._next = (self._next + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+
+    def samples(self, now):
+        """Returns (times, values) of the samples inside the window, oldest first."""
+        if self._count < len(self._times):
+            times, values = self._times[:self._count], self._values[:self._count]
+        else:
+            times, values = np.roll(self._times, -self._next), np.roll(self._values, -self._next, axis=0)
+        recent = times >= now - self.window
+        return times[recent], values[recent]
+
+    def evaluate(self, now):
+        times, values = self.samples(now)
+        timed_out = self.started_at is not None and now - self.started_at > self.timeout
+        if len(times) < 3:
+            return LivenessResult(timed_out=timed_out)
+        ear, mar, pose = values[:, 0], values[:, 1], values[:, 2:]
+
+        baseline = float(np.percentile(ear, 90))
+        closed = ear < min(self.ear_threshold, baseline * self.relative_drop)
+        # Closed runs: a rising edge is the first closed sample, a falling edge the first open one after it
+        edges = np.diff(closed.astype(np.int8))
+        starts = np.flatnonzero(edges == 1) + 1
+        ends = np.flatnonzero(edges == -1) + 1
+        blinks, depth = 0, 0.0
+        if len(starts) and len(ends) and baseline >= self.min_open_ear:
+            following = np.searchsorted(ends, starts)
+            bracketed = following < len(ends)
+            spans = times[ends[following[bracketed]]] - times[starts[bracketed] - 1]
+            blinks = int(np.count_nonzero(spans <= self.max_blink))
+            if blinks:
+                depth = (baseline - float(ear[closed].min())) / max(baseline, 1e-6)
+
+        # A real blink closes the eye by well over a third; shallow dips are mostly landmark noise
+        blink_score = min(1.0, depth / 0.35) if blinks else 0.0
+        motion_score = min(1.0, float(pose.std(axis=0).sum()) / 0.03)
+        mouth_score = min(1.0, float(np.ptp(mar)) / 0.1)
+        confidence = 0.7 * blink_score + 0.15 * motion_score + 0.15 * mouth_score
+        verified = blinks > 0 and confidence >= self.min_confidence
+        return LivenessResult(verified, confidence, blinks, timed_out and not verified)
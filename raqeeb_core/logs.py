@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Application logging (إعداد سجل التطبيق).
+
+Threads that log (the camera loop above all) only put the record on an in-memory queue; a
+QueueListener thread formats and writes it. The log file holds one JSON object per line and is
+rotated when it reaches `max_bytes` and at midnight. The same message repeated more than `burst`
+times within `interval` seconds is dropped, and the next one that passes reports how many were.
+"The same message" means the same format string, so messages that can repeat (camera retries,
+per-frame errors) pass their values %-style: logging.warning("Camera %s unavailable", source).
+An f-string makes every message distinct and is never limited.
+
+Per-event fields are passed as `extra={'fields': {...}}`; fields that hold for everything a thread
+logs (e.g. the camera) are set once with `log_context(camera=0)`.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+LOG_FILE = 'app.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 14
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+QUEUE_SIZE = 10000
+
+_context = threading.local()
+_listener = None
+
+
+def log_context(**fields):
+    """Adds `fields` to every record logged from the calling thread from now on (None removes a field)."""
+    current = dict(getattr(_context, 'fields', {}))
+    for key, value in fields.items():
+        if value is None:
+            current.pop(key, None)
+        else:
+            current[key] = value
+    _context.fields = current
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, thread, message, then context and per-event fields."""
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', None) or {})
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic one-line format, with any context and event fields appended as key=value."""
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {**(getattr(record, 'context', None) or {}), **(getattr(record, 'fields', None) or {})}
+        if fields:
+            line += ' [' + ' '.join(f"{key}={value}" for key, value in fields.items()) + ']'
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` records with the same logger, level and message template per
+    `interval` seconds. The template is `record.msg` before %-formatting, so records that differ
+    only in their arguments count together. The first record allowed after a suppressed spell
+    carries `suppressed`.
+    """
+    def __init__(self, interval=60.0, burst=5, max_keys=1000):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._seen = {}  # key -> [window start, count, suppressed]
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.interval:
+                suppressed = entry[2] if entry is not None else 0
+                if len(self._seen) >= self.max_keys:
+                    self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.interval}
+                self._seen[key] = [now, 1, 0]
+            elif entry[1] < self.burst:
+                entry[1] += 1
+                suppressed = 0
+            else:
+                entry[2] += 1
+                return False
+        if suppressed:
+            record.fields = {**(getattr(record, 'fields', None) or {}), 'suppressed': suppressed}
+        return True
+
+
+class ContextFilter(logging.Filter):
+    """Copies the emitting thread's log_context() fields onto the record before it changes threads."""
+    def filter(self, record):
+        fields = getattr(_context, 'fields', None)
+        if fields:
+            record.context = fields
+        return True
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates to app.log.1 ... app.log.N when the file would exceed `maxBytes` or a new day has started."""
+    def __init__(self, filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True)
+        self._day = self._file_day()
+
+    def _file_day(self):
+        try:
+            return datetime.fromtimestamp(os.path.getmtime(self.baseFilename)).date()
+        except OSError:
+            return datetime.now().date()
+
+    def shouldRollover(self, record):
+        today = datetime.fromtimestamp(record.created).date()
+        if today != self._day:
+            self._day = today
+            return os.path.exists(self.baseFilename)
+        return super().shouldRollover(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the writer has fallen far behind, records are counted and dropped."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Same process, so the record is passed as is; only the message is fixed now, in case its
+        # arguments change later. The traceback is formatted by the writer thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        dropped = self.dropped
+        if dropped:
+            record.fields = {**(getattr(record, 'fields', None) or {}), 'dropped': dropped}
+        try:
+            self.queue.put_nowait(record)
+            self.dropped -= dropped
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(log_file=LOG_FILE, level=logging.INFO, json_format=True, console=False,
+                  max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, rate_interval=60.0, rate_burst=5):
+    """
+    Routes the root logger through a queue to a rotating `log_file` (JSON lines, or text if
+    `json_format` is False) and, with `console`, to stderr as text. Replaces earlier handlers.
+    Returns the QueueListener; it is stopped, and the queue flushed, at interpreter exit.
+    """
+    global _listener
+    stop_logging()
+    handlers = []
+    if log_file:
+        file_handler = SizeAndTimeRotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+        file_handler.setFormatter(JsonFormatter() if json_format else TextFormatter())
+        handlers.append(file_handler)
+    if console or not handlers:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(TextFormatter())
+        handlers.append(console_handler)
+
+    log_queue = queue.Queue(QUEUE_SIZE)
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(rate_interval, rate_burst))
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Writes out what is still queued and stops the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
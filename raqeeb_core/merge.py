@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-site merge (دمج قواعد بيانات الفروع).
+
+Each building runs its own Raqeeb with its own database, whose `changelog` table records every
+attendance and employee change as (node_id, seq). This tool pulls the changes of many such
+databases into one central reporting database. The central change log remembers the highest
+sequence merged per node, so every run only reads what is new, and a change seen twice (e.g. the
+same site copied from two places) is applied once.
+
+Usage:
+    python -m raqeeb_core.merge central.db sites/*.db
+    python -m raqeeb_core.merge central.db //fileserver/raqeeb/building_a.db //fileserver/raqeeb/building_b.db
+
+The central database has the normal schema, so raqeeb_core.export and the dashboard work on it.
+Its attendance rows carry the node_id of the site they came from. A central database can itself
+be merged into another one.
+"""
+
+import argparse
+import glob
+import logging
+import sqlite3
+import sys
+import time
+from itertools import groupby
+
+from .store import AttendanceStore, connect_read_only, CHANGE_ATTENDANCE, CHANGE_EMPLOYEE, CHANGE_EMPLOYEE_DELETE
+
+DEFAULT_CHUNK_SIZE = 5000
+
+CHANGE_COLUMNS = 'node_id, seq, kind, row_id, name, email, timestamp'
+
+
+def prepare_central(path):
+    """Creates the central database (or upgrades a normal one) with the columns merged rows need."""
+    AttendanceStore(path).close()
+    conn = sqlite3.connect(path)
+    with conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(attendance)")}
+        if 'node_id' not in columns:
+            conn.execute("ALTER TABLE attendance ADD COLUMN node_id TEXT")
+        if 'source_id' not in columns:
+            conn.execute("ALTER TABLE attendance ADD COLUMN source_id INTEGER")
+        # Rows recorded on the central machine itself have no node_id and are not constrained
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_source ON attendance (node_id, source_id)")
+        # Which sites know an employee; the employee is removed centrally once no site has them
+        conn.execute("CREATE TABLE IF NOT EXISTS node_employees (node_id TEXT, name TEXT, email TEXT, PRIMARY KEY (node_id, name))")
+    return conn
+
+
+def merged_positions(conn):
+    """Returns {node_id: highest merged seq}; answered from the change log's primary key."""
+    return dict(conn.execute("SELECT node_id, MAX(seq) FROM changelog GROUP BY node_id"))
+
+
+def _apply(conn, changes):
+    """Applies changes (in sequence order) to the central tables, batching consecutive changes of the same kind."""
+    conn.executemany(f"INSERT OR IGNORE INTO changelog ({CHANGE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", changes)
+    for kind, run in groupby(changes, key=lambda change: change[2]):
+        run = list(run)
+        if kind == CHANGE_ATTENDANCE:
+            conn.executemany("INSERT OR IGNORE INTO attendance (name, timestamp, node_id, source_id) VALUES (?, ?, ?, ?)",
+                             [(name, timestamp, node_id, row_id) for node_id, _, _, row_id, name, _, timestamp in run])
+        elif kind == CHANGE_EMPLOYEE:
+            conn.executemany("INSERT INTO node_employees (node_id, name, email) VALUES (?, ?, ?) "
+                             "ON CONFLICT (node_id, name) DO UPDATE SET email = excluded.email",
+                             [(node_id, name, email) for node_id, _, _, _, name, email, _ in run])
+            conn.executemany("INSERT INTO employees (name, email) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET email = excluded.email",
+                             [(name, email) for _, _, _, _, name, email, _ in run])
+        elif kind == CHANGE_EMPLOYEE_DELETE:
+            pairs = [(node_id, name) for node_id, _, _, _, name, _, _ in run]
+            conn.executemany("DELETE FROM attendance WHERE node_id = ? AND name = ?", pairs)
+            conn.executemany("DELETE FROM node_employees WHERE node_id = ? AND name = ?", pairs)
+            conn.executemany("DELETE FROM employees WHERE name = ? AND NOT EXISTS (SELECT 1 FROM node_employees WHERE name = ?)",
+                             [(name, name) for _, name in pairs])
+        else:
+            logging.warning(f"Skipping {len(run)} changes of unknown kind '{kind}' from node {run[0][0]}")
+
+
+def merge_source(conn, source_path, positions, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Pulls the changes of one site database that are newer than `positions` (updated in place) and
+    applies them in a single transaction, so an interrupted merge leaves nothing half-applied.
+    Returns the number of changes merged.
+    """
+    source = connect_read_only(source_path)
+    merged = 0
+    try:
+        if source.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'changelog'").fetchone() is None:
+            raise sqlite3.OperationalError("no change log yet; start this version of Raqeeb on it once to create one")
+        nodes = source.execute("SELECT node_id, MAX(seq) FROM changelog GROUP BY node_id").fetchall()
+        with conn:
+            for node_id, last_seq in nodes:
+                since = positions.get(node_id, 0)
+                if last_seq <= since:
+                    continue
+                cursor = source.execute(f"SELECT {CHANGE_COLUMNS} FROM changelog WHERE node_id = ? AND seq > ? ORDER BY seq",
+                                        (node_id, since))
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        break
+                    _apply(conn, chunk)
+                    merged += len(chunk)
+                positions[node_id] = last_seq
+    finally:
+        source.close()
+    return merged
+
+
+def merge_databases(central_path, sources, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Merges every database in `sources` into `central_path`. Returns {source: changes merged, or the
+    error message if it could not be read}; one unreadable site does not stop the others.
+    `progress(source, merged)` is called after each source.
+    """
+    conn = prepare_central(central_path)
+    conn.execute("PRAGMA synchronous = NORMAL")
+    results = {}
+    try:
+        positions = merged_positions(conn)
+        for source_path in sources:
+            try:
+                results[source_path] = merge_source(conn, source_path, positions, chunk_size)
+            except sqlite3.Error as e:
+                logging.error(f"Could not merge {source_path}: {e}")
+                results[source_path] = str(e)
+                positions = merged_positions(conn)  # The failed transaction was rolled back
+            if progress:
+                progress(source_path, results[source_path])
+    finally:
+        conn.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the attendance change logs of several Raqeeb sites into a central database.")
+    parser.add_argument('central', help="Central reporting database; created if missing.")
+    parser.add_argument('sources', nargs='+', help="Site databases; glob patterns are expanded.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    sources = []
+    for pattern in args.sources:
+        sources.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+
+    def report(source, merged):
+        print(f"{source}: {merged if isinstance(merged, int) else 'failed - ' + merged}")
+
+    started = time.perf_counter()
+    try:
+        results = merge_databases(args.central, sources, chunk_size=args.chunk_size, progress=report)
+    except sqlite3.Error as e:
+        print(f"Merge failed: {e}", file=sys.stderr)
+        return 1
+    merged = sum(count for count in results.values() if isinstance(count, int))
+    failed = sum(1 for count in results.values() if not isinstance(count, int))
+    print(f"Merged {merged} changes from {len(results) - failed} databases in {time.perf_counter() - started:.1f} s"
+          + (f"; {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Hot-path instrumentation for the recognition pipeline.
+Per-stage timers kept in rolling histograms (p50/p95/p99), FPS counters, an optional
+on-frame overlay and periodic snapshot export (JSON or Prometheus text format).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from itertools import accumulate
+
+import cv2
+import numpy as np
+
+# Pipeline stages in the order they run (plus the end-to-end camera-to-decision latency), used for stable output ordering
+STAGES = ('capture', 'grayscale', 'motion', 'detection', 'landmarks', 'ear', 'embedding', 'search', 'db_write', 'render',
+          'glass_to_decision')
+QUANTILES = (50, 95, 99)
+# Upper bounds (seconds) of the lifetime latency buckets; Prometheus histograms, unlike the
+# windowed quantiles, can be aggregated across sites and over any time range
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RollingHistogram:
+    """Keeps the last `size` samples of a stage latency plus lifetime count, sum and LATENCY_BUCKETS counts."""
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self._bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)  # Per bucket, the last one is +Inf
+
+    def add(self, value):
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+        self._bucket_counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+
+    def summary(self):
+        """
+        Returns the lifetime count, sum and cumulative bucket counts (one per LATENCY_BUCKETS bound,
+        then +Inf), and the mean and percentiles (in seconds) over the rolling window.
+        """
+        summary = {'count': self.count, 'sum': self.total, 'buckets': list(accumulate(self._bucket_counts))}
+        if not self._samples:
+            return summary
+        samples = np.fromiter(self._samples, dtype=np.float64, count=len(self._samples))
+        p50, p95, p99 = np.percentile(samples, QUANTILES)
+        summary.update({'mean': float(samples.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                        'max': float(samples.max())})
+        return summary
+
+
+class RateCounter:
+    """Counts events over a sliding time window to report a rate (e.g. frames per second)."""
+    def __init__(self, window=5.0):
+        self.window = window
+        self._ticks = deque()
+
+    def tick(self, now):
+        self._ticks.append(now)
+        self._trim(now)
+
+    def rate(self, now):
+        self._trim(now)
+        if len(self._ticks) < 2:
+            return 0.0
+        span = now - self._ticks[0]
+        return (len(self._ticks) - 1) / span if span > 0 else 0.0
+
+    def _trim(self, now):
+        while self._ticks and now - self._ticks[0] > self.window:
+            self._ticks.popleft()
+
+
+class PerformanceMonitor:
+    """
+    Collects stage latencies, FPS counters and gauges for the video pipeline.
+    (مراقبة أداء خط المعالجة: زمن كل مرحلة وعدد الإطارات في الثانية)
+
+    Stage timings are also forwarded to any registered listeners (e.g. the adaptive
+    scheduler), so the loop only has to time each stage once.
+    """
+    def __init__(self, window=500, fps_window=5.0, export_path='', export_interval=30.0):
+        self.window = window
+        self.fps_window = fps_window
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self.started_at = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._last_export = time.time()
+
+    def add_listener(self, callback):
+        """Registers `callback(stage, seconds)` to receive every recorded stage latency."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = RollingHistogram(self.window)
+            histogram.add(seconds)
+        for callback in self._listeners:
+            callback(stage, seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Context manager that times the enclosed block as stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def tick(self, counter, now=None):
+        """Counts one event (e.g. 'captured', 'processed', 'rendered') for FPS reporting."""
+        now = time.time() if now is None else now
+        with self._lock:
+            rate = self._counters.get(counter)
+            if rate is None:
+                rate = self._counters[counter] = RateCounter(self.fps_window)
+            rate.tick(now)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def reset(self):
+        """Clears all histograms and counters, e.g. after a settings change."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self, now=None):
+        """Returns a JSON-serialisable view of all metrics."""
+        now = time.time() if now is None else now
+        with self._lock:
+            order = {name: i for i, name in enumerate(STAGES)}
+            stages = {name: self._histograms[name].summary()
+                      for name in sorted(self._histograms, key=lambda n: (order.get(n, len(order)), n))}
+            fps = {name: rate.rate(now) for name, rate in self._counters.items()}
+            gauges = dict(self._gauges)
+        return {'timestamp': now, 'uptime': now - self.started_at, 'stages': stages, 'fps': fps, 'gauges': gauges}
+
+    def to_prometheus(self, snapshot=None):
+        """Renders a snapshot in the Prometheus text exposition format."""
+        snapshot = snapshot or self.snapshot()
+        lines = ['# HELP raqeeb_stage_latency_seconds Latency of each pipeline stage over the recent window.',
+                 '# TYPE raqeeb_stage_latency_seconds summary']
+        for stage, summary in snapshot['stages'].items():
+            for q in QUANTILES:
+                if f'p{q}' in summary:
+                    lines.append(f'raqeeb_stage_latency_seconds{{stage="{stage}",quantile="{q / 100:g}"}} {summary[f"p{q}"]:.6f}')
+            lines.append(f'raqeeb_stage_latency_seconds_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+            lines.append(f'raqeeb_stage_latency_seconds_count{{stage="{stage}"}} {summary["count"]}')
+        lines += ['# HELP raqeeb_stage_duration_seconds Latency of each pipeline stage since start.',
+                  '# TYPE raqeeb_stage_duration_seconds histogram']
+        for stage, summary in snapshot['stages'].items():
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), summary['buckets']):
+                lines.append(f'raqeeb_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'raqeeb_stage_duration_seconds_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+            lines.append(f'raqeeb_stage_duration_seconds_count{{stage="{stage}"}} {summary["count"]}')
+        lines += ['# HELP raqeeb_fps Events per second over the last few seconds.', '# TYPE raqeeb_fps gauge']
+        for counter, value in snapshot['fps'].items():
+            lines.append(f'raqeeb_fps{{counter="{counter}"}} {value:.3f}')
+        for name, value in snapshot['gauges'].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines += [f'# HELP raqeeb_{name} Pipeline gauge {name}.', f'# TYPE raqeeb_{name} gauge', f'raqeeb_{name} {value}']
+        lines += ['# HELP raqeeb_uptime_seconds Seconds since the metrics were last reset.', '# TYPE raqeeb_uptime_seconds gauge',
+                  f'raqeeb_uptime_seconds {snapshot["uptime"]:.1f}']
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path=None, snapshot=None):
+        """Writes a snapshot to `path` (.prom/.txt as Prometheus text, anything else as JSON) atomically."""
+        path = path or self.export_path
+        snapshot = snapshot or self.snapshot()
+        if path.endswith(('.prom', '.txt')):
+            content = self.to_prometheus(snapshot)
+        else:
+            content = json.dumps(snapshot, indent=2)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)  # Readers (e.g. node_exporter) never see a half-written file
+
+    def maybe_export(self, now=None):
+        """Exports a snapshot in a background thread once every `export_interval` seconds."""
+        now = time.time() if now is None else now
+        if not self.export_path or now - self._last_export < self.export_interval:
+            return
+        self._last_export = now
+        threading.Thread(target=self._export_safely, args=(self.snapshot(now),), daemon=True).start()
+
+    def _export_safely(self, snapshot):
+        try:
+            self.export(snapshot=snapshot)
+        except Exception as e:
+            logging.error(f"Failed to export metrics to {self.export_path}: {e}")
+
+    def draw_overlay(self, frame, now=None):
+        """Draws FPS counters and per-stage p50/p95/p99 latencies on `frame` (in place)."""
+        snapshot = self.snapshot(now)
+        fps = snapshot['fps']
+        lines = ["FPS  cap {:.1f}  proc {:.1f}  disp {:.1f}".format(
+            fps.get('captured', 0.0), fps.get('processed', 0.0), fps.get('rendered', 0.0))]
+        for stage, summary in snapshot['stages'].items():
+            if 'p50' in summary:
+                lines.append("{:<10} {:6.1f} {:6.1f} {:6.1f} ms".format(
+                    stage, summary['p50'] * 1000, summary['p95'] * 1000, summary['p99'] * 1000))
+        for name, value in snapshot['gauges'].items():
+            lines.append(f"{name}: {value}")
+
+        line_height = 18
+        box_w, box_h = 330, 10 + line_height * len(lines)
+        roi = frame[0:min(box_h, frame.shape[0]), 0:min(box_w, frame.shape[1])]
+        roi[:] = (roi * 0.4).astype(frame.dtype)  # Darken the background so the text stays readable
+        for i, text in enumerate(lines):
+            cv2.putText(frame, text, (8, 20 + i * line_height), cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 255), 1, cv2.LINE_AA)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Motion gate for idle scenes.
+Compares a heavily downscaled grayscale copy of each frame against a running background
+and only lets the (much more expensive) face detector run when something moved.
+"""
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Frame-differencing pre-detection stage.
+    (بوابة الحركة: تشغيل كاشف الوجوه فقط عند اكتشاف حركة)
+
+    `check()` returns True while the detector should be awake: whenever at least `min_area`
+    (fraction of pixels) changed by more than `threshold` grey levels, and for `cooldown`
+    seconds afterwards so a person who stops moving in front of the camera is still detected.
+    """
+    def __init__(self, width=160, threshold=25, min_area=0.01, learning_rate=0.05, cooldown=5.0):
+        self.width = width
+        self.threshold = threshold
+        self.min_area = min_area
+        self.learning_rate = learning_rate
+        self.cooldown = cooldown
+        self.last_motion_time = None
+        self._background = None
+        self._awake_until = 0.0
+        self._buffers = None  # Small working images, reused while the frame size stays the same
+
+    def reset(self):
+        """Forgets the background model; the next frame is treated as motion."""
+        self._background = None
+
+    def check(self, frame, now):
+        """Updates the background with `frame` and returns whether the detector should run."""
+        h, w = frame.shape[:2]
+        small_size = (self.width, max(1, int(h * self.width / float(w))))
+        small, gray, blurred, background, diff = self._working_buffers(small_size, frame.ndim == 3)
+        # Downscale first, then convert: far fewer pixels go through cvtColor and the blur
+        cv2.resize(frame, small_size, dst=small, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
+        else:
+            gray = small
+        cv2.GaussianBlur(gray, (5, 5), 0, dst=blurred)
+
+        if self._background is None or self._background.shape != blurred.shape:
+            self._background = blurred.astype(np.float32)
+            self._wake(now)
+            return True
+
+        cv2.convertScaleAbs(self._background, dst=background)
+        cv2.absdiff(blurred, background, dst=diff)
+        cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY, dst=diff)
+        changed = cv2.countNonZero(diff) / float(diff.size)
+        cv2.accumulateWeighted(blurred, self._background, self.learning_rate)
+
+        if changed >= self.min_area:
+            self._wake(now)
+            return True  # Even with no cooldown at all
+        return now < self._awake_until
+
+    def _working_buffers(self, small_size, color):
+        width, height = small_size
+        if self._buffers is None or self._buffers[0].shape[:2] != (height, width) or (self._buffers[0].ndim == 3) != color:
+            self._buffers = (np.empty((height, width, 3) if color else (height, width), dtype=np.uint8),
+                             *(np.empty((height, width), dtype=np.uint8) for _ in range(4)))
+        return self._buffers
+
+    def _wake(self, now):
+        self.last_motion_time = now
+        self._awake_until = now + self.cooldown
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+The per-frame recognition pipeline: motion gate, face detection, blink-based liveness,
+recognition and attendance marking. It has no UI dependencies, so the Tk app and
+offline tools (see raqeeb_core.benchmark) drive exactly the same logic.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+import dlib
+import numpy as np
+
+from .constants import RECOGNITION_COOLDOWN
+from .liveness import LivenessTracker, landmark_signals
+from .metrics import PerformanceMonitor
+from .motion import MotionGate
+from .scheduling import AdaptiveFrameScheduler, FRAME_SKIP, FRAME_TRACK, FRAME_DETECT
+
+COLOR_LIVENESS = (0, 255, 255)
+COLOR_RECOGNIZED = (0, 255, 0)
+COLOR_UNKNOWN = (0, 0, 255)
+
+
+class FrameResult:
+    """
+    What the pipeline decided for one frame.
+
+    status: (translation_key, *args) for the status bar, or None to leave it unchanged.
+    annotations: list of (x, y, w, h, label, color) boxes to draw on the displayed frame.
+    events: list of dicts: {'type': 'check_in' | 'recognized' | 'unknown', ...}.
+    """
+    def __init__(self, plan):
+        self.plan = plan
+        self.processed = False
+        self.face_box = None
+        self.status = None
+        self.annotations = []
+        self.events = []
+
+
+class RecognitionPipeline:
+    """
+    Runs detection, liveness, recognition and attendance for single frames.
+    (خط معالجة الإطارات: الكشف، التحقق من الحيوية، التعرف وتسجيل الحضور)
+
+    `now` is passed in by the caller (wall-clock time for the live camera, video
+    timestamps for offline replay), so results don't depend on processing speed.
+
+    With `background_recognition` the embedding runs on a worker thread (TensorFlow releases the
+    GIL), so tracking and the display keep going; its outcome is applied on the first frame
+    processed after it finished. Offline replays keep it off to stay deterministic.
+    """
+    def __init__(self, face_detector, landmark_predictor, recognizer, store, monitor=None,
+                 ear_threshold=0.25, confidence_threshold=0.4, process_frame_interval=1,
+                 adaptive_scheduling=True, target_latency=0.15, motion_gate_enabled=True, motion_cooldown=5.0,
+                 recognition_cooldown=RECOGNITION_COOLDOWN, background_recognition=False):
+        self.face_detector = face_detector
+        self.landmark_predictor = landmark_predictor
+        self.recognizer = recognizer
+        self.store = store
+        self.monitor = monitor or PerformanceMonitor()
+        self.ear_threshold = ear_threshold
+        self.confidence_threshold = confidence_threshold
+        self.recognition_cooldown = recognition_cooldown
+        self.scheduler = AdaptiveFrameScheduler(target_latency=target_latency, min_interval=process_frame_interval,
+                                                adaptive=adaptive_scheduling)
+        self.monitor.add_listener(self.scheduler.record)
+        self.motion_gate = MotionGate(cooldown=motion_cooldown) if motion_gate_enabled else None
+        self.face = None
+        self.track_id = 0  # Incremented whenever a different face is picked up, for the logs
+        self._gray = None  # Reused grayscale buffer
+        self.liveness = LivenessTracker(ear_threshold=ear_threshold)
+        self.liveness_verified = False
+        self.liveness_confidence = 0.0
+        self.last_recognition_time = 0
+        self._executor = None
+        self._set_background(background_recognition)
+        self._pending = None  # (future, face_crop, box, now, liveness) of the recognition in flight
+
+    def configure(self, ear_threshold=None, confidence_threshold=None, process_frame_interval=None,
+                  adaptive_scheduling=None, target_latency=None, motion_gate_enabled=None, motion_cooldown=None,
+                  background_recognition=None):
+        """Applies changed settings between frames without losing tracking or scheduler state. None keeps a value."""
+        if ear_threshold is not None:
+            self.ear_threshold = self.liveness.ear_threshold = ear_threshold
+        if confidence_threshold is not None:
+            self.confidence_threshold = confidence_threshold
+        self.scheduler.configure(target_latency=target_latency, min_interval=process_frame_interval,
+                                 adaptive=adaptive_scheduling)
+        if motion_gate_enabled is not None and motion_gate_enabled != (self.motion_gate is not None):
+            self.motion_gate = MotionGate() if motion_gate_enabled else None
+        if motion_cooldown is not None and self.motion_gate is not None:
+            self.motion_gate.cooldown = motion_cooldown
+        if background_recognition is not None:
+            self._set_background(background_recognition)
+
+    def _set_background(self, enabled):
+        # A recognition already in flight still finishes and is applied by process()
+        if enabled and self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='raqeeb-recognition')
+        elif not enabled and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def close(self):
+        """Detaches the scheduler from the shared performance monitor and stops the recognition worker."""
+        self.monitor.remove_listener(self.scheduler.record)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def process(self, frame, now):
+        """Runs one captured BGR frame through the pipeline and returns a FrameResult."""
+        monitor = self.monitor
+        monitor.tick('captured', now)
+        result = FrameResult(self.scheduler.next_frame(now))
+        if self._pending is not None and self._pending[0].done():
+            future, face_crop, box, started_at, liveness = self._pending
+            self._pending = None
+            self._complete_recognition(future.result(), face_crop, box, started_at, liveness, result)
+        if result.plan == FRAME_SKIP:
+            # Landmarks are cheap: keep sampling a face that still has to blink, or blinks fall between processed frames
+            if self.face is None or self.liveness_verified:
+                return result
+            result.plan = FRAME_TRACK
+
+        # With no face being tracked, only wake the detector when the motion gate sees movement
+        if self.face is None and self.motion_gate is not None:
+            with monitor.stage('motion'):
+                motion = self.motion_gate.check(frame, now)
+            if not motion:
+                self.scheduler.face_seen(False, now)
+                self._reset_liveness()
+                result.status = ('status_searching',)
+                return result
+
+        result.processed = True
+        monitor.tick('processed', now)
+        with monitor.stage('grayscale'):
+            if self._gray is None or self._gray.shape != frame.shape[:2]:
+                self._gray = np.empty(frame.shape[:2], dtype=np.uint8)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        # Full detection on scheduled frames; in between, landmarks reuse the last face box
+        if result.plan == FRAME_DETECT or self.face is None:
+            with monitor.stage('detection'):
+                faces_dlib = self.face_detector(gray, 0)
+            face = max(faces_dlib, key=lambda rect: rect.width() * rect.height()) if len(faces_dlib) > 0 else None
+            if face is not None and (self.face is None or not _same_face(self.face, face)):
+                self.track_id += 1
+                if self.face is not None:
+                    self._reset_liveness()  # Someone else stepped in; their liveness starts from scratch
+            self.face = face
+
+        face = self.face
+        self.scheduler.face_seen(face is not None, now)
+        if face is None:
+            self._reset_liveness()
+            result.status = ('status_searching',)
+            return result
+
+        x, y, w, h = max(face.left(), 0), max(face.top(), 0), face.width(), face.height()
+        face_crop_color = frame[y:y+h, x:x+w]  # A view: nothing here writes to the capture buffer
+        if face_crop_color.size == 0:
+            logging.warning("Face crop is empty, skipping processing for this face.")
+            self.face = None
+            return result
+        result.face_box = (x, y, w, h)
+
+        if not self.liveness_verified:
+            result.status = ('status_liveness_check',)
+            with monitor.stage('landmarks'):
+                shape = shape_to_np(self.landmark_predictor(gray, face))
+            with monitor.stage('ear'):
+                self.liveness.add(now, landmark_signals(shape))
+                check = self.liveness.evaluate(now)
+            self.liveness_confidence = check.confidence
+            if check.verified:
+                self.liveness_verified = True
+                result.status = ('status_liveness_success',)
+                logging.info(f"Liveness verified ({check.blinks} blink(s), confidence {check.confidence:.2f}).",
+                             extra={'fields': {'event': 'liveness', 'track_id': self.track_id, 'blinks': check.blinks,
+                                               'confidence': round(check.confidence, 3)}})
+            elif check.timed_out:
+                self.liveness.reset()
+                result.status = ('status_liveness_retry',)
+            result.annotations.append((x, y, w, h, f"Blink! {check.confidence:.0%}", COLOR_LIVENESS))
+
+        if self.liveness_verified and now - self.last_recognition_time > self.recognition_cooldown and self._pending is None:
+            self._recognize(face_crop_color, (x, y, w, h), now, result)
+            self._reset_liveness()
+            self.last_recognition_time = now
+        return result
+
+    def _recognize(self, face_crop, box, now, result):
+        """Identifies a live face, on the recognition worker if there is one; see _complete_recognition."""
+        if self._executor is None:
+            self._complete_recognition(self._identify(face_crop), face_crop, box, now, self.liveness_confidence, result)
+            return
+        # Copy: the crop is a view into a frame buffer the camera reuses before the worker is done
+        face_crop = face_crop.copy()
+        self._pending = (self._executor.submit(self._identify, face_crop), face_crop, box, now, self.liveness_confidence)
+
+    def _identify(self, face_crop):
+        """Embeds and searches one face; returns (name, distance, {stage: seconds}), or None on error."""
+        latency = {}
+        try:
+            started = time.perf_counter()
+            with self.monitor.stage('embedding'):
+                embedding = self.recognizer.represent(face_crop)
+            latency['embedding'] = time.perf_counter() - started
+            started = time.perf_counter()
+            with self.monitor.stage('search'):
+                name, distance = self.recognizer.search(embedding)
+            latency['search'] = time.perf_counter() - started
+        except Exception as e:
+            logging.error("DeepFace recognition error: %s", e, extra={'fields': {'event': 'recognition', 'track_id': self.track_id}})
+            return None
+        return name, distance, latency
+
+    def _complete_recognition(self, identified, face_crop, box, now, liveness, result):
+        """Marks attendance or reports an unknown visitor; always runs on the camera thread."""
+        if identified is None:
+            return
+        name, distance, latency = identified
+        x, y, w, h = box
+        recognized = name is not None and distance < self.confidence_threshold
+        if recognized:
+            started = time.perf_counter()
+            with self.monitor.stage('db_write'):
+                marked_at = self.store.mark_attendance(name, datetime.fromtimestamp(now))
+            latency['db_write'] = time.perf_counter() - started
+            outcome = 'check_in' if marked_at is not None else 'already_marked'
+        else:
+            outcome = 'unknown'
+        logging.info(f"Recognition: {name if recognized else 'unknown'} ({outcome})", extra={'fields': {
+            'event': 'recognition', 'outcome': outcome, 'name': name, 'track_id': self.track_id,
+            'distance': None if distance is None else round(float(distance), 4),
+            'liveness': round(liveness, 3),
+            'latency_ms': {stage: round(seconds * 1000.0, 1) for stage, seconds in latency.items()}}})
+
+        if recognized:
+            if marked_at is not None:
+                result.status = ('status_recognized', name)
+            result.events.append({'type': 'check_in' if marked_at else 'recognized', 'name': name,
+                                  'distance': float(distance), 'liveness': liveness,
+                                  'timestamp': marked_at or datetime.fromtimestamp(now)})
+            result.annotations.append((x, y, w, h, name, COLOR_RECOGNIZED))
+        else:
+            result.status = ('status_unknown',)
+            # Copy: the crop is a view into a frame buffer the caller may reuse
+            result.events.append({'type': 'unknown', 'distance': None if distance is None else float(distance),
+                                  'liveness': liveness, 'face_crop': face_crop.copy(), 'box': box,
+                                  'timestamp': datetime.fromtimestamp(now)})
+            result.annotations.append((x, y, w, h, "Unknown", COLOR_UNKNOWN))
+
+    def _reset_liveness(self):
+        self.liveness_verified = False
+        self.liveness_confidence = 0.0
+        self.liveness.reset()
+
+
+# --- Helper Functions (وظائف مساعدة) ---
+def load_dlib_models(shape_predictor_path):
+    """Returns (face_detector, landmark_predictor) for the pipeline."""
+    return dlib.get_frontal_face_detector(), dlib.shape_predictor(shape_predictor_path)
+
+def _same_face(previous, current):
+    """True if `current` is close enough to `previous` to be the same person moving."""
+    dx = (previous.left() + previous.right() - current.left() - current.right()) / 2.0
+    dy = (previous.top() + previous.bottom() - current.top() - current.bottom()) / 2.0
+    return dx * dx + dy * dy <= (0.5 * max(previous.width(), 1)) ** 2
+
+def shape_to_np(shape, dtype="int"):
+    """Converts dlib's shape object to a NumPy array."""
+    return np.array([(point.x, point.y) for point in shape.parts()], dtype=dtype)
+
+def draw_annotations(frame, annotations):
+    """Draws the pipeline's face boxes and labels on `frame`."""
+    for x, y, w, h, label, color in annotations:
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_DUPLEX, 0.9, color, 2)
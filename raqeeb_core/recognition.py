@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Face recognition against the known faces (التعرف على الوجوه).
+
+Embeddings of the known faces live in a FaceIndex built by raqeeb_core.enrol; a live face is
+embedded once and compared against the whole index with a single matrix product.
+"""
+
+import logging
+
+import numpy as np
+from deepface import DeepFace
+from deepface.modules import preprocessing
+
+from .constants import DB_PATH, MODEL_NAME
+from .face_index import FaceIndex, index_path_for
+
+
+def prepare_face(img, detector_backend, target_size):
+    """
+    Detects and aligns the largest face in a BGR image and returns it resized and normalised
+    for the embedding model (the same steps DeepFace.represent takes), or None if nothing was found.
+    """
+    face_objs = DeepFace.extract_faces(img_path=img, detector_backend=detector_backend, enforce_detection=False, align=True)
+    if not face_objs:
+        return None
+    face_obj = max(face_objs, key=lambda f: f['facial_area']['w'] * f['facial_area']['h'])
+    face = face_obj['face'][:, :, ::-1]
+    face = preprocessing.resize_image(img=face, target_size=(target_size[1], target_size[0]))
+    face = preprocessing.normalize_input(img=face, normalization='base')
+    return np.asarray(face[0], dtype=np.float32)
+
+
+def embed_batch(model, faces):
+    """Runs the embedding model once on a batch of prepared faces and returns an (N, D) array."""
+    batch = np.stack(faces)
+    keras_model = getattr(model, 'model', None)
+    if keras_model is not None:
+        return np.asarray(keras_model(batch, training=False), dtype=np.float32)
+    return np.asarray([model.forward(face[np.newaxis]) for face in batch], dtype=np.float32)
+
+
+class DeepFaceRecognizer:
+    """
+    Identifies a face crop by searching the face index of the known faces folder.
+    (التعرف على الوجه بالبحث في فهرس الوجوه المعروفة)
+    """
+    def __init__(self, faces_dir=DB_PATH, model_name=MODEL_NAME, detector_backend='mtcnn', index_path=None):
+        self.faces_dir = faces_dir
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.model = None
+        self.index_path = index_path or index_path_for(faces_dir, model_name)
+        self.index = FaceIndex.load(self.index_path, model_name)
+
+    def build_model(self):
+        """Loads the embedding model once, so the first recognition isn't slowed down by it."""
+        self.model = DeepFace.build_model(self.model_name)
+        logging.info(f"DeepFace model '{self.model_name}' loaded successfully.")
+        return self.model
+
+    def refresh_index(self, progress=None):
+        """Embeds images added or changed in the faces folder since the last run (in this process) and reloads the index."""
+        from .enrol import build_index
+        stats = build_index(self.faces_dir, self.model_name, self.detector_backend, model=self.model, workers=0,
+                            progress=progress, index_path=self.index_path)
+        self.index = FaceIndex.load(self.index_path, self.model_name)
+        return stats
+
+    def remove_person(self, name):
+        index = FaceIndex.load(self.index_path, self.model_name)
+        index.remove_name(name)
+        index.save(self.index_path)
+        self.index = index
+
+    def represent(self, face_crop):
+        """Returns the embedding of the face in `face_crop`, or None if no face could be prepared."""
+        face = prepare_face(face_crop, self.detector_backend, self.model.input_shape)
+        if face is None:
+            return None
+        return embed_batch(self.model, [face])[0]
+
+    def search(self, embedding):
+        """Returns (name, distance) of the closest known face, or (None, None) when there is nothing to compare."""
+        if embedding is None:
+            return None, None
+        name, distance, path = self.index.search(embedding)
+        if name is not None:
+            logging.info("Face index result: Identity: %s, Distance: %.4f", path, distance)
+        return name, distance
+
+    def identify(self, face_crop):
+        return self.search(self.represent(face_crop))
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Adaptive frame scheduling for the recognition pipeline.
+Decides, frame by frame, whether to run the face detector, reuse the last face box for
+a landmark-only pass, or just display the frame. The rate is tuned from measured stage
+latencies instead of a fixed processing interval.
+"""
+
+import math
+
+# Frame plans returned by AdaptiveFrameScheduler.next_frame()
+FRAME_SKIP = 'skip'      # Display only, no processing
+FRAME_TRACK = 'track'    # Reuse the last face box, run landmarks/EAR only
+FRAME_DETECT = 'detect'  # Run the full face detector
+
+MODE_IDLE = 'idle'
+MODE_ACTIVE = 'active'
+
+
+class AdaptiveFrameScheduler:
+    """
+    Sets the detection and landmark rate on the fly to meet a target end-to-end latency.
+    (جدولة تكيفية لمعالجة الإطارات بناءً على زمن المعالجة المقاس)
+
+    Active mode (a face is present): landmarks run on every frame, and full detections are
+    spaced as far apart as picking up a new face within `target_latency` seconds allows. The
+    spacing never drops below `min_interval` frames, nor below what keeps the average per-frame
+    cost inside the camera's frame period; `max_interval` caps it.
+    Idle mode (no face for `idle_after` seconds): only a low-rate check every
+    `idle_check_interval` seconds, and the display is throttled to `idle_render_fps`.
+
+    With `adaptive=False` it reproduces the old fixed behaviour: detect every
+    `min_interval` frames and skip the rest.
+    """
+    def __init__(self, target_latency=0.15, min_interval=1, max_interval=15, adaptive=True,
+                 idle_check_interval=0.5, idle_after=3.0, idle_render_fps=10, headroom=0.8, smoothing=0.2):
+        self.target_latency = target_latency
+        self.min_interval = max(1, int(min_interval))
+        self.max_interval = max(self.min_interval, int(max_interval))
+        self.adaptive = adaptive
+        self.idle_check_interval = idle_check_interval
+        self.idle_after = idle_after
+        self.idle_render_fps = idle_render_fps
+        self.headroom = headroom
+        self.smoothing = smoothing
+
+        self.stage_latency = {}  # Exponential moving average per stage, in seconds
+        self.frame_period = None
+        self.detect_interval = self.min_interval
+        self.mode = MODE_IDLE if adaptive else MODE_ACTIVE
+        self._frame_count = 0
+        self._frames_since_detect = 0
+        self._last_frame_time = None
+        self._last_check_time = None
+        self._last_face_time = None
+        self._last_render_time = None
+
+    def configure(self, target_latency=None, min_interval=None, adaptive=None):
+        """Changes the tuning while running; measured latencies are kept."""
+        if target_latency is not None:
+            self.target_latency = target_latency
+        if min_interval is not None:
+            self.min_interval = max(1, int(min_interval))
+            self.max_interval = max(self.min_interval, self.max_interval)
+            self.detect_interval = max(self.detect_interval, self.min_interval)
+        if adaptive is not None and adaptive != self.adaptive:
+            self.adaptive = adaptive
+            if not adaptive:
+                self.mode = MODE_ACTIVE
+                self.detect_interval = self.min_interval
+        if self.adaptive:
+            self._retune()
+
+    def record(self, stage, elapsed):
+        """Feeds a measured stage latency (seconds) into the moving average."""
+        previous = self.stage_latency.get(stage)
+        self.stage_latency[stage] = elapsed if previous is None else previous + self.smoothing * (elapsed - previous)
+
+    def next_frame(self, now):
+        """Returns the plan (FRAME_SKIP, FRAME_TRACK or FRAME_DETECT) for a newly captured frame."""
+        self._frame_count += 1
+        if self._last_frame_time is not None:
+            period = now - self._last_frame_time
+            if period > 0:
+                self.frame_period = period if self.frame_period is None else self.frame_period + self.smoothing * (period - self.frame_period)
+        self._last_frame_time = now
+
+        if not self.adaptive:
+            return FRAME_DETECT if self._frame_count % self.min_interval == 0 else FRAME_SKIP
+
+        if self.mode == MODE_IDLE:
+            if self._last_check_time is None or now - self._last_check_time >= self.idle_check_interval:
+                self._last_check_time = now
+                self._frames_since_detect = 0
+                return FRAME_DETECT
+            return FRAME_SKIP
+
+        self._frames_since_detect += 1
+        if self._frames_since_detect >= self.detect_interval:
+            self._frames_since_detect = 0
+            return FRAME_DETECT
+        return FRAME_TRACK
+
+    def face_seen(self, present, now):
+        """Updates the idle/active mode after a processed frame and re-tunes the detection interval."""
+        if not self.adaptive:
+            return
+        if present:
+            self._last_face_time = now
+            if self.mode == MODE_IDLE:
+                self.mode = MODE_ACTIVE
+                self._frames_since_detect = 0
+        elif self.mode == MODE_ACTIVE and (self._last_face_time is None or now - self._last_face_time >= self.idle_after):
+            self.mode = MODE_IDLE
+            self._last_check_time = now
+        self._retune()
+
+    def should_render(self, now):
+        """Throttles display refreshes while the scene is idle; always renders when active."""
+        if self.mode == MODE_ACTIVE or not self.idle_render_fps:
+            self._last_render_time = now
+            return True
+        if self._last_render_time is None or now - self._last_render_time >= 1.0 / self.idle_render_fps:
+            self._last_render_time = now
+            return True
+        return False
+
+    def _retune(self):
+        """Recomputes the detection interval from the measured detector and per-frame costs."""
+        detect_cost = self.stage_latency.get('detection')
+        if detect_cost is None or not self.frame_period:
+            return
+        per_frame_cost = self.stage_latency.get('landmarks', 0.0) + self.stage_latency.get('ear', 0.0)
+
+        # Smallest interval that keeps the average cost per frame within the frame period,
+        # so frames don't queue up behind the detector and lag doesn't build.
+        budget = self.frame_period * self.headroom - per_frame_cost
+        keep_up = math.ceil(detect_cost / budget) if budget > 0 else self.max_interval
+        # Largest interval that still detects a newly arrived face within the target latency.
+        latency_bound = max(1, int(self.target_latency / self.frame_period))
+
+        # Detect as rarely as the target latency allows, but never more often than the configured
+        # minimum interval or than the detector can keep up with. Falling behind is worse than a
+        # slightly late detection, so both floors win over the latency bound.
+        floor = max(self.min_interval, keep_up)
+        self.detect_interval = min(self.max_interval, max(floor, latency_bound))
+
+    def summary(self):
+        """Returns the current scheduler state for logging."""
+        return {
+            'mode': self.mode,
+            'detect_interval': self.detect_interval,
+            'frame_period_ms': round(self.frame_period * 1000, 1) if self.frame_period else None,
+            'stages_ms': {k: round(v * 1000, 2) for k, v in self.stage_latency.items()},
+        }
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Headless service mode (وضع التشغيل بدون واجهة).
+
+Runs the recognition engine as a daemon without a display:
+    python -m raqeeb_core
+    python -m raqeeb_core --camera 1 --database /srv/raqeeb/attendance_system.db
+    python -m raqeeb_core --api-port 8765      # also serve the local HTTP API (see raqeeb_core.api)
+
+Stop it with Ctrl+C or SIGTERM. Settings are read from the same database as the Tk app.
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+
+from .constants import DB_PATH, UNKNOWN_PATH, DATABASE_FILE, SHAPE_PREDICTOR_PATH
+from .api import ApiServer
+from .engine import RaqeebEngine
+from .logs import setup_logging
+
+
+def log_event(event):
+    """Default headless subscriber: writes check-ins, unknown visitors and errors to the log."""
+    if event['type'] == 'check_in':
+        logging.info(f"Check-in: {event['name']} at {event['timestamp']:%H:%M:%S} (distance {event['distance']:.4f}, liveness {event.get('liveness', 0.0):.2f})")
+    elif event['type'] == 'unknown':
+        logging.info(f"Unknown visitor recorded: {event.get('image_path')}")
+    elif event['type'] == 'error':
+        logging.error(f"Engine error: {event['args']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Raqeeb recognition engine without the GUI.")
+    parser.add_argument('--database', default=DATABASE_FILE, help="SQLite database file (default: %(default)s).")
+    parser.add_argument('--faces-dir', default=DB_PATH)
+    parser.add_argument('--unknown-dir', default=UNKNOWN_PATH)
+    parser.add_argument('--shape-predictor', default=SHAPE_PREDICTOR_PATH)
+    parser.add_argument('--camera', type=int, help="Override the camera index from the settings table.")
+    parser.add_argument('--api-port', type=int, help="Serve the HTTP API on this port (overrides the api_enabled setting).")
+    parser.add_argument('--api-host', help="Interface for the HTTP API (default: the api_host setting).")
+    parser.add_argument('--log-file', default='app.log', help="Log file; '-' logs to the console only.")
+    parser.add_argument('--log-format', choices=('json', 'text'), default='json', help="Format of the log file (default: %(default)s).")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    setup_logging(None if args.log_file == '-' else args.log_file, level=logging.DEBUG if args.verbose else logging.INFO,
+                  json_format=args.log_format == 'json', console=True)
+
+    engine = RaqeebEngine(database_file=args.database, faces_dir=args.faces_dir, unknown_dir=args.unknown_dir,
+                          shape_predictor_path=args.shape_predictor)
+    if args.camera is not None:
+        engine.settings_registry.update({'camera_index': args.camera}, persist=False)
+    engine.subscribe(log_event)
+    try:
+        logging.info("Loading models...")
+        engine.load_models()
+    except Exception as e:
+        logging.critical(f"Could not load models: {e}")
+        engine.close()
+        return 1
+
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_requested.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_requested.set())
+
+    api_server = None
+    settings = engine.settings
+    if args.api_port is not None or settings.API_ENABLED:
+        api_server = ApiServer(engine, host=args.api_host or settings.API_HOST,
+                               port=settings.API_PORT if args.api_port is None else args.api_port, token=settings.API_TOKEN)
+        try:
+            api_server.start()
+        except OSError as e:
+            logging.critical(f"Could not start the API server: {e}")
+            engine.close()
+            return 1
+
+    engine.start()
+    logging.info("Raqeeb engine running headless. Press Ctrl+C to stop.")
+    exit_code = 0
+    while not stop_requested.wait(1.0):
+        if not engine.is_running:  # The loop exited on its own, e.g. the camera could not be opened
+            exit_code = 1
+            break
+    logging.info("Shutting down...")
+    if api_server is not None:
+        api_server.stop()
+    engine.close()
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Application settings stored in the `settings` table (الإعدادات).
+
+The table is read once into a SettingsRegistry. Changes go through `SettingsRegistry.update()`,
+which validates them, writes only the keys whose value changed and notifies the subsystems
+that subscribed to those keys, so they can reconfigure themselves while running.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+
+DEFAULT_ABSENTEE_EMAIL_SUBJECT = "Attendance Reminder"
+DEFAULT_ABSENTEE_EMAIL_BODY = "Dear {name},\n\nThis is a reminder that you have not checked in today. Please let us know if there are any issues.\n\nBest regards,\nManagement."
+
+DETECTOR_BACKENDS = ("opencv", "ssd", "dlib", "mtcnn", "retinaface", "mediapipe")
+
+# Values written on first start; existing rows are never overwritten
+DEFAULT_SETTINGS = {
+    'camera_index': '0', 'camera_width': '0', 'camera_height': '0', 'camera_fps': '0',
+    'camera_fourcc': 'auto', 'camera_buffer_size': '1', 'ear_threshold': '0.25', 'confidence_threshold': '0.4',
+    'detector_backend': 'mtcnn', 'process_frame_interval': '1', 'selected_theme': 'superhero',
+    'adaptive_scheduling': '1', 'target_latency_ms': '150',
+    'motion_gate_enabled': '1', 'motion_cooldown': '5',
+    'perf_overlay': '0', 'metrics_export_path': '', 'metrics_export_interval': '30',
+    'api_enabled': '0', 'api_host': '127.0.0.1', 'api_port': '8765', 'api_token': '',
+    'backup_enabled': '1', 'backup_dir': 'db_backups', 'backup_interval_hours': '24', 'backup_keep_last': '7',
+    'backup_keep_daily': '30', 'backup_compress': '0', 'maintenance_interval_hours': '24', 'maintenance_idle_minutes': '10',
+    'tf_intra_op_threads': '0', 'tf_inter_op_threads': '0', 'opencv_threads': '0', 'enrol_workers': '0',
+    'background_recognition': '1',
+    'absentee_email_subject': DEFAULT_ABSENTEE_EMAIL_SUBJECT,
+    'absentee_email_body': DEFAULT_ABSENTEE_EMAIL_BODY,
+    'smtp_server': 'smtp.gmail.com', 'smtp_port': '465',
+    'admin_password': hashlib.sha256('admin'.encode()).hexdigest() # Default password is 'admin'
+}
+
+# Defaults for keys that are only written once the user fills them in
+OPTIONAL_DEFAULTS = {
+    'sender_email': '', 'email_password': '', 'receiver_email': '',
+    'email_subject_label': 'Security Alert: Unknown Person Detected',
+    'email_body_label': 'An unknown person was detected by the security system.',
+}
+
+
+class SettingsError(ValueError):
+    """A setting value failed validation. `key` names the offending setting."""
+    def __init__(self, key, message):
+        super().__init__(f"{key}: {message}")
+        self.key = key
+        self.message = message
+
+
+# --- Value parsers: raw string -> typed value, raising ValueError when invalid ---
+def _text(value):
+    return str(value)
+
+
+def _flag(value):
+    if str(value) not in ('0', '1'):
+        raise ValueError("expected 0 or 1")
+    return str(value) == '1'
+
+
+def _number(kind, minimum=None, maximum=None):
+    def parse(value):
+        try:
+            number = kind(str(value).strip())
+        except ValueError:
+            raise ValueError("must be a whole number" if kind is int else "must be a number")
+        if not math.isfinite(number):
+            raise ValueError("must be a finite number")
+        if minimum is not None and number < minimum:
+            raise ValueError(f"must be at least {minimum}")
+        if maximum is not None and number > maximum:
+            raise ValueError(f"must be at most {maximum}")
+        return number
+    return parse
+
+
+def _choice(*options):
+    def parse(value):
+        if value not in options:
+            raise ValueError(f"must be one of {', '.join(options)}")
+        return value
+    return parse
+
+
+def _fourcc(value):
+    if value != 'auto' and len(value) != 4:
+        raise ValueError("must be 'auto' or a four-character code such as MJPG")
+    return value
+
+
+# Setting key -> (Settings attribute, parser)
+FIELDS = {
+    'sender_email': ('SENDER_EMAIL', _text),
+    'email_password': ('EMAIL_PASSWORD', _text),
+    'receiver_email': ('RECEIVER_EMAIL', _text),
+    'smtp_server': ('SMTP_SERVER', _text),
+    'smtp_port': ('SMTP_PORT', _number(int, 1, 65535)),
+    'camera_index': ('CAMERA_INDEX', _number(int, 0)),
+    # 0 / 'auto' keep the driver default
+    'camera_width': ('CAMERA_WIDTH', _number(int, 0)),
+    'camera_height': ('CAMERA_HEIGHT', _number(int, 0)),
+    'camera_fps': ('CAMERA_FPS', _number(int, 0)),
+    'camera_fourcc': ('CAMERA_FOURCC', _fourcc),
+    'camera_buffer_size': ('CAMERA_BUFFER_SIZE', _number(int, 0)),
+    'ear_threshold': ('EAR_THRESHOLD', _number(float, 0.0, 1.0)),
+    'confidence_threshold': ('CONFIDENCE_THRESHOLD', _number(float, 0.0, 2.0)),
+    'detector_backend': ('DETECTOR_BACKEND', _choice(*DETECTOR_BACKENDS)),
+    'process_frame_interval': ('PROCESS_FRAME_INTERVAL', _number(int, 1)),
+    'adaptive_scheduling': ('ADAPTIVE_SCHEDULING', _flag),
+    'target_latency_ms': ('TARGET_LATENCY_MS', _number(int, 1)),
+    'motion_gate_enabled': ('MOTION_GATE_ENABLED', _flag),
+    'motion_cooldown': ('MOTION_COOLDOWN', _number(float, 0.0)),
+    'perf_overlay': ('PERF_OVERLAY', _flag),
+    'metrics_export_path': ('METRICS_EXPORT_PATH', _text),
+    'metrics_export_interval': ('METRICS_EXPORT_INTERVAL', _number(float, 1.0)),
+    'api_enabled': ('API_ENABLED', _flag),
+    'api_host': ('API_HOST', _text),
+    'api_port': ('API_PORT', _number(int, 1, 65535)),
+    'api_token': ('API_TOKEN', _text),
+    'backup_enabled': ('BACKUP_ENABLED', _flag),
+    'backup_dir': ('BACKUP_DIR', _text),
+    'backup_interval_hours': ('BACKUP_INTERVAL_HOURS', _number(float, 0.1)),
+    'backup_keep_last': ('BACKUP_KEEP_LAST', _number(int, 1)),
+    'backup_keep_daily': ('BACKUP_KEEP_DAILY', _number(int, 0)),
+    'backup_compress': ('BACKUP_COMPRESS', _flag),
+    # 0 turns maintenance off
+    'maintenance_interval_hours': ('MAINTENANCE_INTERVAL_HOURS', _number(float, 0.0)),
+    'maintenance_idle_minutes': ('MAINTENANCE_IDLE_MINUTES', _number(float, 0.0)),
+    # Thread counts; 0 lets raqeeb_core.compute pick for the machine
+    'tf_intra_op_threads': ('TF_INTRA_OP_THREADS', _number(int, 0)),
+    'tf_inter_op_threads': ('TF_INTER_OP_THREADS', _number(int, 0)),
+    'opencv_threads': ('OPENCV_THREADS', _number(int, 0)),
+    'enrol_workers': ('ENROL_WORKERS', _number(int, 0)),
+    'background_recognition': ('BACKGROUND_RECOGNITION', _flag),
+    'selected_theme': ('selected_theme', _text),
+    'email_subject_label': ('ALERT_EMAIL_SUBJECT', _text),
+    'email_body_label': ('ALERT_EMAIL_BODY', _text),
+    'admin_password': ('ADMIN_PASSWORD_HASH', _text),
+    'absentee_email_subject': ('ABSENTEE_EMAIL_SUBJECT', _text),
+    'absentee_email_body': ('ABSENTEE_EMAIL_BODY', _text),
+}
+
+
+def default_value(key):
+    return DEFAULT_SETTINGS.get(key, OPTIONAL_DEFAULTS.get(key, ''))
+
+
+def validate_settings(values):
+    """
+    Checks every value against FIELDS and returns them normalised to the strings stored in the
+    table (e.g. ' 0.30' -> '0.3', True -> '1'). Raises SettingsError on the first invalid value.
+    """
+    normalised = {}
+    for key, value in values.items():
+        if key not in FIELDS:
+            raise SettingsError(key, "unknown setting")
+        _, parse = FIELDS[key]
+        if isinstance(value, bool):
+            value = '1' if value else '0'
+        try:
+            parsed = parse(str(value))
+        except ValueError as e:
+            raise SettingsError(key, str(e) or f"invalid value {value!r}")
+        if isinstance(parsed, bool):
+            normalised[key] = '1' if parsed else '0'
+        elif parse is _text:
+            normalised[key] = str(value)
+        else:
+            normalised[key] = str(parsed)
+    return normalised
+
+
+class Settings:
+    """
+    Typed, read-only snapshot of the settings table. A new snapshot with a higher `version`
+    replaces it on every change, so a reader holding one always sees a consistent set of values.
+    """
+    def __init__(self, settings, version=0):
+        self.values = dict(settings)  # Raw strings as stored
+        self.version = version
+        for key, (attribute, parse) in FIELDS.items():
+            raw = settings.get(key, default_value(key))
+            try:
+                value = parse(raw)
+            except ValueError as e:
+                logging.warning(f"Invalid stored value for setting '{key}' ({e}); using the default.")
+                value = parse(default_value(key))
+            setattr(self, attribute, value)
+
+    @classmethod
+    def load(cls, store, version=0):
+        """Reads the whole settings table."""
+        with store.lock:
+            store.cursor.execute("SELECT key, value FROM settings")
+            rows = dict(store.cursor.fetchall())
+        logging.info("Settings loaded successfully.")
+        return cls(rows, version)
+
+
+class SettingsRegistry:
+    """
+    In-memory settings cache with change notification.
+    (سجل الإعدادات في الذاكرة مع إشعار المشتركين بالتغييرات)
+
+    `current` is the latest Settings snapshot. `subscribe(callback, keys)` registers
+    `callback(settings, changed_keys)`, called on the thread that made the change whenever one
+    of `keys` (or any key, if None) changed. Callbacks must be quick and must not block.
+    """
+    def __init__(self, store):
+        self.store = store
+        ensure_default_settings(store)
+        self.current = Settings.load(store)
+        self._lock = threading.Lock()  # Serialises updates so versions never go backwards
+        self._subscribers = []  # (callback, frozenset of keys or None)
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def subscribe(self, callback, keys=None):
+        self._subscribers.append((callback, frozenset(keys) if keys is not None else None))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, keys) for cb, keys in self._subscribers if cb != callback]
+
+    def update(self, values, persist=True):
+        """
+        Validates `values` and applies those that differ from the current ones. Only changed keys
+        are written (in one transaction); with `persist=False` they apply to this process only,
+        e.g. command-line overrides. Returns the set of changed keys. Raises SettingsError.
+        """
+        return self._apply(validate_settings(values), persist)
+
+    def reload(self):
+        """Re-reads the table, e.g. after another process edited it, and notifies about any differences."""
+        with self.store.lock:
+            self.store.cursor.execute("SELECT key, value FROM settings")
+            rows = {key: value for key, value in self.store.cursor.fetchall() if key in FIELDS}
+        return self._apply(rows, persist=False)
+
+    def _apply(self, values, persist):
+        with self._lock:
+            current = self.current
+            changed = {key: value for key, value in values.items() if current.values.get(key, default_value(key)) != value}
+            if not changed:
+                return frozenset()
+            if persist:
+                save_settings(self.store, changed)
+            settings = Settings({**current.values, **changed}, current.version + 1)
+            self.current = settings
+        changed_keys = frozenset(changed)
+        # Key names only: some values are passwords
+        logging.info(f"Settings v{settings.version} changed: {', '.join(sorted(changed_keys))}")
+        for callback, keys in list(self._subscribers):
+            if keys is None or keys & changed_keys:
+                try:
+                    callback(settings, changed_keys)
+                except Exception as e:
+                    logging.error(f"Settings subscriber failed: {e}")
+        return changed_keys
+
+
+def ensure_default_settings(store):
+    """Inserts any missing default settings."""
+    with store.lock:
+        for key, value in DEFAULT_SETTINGS.items():
+            store.cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", (key, value))
+        store.conn.commit()
+
+
+def save_settings(store, values):
+    """Writes the given key/value pairs (already converted to strings) to the settings table."""
+    with store.lock:
+        for key, value in values.items():
+            store.cursor.execute("REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+        store.conn.commit()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite attendance store shared by the GUI, the recognition pipeline and offline tools.
+
+Every attendance and employee change is also appended to the `changelog` table, tagged with this
+database's node id and a per-node sequence number, so raqeeb_core.merge can pull only the new
+changes of many sites into one reporting database.
+"""
+
+import logging
+import socket
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, date, timedelta
+from pathlib import Path
+
+# Change log kinds
+CHANGE_ATTENDANCE = 'attendance'
+CHANGE_EMPLOYEE = 'employee'  # Added, or email changed
+CHANGE_EMPLOYEE_DELETE = 'employee_delete'  # Also removes the employee's attendance at that node
+
+
+def day_range(day):
+    """Returns ('YYYY-MM-DD', next day) bounds so day filters can use the timestamp indexes."""
+    return str(day), str(day + timedelta(days=1))
+
+
+def connect_read_only(path):
+    """Opens a read-only connection for reports and integrations; it never takes the writer's lock."""
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + '?mode=ro', uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class AttendanceStore:
+    """
+    Owns the SQLite connection and the attendance/employees/settings schema.
+    (مخزن الحضور: الاتصال بقاعدة البيانات وإنشاء الجداول)
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets readers (dashboard, API, backups) run alongside the recognition loop's writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.cursor = self.conn.cursor()
+        self.lock = threading.RLock()
+        self.create_schema()
+        self.node_id = self._load_node_id()
+        self._seed_changelog()
+
+    def create_schema(self):
+        """Creates the tables if they don't exist yet."""
+        with self.lock:
+            self.cursor.execute('CREATE TABLE IF NOT EXISTS attendance (id INTEGER PRIMARY KEY, name TEXT, timestamp TEXT)')
+            self.cursor.execute('CREATE TABLE IF NOT EXISTS employees (id INTEGER PRIMARY KEY, name TEXT UNIQUE, email TEXT)')
+            self.cursor.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)')
+            # Day/name lookups are range scans on these instead of full table scans
+            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance (timestamp)')
+            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_name_timestamp ON attendance (name, timestamp)')
+            # Append-only; (node_id, seq) identifies a change across all sites
+            self.cursor.execute('CREATE TABLE IF NOT EXISTS changelog (node_id TEXT NOT NULL, seq INTEGER NOT NULL, kind TEXT NOT NULL, '
+                                'row_id INTEGER, name TEXT, email TEXT, timestamp TEXT, PRIMARY KEY (node_id, seq))')
+            self.conn.commit()
+
+    def _load_node_id(self):
+        """Returns this database's node id, creating it on first use. Kept in the settings table but not user-editable."""
+        with self.lock:
+            self.cursor.execute("SELECT value FROM settings WHERE key = 'node_id'")
+            row = self.cursor.fetchone()
+            if row:
+                return row[0]
+            node_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+            self.cursor.execute("INSERT INTO settings (key, value) VALUES ('node_id', ?)", (node_id,))
+            self.conn.commit()
+        logging.info(f"Created node id {node_id} for {self.path}")
+        return node_id
+
+    def _seed_changelog(self):
+        """Databases created before the change log existed get their current rows logged once, so a merge sees them."""
+        with self.lock:
+            self.cursor.execute("SELECT 1 FROM changelog LIMIT 1")
+            if self.cursor.fetchone() is not None:
+                return
+            stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.cursor.execute("INSERT INTO changelog (node_id, seq, kind, name, email, timestamp) "
+                                "SELECT ?, ROW_NUMBER() OVER (ORDER BY id), ?, name, email, ? FROM employees",
+                                (self.node_id, CHANGE_EMPLOYEE, stamp))
+            offset = self.cursor.rowcount
+            self.cursor.execute("INSERT INTO changelog (node_id, seq, kind, row_id, name, timestamp) "
+                                "SELECT ?, ? + ROW_NUMBER() OVER (ORDER BY id), ?, id, name, timestamp FROM attendance",
+                                (self.node_id, offset, CHANGE_ATTENDANCE))
+            offset += self.cursor.rowcount
+            self.conn.commit()
+        if offset:
+            logging.info(f"Change log seeded with {offset} existing rows.")
+
+    def _log_change(self, kind, name, email=None, row_id=None, timestamp=None):
+        """Appends a change under the next sequence number. Call with the lock held, before the commit of the change itself."""
+        timestamp = timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.cursor.execute("INSERT INTO changelog (node_id, seq, kind, row_id, name, email, timestamp) "
+                            "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ?, ? FROM changelog WHERE node_id = ?",
+                            (self.node_id, kind, row_id, name, email, timestamp, self.node_id))
+
+    def mark_attendance(self, name, when=None):
+        """Records attendance for `name` unless already marked that day. Returns the timestamp, or None if it was already marked."""
+        when = when or datetime.now()
+        day_start, day_end = day_range(when.date() if isinstance(when, datetime) else date.today())
+        with self.lock:
+            self.cursor.execute("SELECT 1 FROM attendance WHERE name = ? AND timestamp >= ? AND timestamp < ?", (name, day_start, day_end))
+            if self.cursor.fetchone() is not None:
+                logging.debug("Attendance already marked for: %s today.", name)
+                return None
+            timestamp = when.strftime('%Y-%m-%d %H:%M:%S')
+            self.cursor.execute("INSERT INTO attendance (name, timestamp) VALUES (?, ?)", (name, timestamp))
+            self._log_change(CHANGE_ATTENDANCE, name, row_id=self.cursor.lastrowid, timestamp=timestamp)
+            self.conn.commit()
+        logging.info(f"Attendance marked for: {name} at {when.strftime('%H:%M:%S')}")
+        return when
+
+    def todays_attendance(self):
+        """Returns (name, 'HH:MM:SS') rows for today."""
+        with self.lock:
+            self.cursor.execute("SELECT name, strftime('%H:%M:%S', timestamp) FROM attendance WHERE timestamp >= ? AND timestamp < ?", day_range(date.today()))
+            return self.cursor.fetchall()
+
+    def employee_attendance(self, name):
+        """Returns ('YYYY-MM-DD', 'HH:MM:SS') rows for one employee, newest first."""
+        with self.lock:
+            self.cursor.execute(
+                "SELECT strftime('%Y-%m-%d', timestamp), strftime('%H:%M:%S', timestamp) FROM attendance WHERE name = ? ORDER BY timestamp DESC",
+                (name,))
+            return self.cursor.fetchall()
+
+    def present_names(self, day=None):
+        """Returns the set of names with attendance on `day` (default: today)."""
+        with self.lock:
+            self.cursor.execute("SELECT name FROM attendance WHERE timestamp >= ? AND timestamp < ?", day_range(day or date.today()))
+            return {row[0] for row in self.cursor.fetchall()}
+
+    def list_employees(self):
+        """Returns (name, email) rows ordered by name."""
+        with self.lock:
+            self.cursor.execute("SELECT name, email FROM employees ORDER BY name")
+            return self.cursor.fetchall()
+
+    def employee_email(self, name):
+        with self.lock:
+            self.cursor.execute("SELECT email FROM employees WHERE name = ?", (name,))
+            result = self.cursor.fetchone()
+        return result[0] if result else None
+
+    def employee_emails(self, names):
+        """Returns (name, email) rows for the given names."""
+        if not names:
+            return []
+        q_marks = ','.join('?' * len(names))
+        with self.lock:
+            self.cursor.execute(f"SELECT name, email FROM employees WHERE name IN ({q_marks})", list(names))
+            return self.cursor.fetchall()
+
+    def add_employee(self, name, email):
+        """Adds an employee. Raises sqlite3.IntegrityError if the name already exists."""
+        with self.lock:
+            self.cursor.execute("INSERT INTO employees (name, email) VALUES (?, ?)", (name, email))
+            self._log_change(CHANGE_EMPLOYEE, name, email)
+            self.conn.commit()
+        logging.info(f"Employee '{name}' added to database.")
+
+    def update_employee_email(self, name, email):
+        with self.lock:
+            self.cursor.execute("UPDATE employees SET email = ? WHERE name = ?", (email, name))
+            if self.cursor.rowcount:
+                self._log_change(CHANGE_EMPLOYEE, name, email)
+            self.conn.commit()
+        logging.info(f"Employee '{name}' email updated to {email}.")
+
+    def delete_employee(self, name):
+        """Deletes an employee and their attendance records."""
+        with self.lock:
+            self.cursor.execute("DELETE FROM employees WHERE name = ?", (name,))
+            self.cursor.execute("DELETE FROM attendance WHERE name = ?", (name,))
+            self._log_change(CHANGE_EMPLOYEE_DELETE, name)
+            self.conn.commit()
+        logging.info(f"Employee '{name}' deleted from database.")
+
+    def backup_to(self, backup_filename):
+        """Copies the database to `backup_filename` in small steps, so writers are not held up while it runs."""
+        from .backup import backup_database
+        return backup_database(self.conn, backup_filename)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Tests for database backups and their retention policy."""
+
+import gzip
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from raqeeb_core.backup import BACKUP_PREFIX, BackupCancelled, backup_database, list_backups, prune_backups
+
+
+def make_backup(backup_dir, taken_at, compressed=False):
+    path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{taken_at:%Y%m%d_%H%M%S}.db" + ('.gz' if compressed else ''))
+    open(path, 'wb').close()
+    return path
+
+
+def test_list_backups_is_newest_first_and_ignores_other_files(tmp_path):
+    older = make_backup(str(tmp_path), datetime(2025, 7, 1, 12, 0))
+    newer = make_backup(str(tmp_path), datetime(2025, 7, 2, 12, 0), compressed=True)
+    (tmp_path / 'notes.txt').write_text('')
+    (tmp_path / f"{BACKUP_PREFIX}20250703_120000.db.part").write_text('')
+    assert list_backups(str(tmp_path)) == [(datetime(2025, 7, 2, 12, 0), newer), (datetime(2025, 7, 1, 12, 0), older)]
+    assert list_backups(str(tmp_path / 'missing')) == []
+
+
+def test_prune_keeps_the_newest_and_one_per_recent_day(tmp_path):
+    now = datetime(2025, 7, 10, 23, 0)
+    # Four backups a day for ten days: 2025-07-01 ... 2025-07-10 at 03:00, 09:00, 15:00 and 21:00
+    paths = {}
+    for day in range(10):
+        for hour in (3, 9, 15, 21):
+            taken_at = datetime(2025, 7, 1, hour) + timedelta(days=day)
+            paths[taken_at] = make_backup(str(tmp_path), taken_at)
+
+    removed = prune_backups(str(tmp_path), keep_last=3, keep_daily=5, now=now)
+    kept = {taken_at for taken_at, _ in list_backups(str(tmp_path))}
+    newest_three = {datetime(2025, 7, 10, 21), datetime(2025, 7, 10, 15), datetime(2025, 7, 10, 9)}
+    last_of_recent_days = {datetime(2025, 7, day, 21) for day in range(6, 11)}
+    assert kept == newest_three | last_of_recent_days
+    assert sorted(removed) == sorted(path for taken_at, path in paths.items() if taken_at not in kept)
+
+
+def test_prune_always_keeps_the_newest_backup(tmp_path):
+    newest = make_backup(str(tmp_path), datetime(2025, 1, 2))
+    make_backup(str(tmp_path), datetime(2025, 1, 1))
+    prune_backups(str(tmp_path), keep_last=0, keep_daily=0, now=datetime(2025, 7, 1))
+    assert [path for _, path in list_backups(str(tmp_path))] == [newest]
+
+
+@pytest.fixture
+def source(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'live.db'))
+    conn.execute("CREATE TABLE attendance (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO attendance (name) VALUES (?)", [(f"person {i}",) for i in range(2000)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_compressed_backup_holds_the_same_rows(source, tmp_path):
+    dest = str(tmp_path / 'copy.db')
+    path = backup_database(source, dest, compress=True, pages=4, pause=0)
+    assert path == dest + '.gz'
+    restored = str(tmp_path / 'restored.db')
+    with gzip.open(path, 'rb') as packed, open(restored, 'wb') as raw:
+        raw.write(packed.read())
+    conn = sqlite3.connect(restored)
+    assert conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] == 2000
+    conn.close()
+    assert sorted(os.listdir(tmp_path)) == ['copy.db.gz', 'live.db', 'restored.db']
+
+
+def test_cancelled_backup_leaves_nothing_behind(source, tmp_path):
+    with pytest.raises(BackupCancelled):
+        backup_database(source, str(tmp_path / 'copy.db'), pages=1, pause=0, should_stop=lambda: True)
+    assert os.listdir(tmp_path) == ['live.db']
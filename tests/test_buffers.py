@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Tests for the reusable frame buffer pool handed between the camera, pipeline and display threads."""
+
+import threading
+
+import numpy as np
+
+from raqeeb_core.buffers import FramePool
+
+SHAPE = (48, 64, 3)
+
+
+def test_a_held_buffer_is_never_handed_out_again():
+    pool = FramePool(size=3)
+    held = [pool.acquire(SHAPE) for _ in range(3)]
+    assert len({id(buffer) for buffer in held}) == 3
+    assert pool.in_use() == 3
+    assert pool.acquire(SHAPE) is None  # Full: the caller skips the frame rather than allocating
+
+
+def test_release_returns_the_buffer_for_reuse():
+    pool = FramePool(size=2)
+    first = pool.acquire(SHAPE)
+    second = pool.acquire(SHAPE)
+    pool.release(first)
+    assert pool.in_use() == 1
+    assert pool.acquire(SHAPE) is first
+    assert pool.acquire(SHAPE) is None
+    pool.release(second)
+    assert pool.acquire(SHAPE) is second
+    assert pool.allocations == 2
+
+
+def test_a_buffer_with_several_holders_is_free_only_after_all_release_it():
+    pool = FramePool(size=1)
+    frame = pool.acquire(SHAPE, refs=2)
+    pool.release(frame)
+    assert pool.acquire(SHAPE) is None
+    pool.release(frame)
+    assert pool.in_use() == 0
+    assert pool.acquire(SHAPE) is frame
+
+
+def test_releasing_too_often_or_a_foreign_array_is_harmless():
+    pool = FramePool(size=1)
+    frame = pool.acquire(SHAPE)
+    pool.release(np.empty(SHAPE, dtype=np.uint8))
+    assert pool.in_use() == 1
+    pool.release(frame)
+    pool.release(frame)
+    assert pool.in_use() == 0
+    assert pool.acquire(SHAPE, refs=1) is frame
+    assert pool.in_use() == 1
+
+
+def test_a_new_resolution_replaces_a_free_buffer_instead_of_growing_the_pool():
+    pool = FramePool(size=2)
+    old = pool.acquire(SHAPE)
+    kept = pool.acquire(SHAPE)
+    pool.release(old)
+    resized = pool.acquire((96, 128, 3))
+    assert resized.shape == (96, 128, 3)
+    assert resized is not old
+    assert pool.acquire((96, 128, 3)) is None  # `kept` is still held, and the pool stays at two buffers
+    assert pool.in_use() == 2
+    assert kept.shape == SHAPE
+
+
+def test_adopt_respects_the_pool_size():
+    pool = FramePool(size=2)
+    decoded = np.zeros(SHAPE, dtype=np.uint8)
+    assert pool.adopt(decoded)
+    pool.acquire(SHAPE)
+    assert not pool.adopt(np.zeros(SHAPE, dtype=np.uint8))
+    pool.release(decoded)
+    assert pool.acquire(SHAPE) is decoded
+
+
+def test_threads_never_share_a_buffer_or_grow_the_pool():
+    pool = FramePool(size=4)
+    errors = []
+
+    def worker(marker):
+        for _ in range(500):
+            buffer = pool.acquire(SHAPE)
+            if buffer is None:
+                continue
+            buffer[0, 0, 0] = marker
+            if buffer[0, 0, 0] != marker:
+                errors.append('buffer written by another thread while held')
+            pool.release(buffer)
+
+    threads = [threading.Thread(target=worker, args=(marker,)) for marker in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert pool.in_use() == 0
+    assert pool.allocations <= pool.size
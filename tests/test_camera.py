@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Tests for the camera grab thread: newest-frame delivery, reconnection and shutdown, with a fake capture."""
+
+import logging
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from raqeeb_core import camera as camera_module
+from raqeeb_core.camera import STATE_CONNECTED, STATE_RECONNECTING, CameraStream
+
+SHAPE = (24, 32, 3)
+
+
+class FakeCapture:
+    """
+    Stands in for cv2.VideoCapture. Each grab() is one new frame, numbered from 1, and
+    retrieve() fills every pixel with the number of the last grab. After `frames` grabs the
+    camera is "unplugged" and grab() fails.
+    """
+    def __init__(self, frames=None, opens=True, grab_delay=0.002, blocking=None):
+        self.frames = frames
+        self.opens = opens
+        self.grab_delay = grab_delay
+        self.blocking = blocking  # An Event grab() waits for, to simulate a hung driver
+        self.in_grab = threading.Event()
+        self.grabs = 0
+        self.retrieves = 0
+        self.releases = 0
+
+    def isOpened(self):
+        return self.opens
+
+    def set(self, prop, value):
+        return True
+
+    def get(self, prop):
+        return 0
+
+    def grab(self):
+        if self.blocking is not None:
+            self.in_grab.set()
+            self.blocking.wait()
+        assert not self.releases, "grab() on a released capture"
+        time.sleep(self.grab_delay)
+        if self.frames is not None and self.grabs >= self.frames:
+            return False
+        self.grabs += 1
+        return True
+
+    def retrieve(self, buffer=None):
+        assert not self.releases, "retrieve() on a released capture"
+        self.retrieves += 1
+        frame = buffer if buffer is not None and buffer.shape == SHAPE else np.empty(SHAPE, dtype=np.uint8)
+        frame[:] = self.grabs % 256
+        return True, frame
+
+    def release(self):
+        self.releases += 1
+
+
+class FakeCamera:
+    """Replaces cv2.VideoCapture with a factory handing out the given captures in turn."""
+    def __init__(self, captures):
+        self.captures = list(captures)
+        self.opened_at = []
+
+    def __call__(self, source):
+        self.opened_at.append(time.monotonic())
+        return self.captures.pop(0) if len(self.captures) > 1 else self.captures[0]
+
+
+@pytest.fixture
+def fake_camera(monkeypatch):
+    def install(*captures):
+        fake = FakeCamera(captures)
+        monkeypatch.setattr(camera_module.cv2, 'VideoCapture', fake)
+        return fake
+    return install
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_read_returns_the_newest_frame_and_skips_decoding_the_rest(fake_camera):
+    capture = FakeCapture()
+    fake_camera(capture)
+    stream = CameraStream(0)
+    assert stream.open()
+    stream.start()
+    try:
+        seen = []
+        for _ in range(5):
+            time.sleep(0.03)  # The consumer is busy; the camera keeps delivering
+            requested_after = capture.grabs
+            frame, grabbed_at = stream.read()
+            assert frame is not None and grabbed_at is not None
+            assert frame[0, 0, 0] >= requested_after % 256  # Grabbed after the read, not queued before it
+            seen.append(int(frame[0, 0, 0]))
+        assert seen == sorted(seen) and len(set(seen)) == 5
+    finally:
+        stream.stop()
+    assert capture.retrieves <= 6  # Only frames someone asked for were decoded
+    assert stream.dropped > 0
+    assert stream.grabbed == stream.dropped + capture.retrieves
+    assert capture.releases == 1
+
+
+def test_frames_are_decoded_into_a_few_reused_buffers(fake_camera):
+    fake_camera(FakeCapture())
+    stream = CameraStream(0)
+    stream.open()
+    stream.start()
+    try:
+        buffers = set()
+        for _ in range(20):
+            frame, _ = stream.read()
+            buffers.add(id(frame))
+    finally:
+        stream.stop()
+    assert len(buffers) <= 3
+    assert stream._pool.allocations <= 3
+
+
+def test_an_unplugged_camera_is_reopened_with_growing_delays(fake_camera, caplog):
+    unplugged = FakeCapture(frames=3)
+    missing = FakeCapture(opens=False)
+    replugged = FakeCapture()
+    fake = fake_camera(unplugged, missing, missing, missing, missing, replugged)
+    states = []
+    stream = CameraStream(0, initial_backoff=0.02, max_backoff=0.08, max_failures=2, on_state=states.append)
+    assert stream.open()
+    caplog.set_level(logging.WARNING)
+    stream.start()
+    try:
+        assert wait_for(lambda: STATE_CONNECTED in states)
+        frame, _ = stream.read()
+        assert frame is not None  # Frames flow again without anyone restarting the stream
+    finally:
+        stream.stop()
+
+    assert states == [STATE_RECONNECTING, STATE_CONNECTED]
+    assert stream.reconnects == 1
+    assert unplugged.releases == 1 and replugged.releases == 1
+    retries = [record.args[1] for record in caplog.records if 'still unavailable' in record.msg]
+    assert retries == [0.04, 0.08, 0.08, 0.08]  # Doubling, capped at max_backoff
+    # Each attempt waited at least the delay announced after the previous one
+    gaps = [later - earlier for earlier, later in zip(fake.opened_at[1:], fake.opened_at[2:])]
+    assert len(gaps) == 4
+    for gap, expected in zip(gaps, [0.04, 0.08, 0.08, 0.08]):
+        assert gap >= expected * 0.9
+
+
+def test_stop_never_releases_the_camera_under_a_hung_grab(fake_camera):
+    unblock = threading.Event()
+    capture = FakeCapture(blocking=unblock)
+    fake_camera(capture)
+    stream = CameraStream(0)
+    stream.open()
+    stream.start()
+    assert capture.in_grab.wait(2.0)
+
+    stream.stop(timeout=0.05)
+    assert capture.releases == 0  # The grab thread is still inside the driver
+    with pytest.raises(RuntimeError):
+        stream.start()
+
+    unblock.set()
+    stream._thread.join(2.0)
+    assert not stream._thread.is_alive()
+    assert capture.releases == 1
+    stream.stop()
+    assert capture.releases == 1
+
+
+def test_stop_before_start_releases_the_opened_camera(fake_camera):
+    capture = FakeCapture()
+    fake_camera(capture)
+    stream = CameraStream(0)
+    stream.open()
+    stream.stop()
+    assert capture.releases == 1
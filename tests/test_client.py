@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Tests for a display client (RemoteEngine) talking to the HTTP API of an engine."""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from raqeeb_core.api import ApiServer
+from raqeeb_core.buffers import FramePool
+from raqeeb_core.client import RemoteEngine
+from raqeeb_core.store import AttendanceStore
+
+
+class FakeEngine:
+    """The part of RaqeebEngine the API server uses, with frames from a FramePool like the real one."""
+    def __init__(self, store):
+        self.store = store
+        self.is_running = True
+        self.status = ('status_camera_ok', ())
+        self.pool = FramePool(size=3)
+        self._subscribers = []
+
+    def subscribe(self, callback, frames=False):
+        self._subscribers.append((callback, frames))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, frames) for cb, frames in self._subscribers if cb != callback]
+
+    def release_frame(self, frame):
+        self.pool.release(frame)
+
+    def emit(self, event):
+        for callback, _ in list(self._subscribers):
+            callback(event)
+
+    def emit_frame(self, value):
+        callbacks = [callback for callback, frames in self._subscribers if frames]
+        frame = self.pool.acquire((48, 64, 3), refs=len(callbacks)) if callbacks else None
+        if frame is None:
+            return
+        frame[:] = value
+        for callback in callbacks:
+            callback({'type': 'frame', 'frame': frame, 'timestamp': time.time()})
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def served(tmp_path):
+    store = AttendanceStore(str(tmp_path / 'attendance.db'))
+    engine = FakeEngine(store)
+    server = ApiServer(engine, port=0)
+    server.start()
+    running = threading.Event()
+    running.set()
+
+    def camera():
+        value = 0
+        while running.is_set():
+            engine.emit_frame(value % 255)
+            value += 1
+            time.sleep(0.02)
+
+    thread = threading.Thread(target=camera, daemon=True)
+    thread.start()
+    yield engine, f"http://127.0.0.1:{server.port}"
+    running.clear()
+    thread.join()
+    server.stop()
+    store.close()
+
+
+def test_display_receives_attendance_status_check_ins_and_frames(served):
+    engine, url = served
+    engine.store.mark_attendance('alice', datetime.now())
+    client = RemoteEngine(url)
+    events = []
+    client.subscribe(events.append, frames=True)
+    client.start()
+    try:
+        assert wait_for(lambda: any(e['type'] == 'attendance' for e in events))
+        attendance = next(e for e in events if e['type'] == 'attendance')
+        assert [name for name, _ in attendance['rows']] == ['alice']
+        assert wait_for(lambda: any(e['type'] == 'status' and e['key'] == 'status_camera_ok' for e in events))
+
+        checked_in_at = datetime.now()
+        engine.store.mark_attendance('bob', checked_in_at)
+        engine.emit({'type': 'check_in', 'name': 'bob', 'timestamp': checked_in_at, 'distance': 0.2, 'liveness': 0.9})
+        assert wait_for(lambda: any(e['type'] == 'check_in' and e['name'] == 'bob' for e in events))
+        assert wait_for(lambda: sum(e['type'] == 'frame' for e in events) >= 3)
+        frame = next(e['frame'] for e in events if e['type'] == 'frame')
+        assert frame.shape == (48, 64, 3)
+    finally:
+        client.close()
+    # Once nobody watches, the server stops taking frames and holds none of the engine's buffers
+    assert wait_for(lambda: not any(frames for _, frames in engine._subscribers))
+    assert wait_for(lambda: engine.pool.in_use() == 0)
+
+
+def test_display_reports_an_unreachable_server():
+    client = RemoteEngine('http://127.0.0.1:9', initial_backoff=0.05)
+    events = []
+    client.subscribe(events.append)
+    client.start()
+    try:
+        assert wait_for(lambda: any(e['type'] == 'status' and e['key'] == 'status_server_unreachable' for e in events))
+    finally:
+        client.close()
+
+
+def test_display_and_tools_import_without_the_face_stack():
+    # None in sys.modules makes an import fail, as on a machine without dlib or DeepFace
+    code = ("import sys\n"
+            "sys.modules.update(dlib=None, deepface=None, tensorflow=None)\n"
+            "import raqeeb_core, raqeeb_core.client, raqeeb_core.api, raqeeb_core.export, raqeeb_core.merge\n"
+            "raqeeb_core.Settings\n"
+            "assert 'raqeeb_core.pipeline' not in sys.modules\n")
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Tests for the CPU thread plan and how calibration picks and saves thread counts."""
+
+import pytest
+
+from raqeeb_core.compute import CALIBRATED, ThreadPlan, calibrated_plan, candidate_thread_counts, fastest
+from raqeeb_core.settings import Settings, SettingsRegistry, validate_settings
+from raqeeb_core.store import AttendanceStore
+
+
+def test_fastest_prefers_fewer_threads_when_more_barely_help():
+    assert fastest({1: 0.100, 2: 0.060, 4: 0.050, 8: 0.052}) == 4
+    # 2 threads are within 10 % of the best, so the extra cores stay free for the camera loop
+    assert fastest({1: 0.100, 2: 0.054, 4: 0.050}) == 2
+    assert fastest({1: 0.100, 2: 0.054, 4: 0.050}, tolerance=0.05) == 4
+
+
+def test_fastest_takes_the_fewest_threads_among_equal_times():
+    assert fastest({8: 0.05, 4: 0.05, 2: 0.05}) == 2
+    assert fastest({3: 0.2}) == 3
+
+
+def test_candidate_thread_counts():
+    assert candidate_thread_counts(1) == [1, 2]
+    assert candidate_thread_counts(4) == [1, 2, 4]
+    assert candidate_thread_counts(16) == [1, 2, 8, 14, 16]
+
+
+@pytest.mark.parametrize('cpus, intra, inter, opencv, enrol', [(1, 1, 1, 1, 1), (2, 1, 2, 2, 1), (8, 6, 2, 2, 7)])
+def test_automatic_plan_leaves_cores_for_the_camera_loop(cpus, intra, inter, opencv, enrol):
+    plan = ThreadPlan.for_cpus(cpus)
+    assert (plan.tf_intra_op, plan.tf_inter_op, plan.opencv, plan.enrol_workers) == (intra, inter, opencv, enrol)
+
+
+def test_settings_override_only_the_counts_that_are_set():
+    settings = Settings({'tf_intra_op_threads': '0', 'tf_inter_op_threads': '3', 'opencv_threads': '0',
+                         'enrol_workers': '5', 'background_recognition': '0'})
+    plan = ThreadPlan.from_settings(settings, cpus=8)
+    assert (plan.tf_intra_op, plan.tf_inter_op, plan.opencv, plan.enrol_workers) == (6, 3, 2, 5)
+    assert plan.background_recognition is False
+
+
+def test_calibration_changes_only_intra_op_and_opencv_threads():
+    base = ThreadPlan(tf_intra_op=6, tf_inter_op=3, opencv=2, enrol_workers=5, background_recognition=False)
+    timings = {'tf_intra_op': {1: 0.3, 2: 0.16, 4: 0.1, 6: 0.098}, 'opencv': {1: 0.004, 2: 0.0041, 8: 0.002}}
+    plan = calibrated_plan(base, timings)
+    assert (plan.tf_intra_op, plan.opencv) == (4, 8)
+    assert (plan.tf_inter_op, plan.enrol_workers, plan.background_recognition) == (3, 5, False)
+    assert (base.tf_intra_op, base.opencv) == (6, 2)  # The base plan is not modified
+
+
+def test_a_stage_without_timings_keeps_its_count():
+    base = ThreadPlan(6, 2, 2, 7)
+    assert calibrated_plan(base, {'tf_intra_op': {}, 'opencv': {1: 0.01}}).tf_intra_op == 6
+
+
+def test_plan_serialises_to_valid_settings():
+    plan = ThreadPlan(tf_intra_op=4, tf_inter_op=2, opencv=8, enrol_workers=7, background_recognition=True)
+    values = plan.to_settings()
+    assert values == {'tf_intra_op_threads': '4', 'tf_inter_op_threads': '2', 'opencv_threads': '8',
+                      'enrol_workers': '7', 'background_recognition': '1'}
+    assert validate_settings(values) == values
+    assert plan.to_settings(CALIBRATED) == {'tf_intra_op_threads': '4', 'opencv_threads': '8'}
+
+
+def test_saved_calibration_round_trips_and_keeps_other_settings(tmp_path):
+    store = AttendanceStore(str(tmp_path / 'attendance.db'))
+    try:
+        registry = SettingsRegistry(store)
+        registry.update({'tf_inter_op_threads': '3', 'enrol_workers': '5'})
+        current = ThreadPlan.from_settings(registry.current, cpus=8)
+        plan = calibrated_plan(current, {'tf_intra_op': {2: 0.1, 4: 0.05}, 'opencv': {1: 0.01, 2: 0.02}})
+        registry.update(plan.to_settings(CALIBRATED))
+
+        reloaded = ThreadPlan.from_settings(SettingsRegistry(store).current, cpus=8)
+        assert repr(reloaded) == repr(plan)
+        assert (reloaded.tf_intra_op, reloaded.tf_inter_op, reloaded.opencv, reloaded.enrol_workers) == (4, 3, 1, 5)
+    finally:
+        store.close()
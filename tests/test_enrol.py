@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Tests for the head-pose check of live enrolment and for telling the enrolee from visitors."""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from raqeeb_core.enrol import EnrolmentSession, pose_guidance
+from raqeeb_core.liveness import landmark_signals
+
+
+def face_landmarks(nose_shift):
+    """68 points of a face seen from the camera, its nose moved `nose_shift` eye distances to the image's right."""
+    points = np.zeros((68, 2), dtype=np.float32)
+    points[36:42] = (100, 100)   # The person's right eye, on the left of the image
+    points[42:48] = (160, 100)   # The person's left eye
+    points[30] = (130 + 60 * nose_shift, 140)
+    return points
+
+
+def test_turning_to_the_persons_left_is_positive_yaw():
+    # Seen from the camera, a head turned to its own left points its nose to the image's right
+    assert landmark_signals(face_landmarks(0.3))[2] > 0
+    assert landmark_signals(face_landmarks(-0.3))[2] < 0
+
+
+def test_poses_accept_only_matching_yaw():
+    assert pose_guidance('enrol_look_straight', 0.02) == 'enrol_good'
+    assert pose_guidance('enrol_look_straight', 0.3) == 'enrol_look_straight'
+    assert pose_guidance('enrol_turn_left', 0.3) == 'enrol_good'
+    assert pose_guidance('enrol_turn_right', -0.3) == 'enrol_good'
+
+
+def test_guidance_keeps_asking_until_the_head_is_turned():
+    assert pose_guidance('enrol_turn_left', 0.0) == 'enrol_turn_left'
+    assert pose_guidance('enrol_turn_left', -0.3) == 'enrol_turn_left'
+    assert pose_guidance('enrol_turn_right', 0.3) == 'enrol_turn_right'
+    assert pose_guidance('enrol_turn_left', 0.8) == 'enrol_turn_less'
+    assert pose_guidance('enrol_turn_right', -0.8) == 'enrol_turn_less'
+
+
+def test_poses_without_a_yaw_range_are_not_checked():
+    assert pose_guidance('enrol_smile', 0.9) == 'enrol_good'
+
+
+def enrolling(box, seen_at, tmp_path):
+    session = EnrolmentSession('dana', str(tmp_path / 'dana'), face_detector=None)
+    session.face_box, session.face_seen_at = box, seen_at
+    return session
+
+
+def test_enrolee_is_the_face_where_they_were_last_seen(tmp_path):
+    session = enrolling((200, 100, 120, 120), 50.0, tmp_path)
+    assert session.is_enrolee((210, 110, 118, 122), 50.5)
+    assert not session.is_enrolee((500, 100, 120, 120), 50.5)   # Someone else in the frame
+    assert not session.is_enrolee((200, 100, 120, 120), 60.0)   # Seen too long ago
+    assert not enrolling(None, None, tmp_path).is_enrolee((200, 100, 120, 120), 50.0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from raqeeb_core.engine import RaqeebEngine
+    engine = RaqeebEngine(database_file=str(tmp_path / 'attendance.db'), faces_dir=str(tmp_path / 'faces'),
+                          unknown_dir=str(tmp_path / 'unknown'))
+    saved = []
+    engine.alerter.save_unknown_visitor = lambda crop: saved.append(crop) or f"visitor_{len(saved)}.jpg"
+    yield engine
+    engine.close()
+
+
+def unknown_event(box, now):
+    return {'type': 'unknown', 'distance': 0.9, 'liveness': 0.8, 'face_crop': np.zeros((4, 4, 3), np.uint8),
+            'box': box, 'timestamp': datetime.fromtimestamp(now)}
+
+
+def test_only_the_enrolee_is_spared_the_unknown_visitor_alert(engine, tmp_path):
+    now = 1_750_000_000.0
+    engine._enrolments = [enrolling((200, 100, 120, 120), now, tmp_path)]
+    events = []
+    engine.subscribe(events.append)
+    engine._handle_pipeline_event(unknown_event((205, 105, 120, 120), now + 0.2))
+    engine._handle_pipeline_event(unknown_event((480, 90, 110, 110), now + 0.3))
+    assert [(e['image_path'], e['during_enrolment']) for e in events] == [(None, True), ('visitor_1.jpg', True)]
+
+    engine._enrolments = []
+    engine._handle_pipeline_event(unknown_event((205, 105, 120, 120), now + 0.4))
+    assert (events[-1]['image_path'], events[-1]['during_enrolment']) == ('visitor_2.jpg', False)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tests for the streaming attendance export and its filters."""
+
+import csv
+from datetime import date, datetime
+
+import pytest
+
+from raqeeb_core.export import export_attendance, main
+from raqeeb_core.store import AttendanceStore
+
+CHECK_INS = [('alice', datetime(2025, 6, 30, 8, 0)), ('alice', datetime(2025, 7, 1, 8, 10)),
+             ('bob', datetime(2025, 7, 1, 9, 0)), ('alice', datetime(2025, 7, 2, 8, 5)),
+             ('carol', datetime(2025, 7, 31, 23, 59, 59)), ('bob', datetime(2025, 8, 1, 0, 0))]
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'attendance.db')
+    store = AttendanceStore(path)
+    for name, when in CHECK_INS:
+        store.mark_attendance(name, when)
+    store.close()
+    return path
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.reader(f))
+
+
+def test_date_range_includes_both_end_days(database, tmp_path):
+    out = str(tmp_path / 'july.csv')
+    assert export_attendance(database, out, start=date(2025, 7, 1), end=date(2025, 7, 31)) == 4
+    rows = read_csv(out)
+    assert rows[0] == ['id', 'name', 'date', 'time']
+    assert [(name, day, time) for _, name, day, time in rows[1:]] == [
+        ('alice', '2025-07-01', '08:10:00'), ('bob', '2025-07-01', '09:00:00'),
+        ('alice', '2025-07-02', '08:05:00'), ('carol', '2025-07-31', '23:59:59')]
+
+
+def test_name_filter_and_open_ended_range(database, tmp_path):
+    out = str(tmp_path / 'people.csv')
+    assert export_attendance(database, out, start=date(2025, 7, 1), names=['bob', 'carol']) == 3
+    assert [row[1] for row in read_csv(out)[1:]] == ['bob', 'carol', 'bob']
+
+
+def test_summary_counts_days_per_employee(database, tmp_path):
+    out = str(tmp_path / 'summary.csv')
+    assert export_attendance(database, out, kind='summary', end=date(2025, 7, 31)) == 3
+    assert read_csv(out) == [['name', 'days', 'first_check_in', 'last_check_in'],
+                             ['alice', '3', '2025-06-30 08:00:00', '2025-07-02 08:05:00'],
+                             ['bob', '1', '2025-07-01 09:00:00', '2025-07-01 09:00:00'],
+                             ['carol', '1', '2025-07-31 23:59:59', '2025-07-31 23:59:59']]
+
+
+def test_progress_is_reported_per_chunk(database, tmp_path):
+    calls = []
+    export_attendance(database, str(tmp_path / 'all.csv'), chunk_size=4, progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(0, 6), (4, 6), (6, 6)]
+
+
+def test_cancelled_export_leaves_no_file(database, tmp_path):
+    out = tmp_path / 'cancelled.csv'
+    with pytest.raises(InterruptedError):
+        export_attendance(database, str(out), chunk_size=2, should_cancel=lambda: True)
+    assert list(tmp_path.glob('cancelled.csv*')) == []
+
+
+def test_invalid_requests_are_rejected(database, tmp_path):
+    with pytest.raises(ValueError):
+        export_attendance(database, str(tmp_path / 'report.xlsx'))
+    with pytest.raises(ValueError):
+        export_attendance(database, str(tmp_path / 'report.csv'), start=date(2025, 7, 2), end=date(2025, 7, 1))
+
+
+def test_cli_reports_a_bad_database_without_a_traceback(tmp_path, capsys):
+    bad = tmp_path / 'bad.db'
+    bad.write_text("not a database")
+    assert main([str(tmp_path / 'out.csv'), '--database', str(bad), '--quiet']) == 1
+    assert capsys.readouterr().err.startswith("Export failed:")
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Tests for incremental face index updates, with the face detector and embedding model stubbed out."""
+
+import os
+
+import numpy as np
+import pytest
+
+from raqeeb_core import enrol
+from raqeeb_core.face_index import FaceIndex, index_path_for
+
+recognition = pytest.importorskip('raqeeb_core.recognition')
+
+
+class StubModel:
+    input_shape = (None, 8, 8, 3)
+
+
+@pytest.fixture
+def faces_dir(tmp_path):
+    for rel_path in ('alice/1.jpg', 'alice/2.jpg', 'bob/1.jpg', 'bob/blurred.jpg'):
+        path = tmp_path / rel_path
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b'image')
+    return tmp_path
+
+
+@pytest.fixture
+def prepared(monkeypatch):
+    """Records which images were run through face detection; those named blurred* have no face."""
+    calls = []
+
+    def prepare(job):
+        path = job[0]
+        calls.append(os.path.relpath(path, os.path.dirname(os.path.dirname(path))))
+        if os.path.basename(path).startswith('blurred'):
+            return None, "no face found"
+        return np.ones((8, 8, 3), dtype=np.float32), None
+
+    monkeypatch.setattr(enrol, '_prepare_job', prepare)
+    monkeypatch.setattr(recognition, 'embed_batch', lambda model, faces: np.ones((len(faces), 4), dtype=np.float32))
+    return calls
+
+
+def build(faces_dir, **options):
+    return enrol.build_index(str(faces_dir), detector_backend='opencv', model=StubModel(), workers=0, **options)
+
+
+def test_images_without_a_face_are_not_retried_until_they_change(faces_dir, prepared):
+    stats = build(faces_dir)
+    assert (stats['indexed'], stats['failed']) == (3, 1)
+    assert sorted(prepared) == sorted(os.path.join(*name.split('/')) for name in ('alice/1.jpg', 'alice/2.jpg', 'bob/1.jpg', 'bob/blurred.jpg'))
+
+    prepared.clear()
+    stats = build(faces_dir)
+    assert prepared == []
+    assert (stats['indexed'], stats['failed'], stats['unchanged'], stats['known_failures']) == (0, 0, 3, 1)
+
+    blurred = faces_dir / 'bob' / 'blurred.jpg'
+    os.utime(blurred, (blurred.stat().st_atime, blurred.stat().st_mtime + 10))
+    stats = build(faces_dir)
+    assert prepared == [os.path.join('bob', 'blurred.jpg')]
+    assert stats['failed'] == 1
+
+
+def test_full_rebuild_retries_failed_images(faces_dir, prepared):
+    build(faces_dir)
+    prepared.clear()
+    build(faces_dir, full=True)
+    assert len(prepared) == 4
+
+
+def test_deleted_images_are_forgotten(faces_dir, prepared):
+    build(faces_dir)
+    os.remove(faces_dir / 'bob' / 'blurred.jpg')
+    os.remove(faces_dir / 'alice' / '2.jpg')
+    stats = build(faces_dir)
+    index = FaceIndex.load(index_path_for(str(faces_dir)))
+    assert stats['removed'] == 1
+    assert sorted(index.paths) == sorted([os.path.join('alice', '1.jpg'), os.path.join('bob', '1.jpg')])
+    assert index.failed == {}
+
+
+def test_failures_survive_saving_and_removing_a_person(tmp_path):
+    index = FaceIndex()
+    index.add(['bob'], [os.path.join('bob', '1.jpg')], [1.0], np.ones((1, 4)))
+    index.mark_failed(os.path.join('bob', 'blurred.jpg'), 2.0)
+    index.mark_failed(os.path.join('carol', 'dark.jpg'), 3.0)
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    loaded = FaceIndex.load(path)
+    assert loaded.failed == {os.path.join('bob', 'blurred.jpg'): 2.0, os.path.join('carol', 'dark.jpg'): 3.0}
+    loaded.remove_name('bob')
+    assert loaded.failed == {os.path.join('carol', 'dark.jpg'): 3.0}
+    assert len(loaded) == 0
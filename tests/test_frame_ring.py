@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Tests for the shared-memory frame ring's slot reuse and reader holds."""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from raqeeb_core.frame_ring import SharedFrameRing
+
+SHAPE = (4, 6, 3)
+
+
+def frame(value):
+    return np.full(SHAPE, value, dtype=np.uint8)
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing.create(max_shape=SHAPE, slots=3, readers=2)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def test_frames_round_trip_with_their_timestamp(ring):
+    reader = SharedFrameRing.attach(ring.name)
+    try:
+        assert reader.latest() is None
+        assert ring.write(frame(7), 12.5) == 1
+        ref = reader.latest()
+        assert (ref.frame_id, ref.timestamp, ref.shape) == (1, 12.5, SHAPE)
+        assert np.array_equal(reader.read(ref), frame(7))
+        assert np.array_equal(reader.roi(ref, (-2, 1, 4, 10)), frame(7)[1:, :2])
+    finally:
+        reader.close()
+
+
+def test_an_overwritten_frame_is_detected(ring):
+    reader = SharedFrameRing.attach(ring.name)
+    try:
+        ring.write(frame(1), 1.0)
+        ref = reader.latest()
+        for i in range(2, 5):
+            ring.write(frame(i), float(i))
+        assert not reader.valid(ref)
+        assert reader.read(ref) is None
+        assert reader.roi(ref, (0, 0, 2, 2)) is None
+    finally:
+        reader.close()
+
+
+def test_a_held_frame_is_not_overwritten_until_released(ring):
+    reader = SharedFrameRing.attach(ring.name, reader=0)
+    try:
+        ring.write(frame(1), 1.0)
+        held = reader.latest()
+        for i in range(2, 10):
+            ring.write(frame(i), float(i))
+        assert reader.valid(held)
+        assert np.array_equal(reader.read(held), frame(1))
+        assert ring.dropped == 0
+
+        reader.release()
+        for i in range(10, 13):
+            ring.write(frame(i), float(i))
+        assert not reader.valid(held)
+    finally:
+        reader.close()
+
+
+def test_writer_drops_frames_when_every_other_slot_is_held(ring):
+    first = SharedFrameRing.attach(ring.name, reader=0)
+    second = SharedFrameRing.attach(ring.name, reader=1)
+    try:
+        ring.write(frame(1), 1.0)
+        first.latest()
+        ring.write(frame(2), 2.0)
+        second.latest()
+        assert ring.write(frame(3), 3.0) == 3
+        # Slots 0 and 1 are held and slot 2 has the newest frame, which is never overwritten
+        assert ring.write(frame(4), 4.0) is None
+        assert ring.dropped == 1
+        assert ring.last_id == 3
+
+        # Taking a newer frame moves the hold, freeing the old slot
+        first.latest()
+        assert ring.write(frame(5), 5.0) == 4
+        assert ring.written == 4
+    finally:
+        first.close()
+        second.close()
+
+
+def test_wait_returns_only_newer_frames(ring):
+    reader = SharedFrameRing.attach(ring.name)
+    try:
+        ring.write(frame(1), 1.0)
+        assert reader.wait(after_id=1, timeout=0.01) is None
+        ring.write(frame(2), 2.0)
+        assert reader.wait(after_id=1, timeout=0.01).frame_id == 2
+    finally:
+        reader.close()
+
+
+def test_invalid_rings_and_frames_are_rejected(ring):
+    with pytest.raises(ValueError):
+        ring.write(np.zeros((10, 10, 3), dtype=np.uint8), 1.0)
+    with pytest.raises(ValueError):
+        SharedFrameRing.attach(ring.name, reader=2)
+    with pytest.raises(ValueError):
+        SharedFrameRing.create(max_shape=SHAPE, slots=1)
+
+    other = shared_memory.SharedMemory(create=True, size=4096)
+    try:
+        with pytest.raises(ValueError):
+            SharedFrameRing.attach(other.name)
+    finally:
+        other.close()
+        other.unlink()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Tests for blink detection over the liveness ring buffer."""
+
+import numpy as np
+
+from raqeeb_core.liveness import LivenessTracker
+
+FRAME_PERIOD = 0.1
+
+
+def feed(tracker, ears, start=0.0):
+    """Adds one sample per EAR value at 10 samples a second; returns the time of the last one."""
+    now = start
+    for i, ear in enumerate(ears):
+        now = start + i * FRAME_PERIOD
+        tracker.add(now, (ear, 0.3, 0.0, 0.0))
+    return now
+
+
+def test_open_eyes_are_not_verified():
+    tracker = LivenessTracker()
+    result = tracker.evaluate(feed(tracker, [0.3] * 20))
+    assert result.blinks == 0
+    assert not result.verified
+    assert not result.timed_out
+
+
+def test_a_blink_verifies():
+    tracker = LivenessTracker()
+    result = tracker.evaluate(feed(tracker, [0.3] * 10 + [0.05, 0.05] + [0.3] * 5))
+    assert result.blinks == 1
+    assert result.verified
+    assert result.confidence >= 0.6
+
+
+def test_eyes_closed_for_longer_than_a_blink_do_not_count():
+    tracker = LivenessTracker(max_blink=0.8)
+    result = tracker.evaluate(feed(tracker, [0.3] * 5 + [0.05] * 15 + [0.3] * 5))
+    assert result.blinks == 0
+    assert not result.verified
+
+
+def test_eyes_still_closed_at_the_end_are_not_a_blink_yet():
+    tracker = LivenessTracker()
+    result = tracker.evaluate(feed(tracker, [0.3] * 10 + [0.05, 0.05]))
+    assert result.blinks == 0
+
+
+def test_narrow_open_eyes_blink_relative_to_their_own_baseline():
+    # Open at 0.2 is already under ear_threshold; the drop to 0.1 still counts as a blink
+    tracker = LivenessTracker(ear_threshold=0.25)
+    result = tracker.evaluate(feed(tracker, [0.2] * 10 + [0.1, 0.1] + [0.2] * 5))
+    assert result.blinks == 1
+
+
+def test_closing_must_pass_both_the_threshold_and_the_relative_drop():
+    # 0.24 is under ear_threshold but only 8 % below the 0.26 baseline
+    tracker = LivenessTracker(ear_threshold=0.25, relative_drop=0.8)
+    assert tracker.evaluate(feed(tracker, [0.26] * 10 + [0.24, 0.24] + [0.26] * 5)).blinks == 0
+    # 0.3 is 25 % below the 0.4 baseline but still over ear_threshold
+    tracker = LivenessTracker(ear_threshold=0.25, relative_drop=0.8)
+    assert tracker.evaluate(feed(tracker, [0.4] * 10 + [0.3, 0.3] + [0.4] * 5)).blinks == 0
+
+
+def test_eyes_never_seen_open_cannot_blink():
+    tracker = LivenessTracker(min_open_ear=0.15)
+    result = tracker.evaluate(feed(tracker, [0.1] * 10 + [0.02, 0.02] + [0.1] * 5))
+    assert result.blinks == 0
+
+
+def test_times_out_without_a_blink():
+    tracker = LivenessTracker(timeout=8.0)
+    feed(tracker, [0.3] * 10)
+    tracker.add(9.0, (0.3, 0.3, 0.0, 0.0))
+    assert tracker.evaluate(9.0).timed_out
+    tracker.reset()
+    assert len(tracker) == 0
+    assert not tracker.evaluate(9.0).timed_out
+
+
+def test_ring_buffer_keeps_the_newest_samples_in_order():
+    tracker = LivenessTracker(capacity=8, window=100.0)
+    last = feed(tracker, np.linspace(0.2, 0.4, 20))
+    times, values = tracker.samples(last)
+    assert len(tracker) == 8
+    assert np.allclose(times, [i * FRAME_PERIOD for i in range(12, 20)])
+    assert np.all(np.diff(values[:, 0]) > 0)
+
+
+def test_samples_older_than_the_window_are_ignored():
+    tracker = LivenessTracker(window=1.0)
+    # The blink happened 2 s before the last sample, outside the window
+    last = feed(tracker, [0.3] * 3 + [0.05] + [0.3] * 26)
+    times, _ = tracker.samples(last)
+    assert times[0] >= last - 1.0
+    assert tracker.evaluate(last).blinks == 0
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Tests for the rate limit on repeated log messages."""
+
+import logging
+
+from raqeeb_core import logs
+from raqeeb_core.logs import RateLimitFilter
+
+
+def make_record(msg, *args, level=logging.WARNING):
+    return logging.LogRecord('raqeeb', level, __file__, 1, msg, args, None)
+
+
+def test_records_differing_only_in_arguments_are_limited_together(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(logs.time, 'monotonic', lambda: clock[0])
+    rate_filter = RateLimitFilter(interval=60.0, burst=2)
+    passed = [rate_filter.filter(make_record("Camera %s still unavailable, retrying in %.1f s.", 0, backoff))
+              for backoff in (1.0, 2.0, 4.0, 8.0, 16.0)]
+    assert passed == [True, True, False, False, False]
+
+    clock[0] += 60.0
+    record = make_record("Camera %s still unavailable, retrying in %.1f s.", 0, 30.0)
+    assert rate_filter.filter(record)
+    assert record.fields == {'suppressed': 3}
+
+
+def test_different_templates_and_levels_are_counted_apart():
+    rate_filter = RateLimitFilter(interval=60.0, burst=1)
+    assert rate_filter.filter(make_record("API request failed: %s", 'a'))
+    assert not rate_filter.filter(make_record("API request failed: %s", 'b'))
+    assert rate_filter.filter(make_record("API request failed: %s", 'c', level=logging.ERROR))
+    assert rate_filter.filter(make_record("Camera %s stopped delivering frames; reconnecting.", 0))
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Tests for merging site change logs into a central database."""
+
+import shutil
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from raqeeb_core.merge import merge_databases
+from raqeeb_core.store import AttendanceStore
+
+
+@pytest.fixture
+def site(tmp_path):
+    """Creates a site database; returns its path after running `changes(store)` on it."""
+    def make(name, changes):
+        path = str(tmp_path / f"{name}.db")
+        store = AttendanceStore(path)
+        try:
+            changes(store)
+        finally:
+            store.close()
+        return path
+    return make
+
+
+def rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(conn.execute(sql).fetchall())
+    finally:
+        conn.close()
+
+
+def reopen(path, changes):
+    store = AttendanceStore(path)
+    try:
+        changes(store)
+    finally:
+        store.close()
+
+
+def test_merges_attendance_and_employees_of_every_site(tmp_path, site):
+    def building_a(store):
+        store.add_employee('alice', 'alice@example.com')
+        store.mark_attendance('alice', datetime(2025, 7, 14, 8, 30))
+    def building_b(store):
+        store.add_employee('bob', 'bob@example.com')
+        store.mark_attendance('bob', datetime(2025, 7, 14, 9, 0))
+        store.mark_attendance('bob', datetime(2025, 7, 15, 9, 5))
+
+    a, b = site('a', building_a), site('b', building_b)
+    central = str(tmp_path / 'central.db')
+    assert merge_databases(central, [a, b]) == {a: 2, b: 3}
+    assert rows(central, "SELECT name, timestamp FROM attendance") == [
+        ('alice', '2025-07-14 08:30:00'), ('bob', '2025-07-14 09:00:00'), ('bob', '2025-07-15 09:05:00')]
+    assert rows(central, "SELECT name, email FROM employees") == [('alice', 'alice@example.com'), ('bob', 'bob@example.com')]
+    assert len(set(rows(central, "SELECT node_id FROM attendance"))) == 2
+
+
+def test_later_runs_only_merge_new_changes(tmp_path, site):
+    a = site('a', lambda store: store.mark_attendance('alice', datetime(2025, 7, 14, 8, 30)))
+    central = str(tmp_path / 'central.db')
+    assert merge_databases(central, [a]) == {a: 1}
+    assert merge_databases(central, [a]) == {a: 0}
+
+    reopen(a, lambda store: store.mark_attendance('alice', datetime(2025, 7, 15, 8, 45)))
+    assert merge_databases(central, [a]) == {a: 1}
+    assert len(rows(central, "SELECT * FROM attendance")) == 2
+
+
+def test_the_same_site_seen_twice_is_applied_once(tmp_path, site):
+    a = site('a', lambda store: store.mark_attendance('alice', datetime(2025, 7, 14, 8, 30)))
+    copy = str(tmp_path / 'a_copy.db')
+    shutil.copy(a, copy)
+    central = str(tmp_path / 'central.db')
+    assert merge_databases(central, [a, copy]) == {a: 1, copy: 0}
+    assert len(rows(central, "SELECT * FROM attendance")) == 1
+
+
+def test_an_employee_is_removed_once_no_site_has_them(tmp_path, site):
+    def with_carol(day):
+        def changes(store):
+            store.add_employee('carol', 'carol@example.com')
+            store.mark_attendance('carol', datetime(2025, 7, day, 8, 0))
+        return changes
+
+    a, b = site('a', with_carol(14)), site('b', with_carol(15))
+    central = str(tmp_path / 'central.db')
+    merge_databases(central, [a, b])
+
+    reopen(a, lambda store: store.delete_employee('carol'))
+    merge_databases(central, [a, b])
+    assert rows(central, "SELECT name FROM employees") == [('carol',)]
+    assert rows(central, "SELECT timestamp FROM attendance") == [('2025-07-15 08:00:00',)]
+
+    reopen(b, lambda store: store.delete_employee('carol'))
+    merge_databases(central, [a, b])
+    assert rows(central, "SELECT * FROM employees") == []
+    assert rows(central, "SELECT * FROM attendance") == []
+
+
+def test_an_unreadable_site_does_not_stop_the_others(tmp_path, site):
+    broken = tmp_path / 'broken.db'
+    broken.write_text("not a database")
+    a = site('a', lambda store: store.mark_attendance('alice', datetime(2025, 7, 14, 8, 30)))
+    central = str(tmp_path / 'central.db')
+    results = merge_databases(central, [str(broken), a])
+    assert isinstance(results[str(broken)], str)
+    assert results[a] == 1
+
+
+def test_a_central_database_merges_into_another_with_its_sites_node_ids(tmp_path, site):
+    a = site('a', lambda store: store.mark_attendance('alice', datetime(2025, 7, 14, 8, 30)))
+    b = site('b', lambda store: store.mark_attendance('bob', datetime(2025, 7, 14, 9, 0)))
+    region = str(tmp_path / 'region.db')
+    merge_databases(region, [a, b])
+    head_office = str(tmp_path / 'head_office.db')
+    assert merge_databases(head_office, [region]) == {region: 2}
+    assert rows(head_office, "SELECT name, node_id FROM attendance") == rows(region, "SELECT name, node_id FROM attendance")
+    # Merging a site directly after its region adds nothing new
+    assert merge_databases(head_office, [a]) == {a: 0}
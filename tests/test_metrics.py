@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Tests for the stage latency histograms and the JSON / Prometheus metrics export."""
+
+import json
+import re
+
+import pytest
+
+from raqeeb_core.metrics import LATENCY_BUCKETS, PerformanceMonitor, RollingHistogram
+
+# name{labels} value, as in the Prometheus text exposition format
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{([^}]*)\})? (\S+)$')
+
+
+def parse_samples(text):
+    """Returns [(name, {label: value}, value)] for every sample line."""
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"malformed sample line: {line!r}"
+        name, labels, value = match.groups()
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', labels or ''))
+        samples.append((name, labels, float(value)))
+    return samples
+
+
+def monitor_with_samples():
+    monitor = PerformanceMonitor()
+    for ms in range(1, 101):
+        monitor.record('detection', ms / 1000)
+    monitor.record('capture', 0.0005)
+    monitor.tick('processed', now=monitor.started_at)
+    monitor.set_gauge('detect_interval', 3)
+    monitor.set_gauge('scheduler_mode', 'active')  # Not a number, so not exported to Prometheus
+    return monitor
+
+
+def test_percentiles_over_known_samples():
+    histogram = RollingHistogram()
+    for value in range(1, 101):
+        histogram.add(float(value))
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['sum'] == 5050
+    assert summary['mean'] == pytest.approx(50.5)
+    assert summary['p50'] == pytest.approx(50.5)
+    assert summary['p95'] == pytest.approx(95.05)
+    assert summary['p99'] == pytest.approx(99.01)
+    assert summary['max'] == 100
+
+
+def test_percentiles_cover_only_the_window_but_totals_cover_everything():
+    histogram = RollingHistogram(size=10)
+    for value in [100.0] * 50 + [1.0] * 10:
+        histogram.add(value)
+    summary = histogram.summary()
+    # The 50 slow samples have been evicted from the window...
+    assert summary['p99'] == summary['max'] == summary['mean'] == 1.0
+    # ...but not from the lifetime count, sum and buckets
+    assert summary['count'] == 60
+    assert summary['sum'] == 5010
+    assert summary['buckets'][-1] == 60
+
+
+def test_an_empty_histogram_has_only_totals():
+    summary = RollingHistogram().summary()
+    assert summary == {'count': 0, 'sum': 0.0, 'buckets': [0] * (len(LATENCY_BUCKETS) + 1)}
+
+
+def test_buckets_are_cumulative_and_bounds_are_inclusive():
+    histogram = RollingHistogram()
+    for value in (0.0005, 0.001, 0.004, 0.3, 10.0):
+        histogram.add(value)
+    buckets = dict(zip(LATENCY_BUCKETS + (float('inf'),), histogram.summary()['buckets']))
+    assert buckets[0.001] == 2  # 0.001 falls in the le="0.001" bucket
+    assert buckets[0.0025] == 2
+    assert buckets[0.005] == 3
+    assert buckets[0.25] == 3
+    assert buckets[0.5] == 4
+    assert buckets[5.0] == 4
+    assert buckets[float('inf')] == 5
+
+
+def test_prometheus_output_is_well_formed():
+    text = monitor_with_samples().to_prometheus()
+    assert text.endswith('\n')
+    samples = parse_samples(text)
+
+    # Every metric family is announced with HELP then TYPE before its first sample
+    described, typed = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            described[line.split()[2]] = True
+        elif line.startswith('# TYPE '):
+            _, _, name, kind = line.split()
+            assert name in described, f"TYPE before HELP for {name}"
+            assert kind in ('summary', 'histogram', 'gauge')
+            typed[name] = kind
+        else:
+            name = SAMPLE.match(line).group(1)
+            family = re.sub(r'_(bucket|sum|count)$', '', name)
+            assert name in typed or family in typed, f"sample {name} before its TYPE line"
+    assert typed == {'raqeeb_stage_latency_seconds': 'summary', 'raqeeb_stage_duration_seconds': 'histogram',
+                     'raqeeb_fps': 'gauge', 'raqeeb_detect_interval': 'gauge', 'raqeeb_uptime_seconds': 'gauge'}
+
+    by_name = {}
+    for name, labels, value in samples:
+        by_name.setdefault(name, []).append((labels, value))
+    quantiles = {labels['quantile']: value for labels, value in by_name['raqeeb_stage_latency_seconds']
+                 if labels['stage'] == 'detection'}
+    assert set(quantiles) == {'0.5', '0.95', '0.99'}
+    assert quantiles['0.5'] == pytest.approx(0.0505)
+    assert ({'stage': 'detection'}, 100) in by_name['raqeeb_stage_latency_seconds_count']
+    assert 'raqeeb_scheduler_mode' not in by_name
+
+
+@pytest.mark.parametrize('stage, count', [('detection', 100), ('capture', 1)])
+def test_prometheus_histogram_has_cumulative_buckets_sum_and_count(stage, count):
+    samples = parse_samples(monitor_with_samples().to_prometheus())
+    buckets = [(labels['le'], value) for name, labels, value in samples
+               if name == 'raqeeb_stage_duration_seconds_bucket' and labels['stage'] == stage]
+    assert [le for le, _ in buckets] == [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf']
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts)
+    sums = [value for name, labels, value in samples
+            if name == 'raqeeb_stage_duration_seconds_sum' and labels['stage'] == stage]
+    counts_total = [value for name, labels, value in samples
+                    if name == 'raqeeb_stage_duration_seconds_count' and labels['stage'] == stage]
+    assert counts_total == [count]
+    assert counts[-1] == count
+    assert len(sums) == 1 and sums[0] > 0
+
+
+def test_detection_samples_land_in_the_right_buckets():
+    samples = parse_samples(monitor_with_samples().to_prometheus())
+    buckets = {labels['le']: value for name, labels, value in samples
+               if name == 'raqeeb_stage_duration_seconds_bucket' and labels['stage'] == 'detection'}
+    # 1..100 ms
+    assert buckets['0.001'] == 1
+    assert buckets['0.01'] == 10
+    assert buckets['0.05'] == 50
+    assert buckets['0.1'] == 100
+
+
+def test_export_writes_prometheus_or_json_by_extension(tmp_path):
+    monitor = monitor_with_samples()
+    prom_path, json_path = tmp_path / 'metrics.prom', tmp_path / 'metrics.json'
+    monitor.export(str(prom_path))
+    monitor.export(str(json_path))
+    assert prom_path.read_text(encoding='utf-8').startswith('# HELP raqeeb_stage_latency_seconds')
+    snapshot = json.loads(json_path.read_text(encoding='utf-8'))
+    assert snapshot['stages']['detection']['count'] == 100
+    assert snapshot['gauges']['scheduler_mode'] == 'active'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['metrics.json', 'metrics.prom']  # No .tmp left behind
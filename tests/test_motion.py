@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Tests for the motion gate in front of the face detector, on synthetic frames."""
+
+import numpy as np
+import pytest
+
+from raqeeb_core.motion import MotionGate
+
+HEIGHT, WIDTH = 240, 320
+
+
+def scene(block_at=None, size=80, value=220):
+    """A flat grey frame, with a bright square whose top-left corner is at `block_at`, if given."""
+    frame = np.full((HEIGHT, WIDTH, 3), 60, dtype=np.uint8)
+    if block_at is not None:
+        x, y = block_at
+        frame[y:y + size, x:x + size] = value
+    return frame
+
+
+def settled_gate(**options):
+    """A gate that has seen the empty scene and whose cooldown after the first frame is over."""
+    gate = MotionGate(**options)
+    assert gate.check(scene(), 0.0)  # No background yet: treated as motion
+    return gate
+
+
+def test_static_scene_lets_the_detector_sleep():
+    gate = settled_gate(cooldown=1.0)
+    assert gate.check(scene(), 0.5)
+    assert not gate.check(scene(), 2.0)
+    assert gate.last_motion_time == 0.0
+
+
+def test_movement_wakes_the_detector():
+    gate = settled_gate(cooldown=1.0)
+    assert not gate.check(scene(), 2.0)
+    assert gate.check(scene(block_at=(100, 80)), 3.0)
+    assert gate.last_motion_time == 3.0
+
+
+def test_detector_stays_awake_for_the_cooldown_after_motion():
+    gate = settled_gate(cooldown=2.0)
+    gate.check(scene(), 5.0)
+    assert gate.check(scene(block_at=(100, 80)), 10.0)
+    # Nothing moves after that, but a person standing still must still be looked for
+    assert gate.check(scene(), 11.0)
+    assert gate.check(scene(), 11.9)
+    assert not gate.check(scene(), 12.5)
+
+
+def test_no_cooldown_still_wakes_on_motion():
+    gate = settled_gate(cooldown=0.0)
+    assert not gate.check(scene(), 1.0)
+    assert gate.check(scene(block_at=(100, 80)), 2.0)
+    assert not gate.check(scene(), 3.0)
+
+
+def test_changes_smaller_than_min_area_are_ignored():
+    gate = settled_gate(cooldown=0.0, min_area=0.05)
+    # 20x20 of 320x240 pixels is about 0.5% of the frame
+    assert not gate.check(scene(block_at=(100, 80), size=20), 1.0)
+    assert gate.check(scene(block_at=(100, 80), size=120), 2.0)
+
+
+def test_faint_changes_below_the_threshold_are_ignored():
+    gate = settled_gate(cooldown=0.0, threshold=25)
+    assert not gate.check(scene(block_at=(100, 80), value=70), 1.0)
+
+
+def test_background_absorbs_an_object_left_in_view():
+    gate = settled_gate(cooldown=0.0, learning_rate=0.3)
+    decisions = [gate.check(scene(block_at=(100, 80)), 1.0 + i) for i in range(20)]
+    assert decisions[0]
+    assert not decisions[-1]
+
+
+def test_reset_and_new_frame_size_start_a_new_background():
+    gate = settled_gate(cooldown=0.0)
+    assert not gate.check(scene(), 1.0)
+    gate.reset()
+    assert gate.check(scene(), 2.0)
+    assert not gate.check(scene(), 3.0)
+    # A 16:9 camera downscales to a different working size than the 4:3 one
+    assert gate.check(np.full((360, 640, 3), 60, dtype=np.uint8), 4.0)
+
+
+def test_grayscale_frames_are_accepted():
+    gate = MotionGate(cooldown=0.0)
+    gray = scene()[:, :, 0].copy()
+    assert gate.check(gray, 0.0)
+    assert not gate.check(gray, 1.0)
+
+
+class CountingGate(MotionGate):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.checked = 0
+
+    def check(self, frame, now):
+        self.checked += 1
+        return super().check(frame, now)
+
+
+def test_pipeline_consults_the_gate_only_while_no_face_is_tracked():
+    dlib = pytest.importorskip('dlib')
+    from raqeeb_core.pipeline import RecognitionPipeline
+
+    faces = []
+    detector = lambda gray, upsample: list(faces)
+    pipeline = RecognitionPipeline(detector, landmark_predictor=None, recognizer=None, store=None,
+                                   adaptive_scheduling=False, process_frame_interval=1)
+    pipeline.motion_gate = gate = CountingGate(cooldown=0.0)
+    pipeline._reset_liveness = lambda: None
+    pipeline.liveness_verified = True  # Landmarks and recognition are not part of this test
+
+    pipeline.process(scene(), 0.0)
+    pipeline.process(scene(), 1.0)
+    assert gate.checked == 2 and pipeline.face is None
+
+    faces.append(dlib.rectangle(100, 80, 180, 160))
+    pipeline.process(scene(block_at=(100, 80)), 2.0)
+    assert pipeline.face is not None
+    checked = gate.checked
+    for now in (3.0, 4.0, 5.0):
+        pipeline.process(scene(block_at=(100, 80)), now)
+    # While the face is tracked, its frames never reach the gate or its background
+    assert gate.checked == checked
+
+    faces.clear()
+    pipeline.process(scene(), 6.0)
+    assert pipeline.face is None
+    pipeline.process(scene(), 7.0)
+    assert gate.checked == checked + 1
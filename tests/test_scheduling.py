@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Tests for the adaptive frame scheduler's detection-interval clamps."""
+
+from raqeeb_core.scheduling import AdaptiveFrameScheduler, FRAME_DETECT, FRAME_SKIP, FRAME_TRACK, MODE_ACTIVE
+
+FRAME_PERIOD = 1 / 30.0
+
+
+def active_scheduler(detect_cost, per_frame_cost=0.0, **options):
+    """A scheduler that has seen a face at 30 fps with the given measured stage costs."""
+    scheduler = AdaptiveFrameScheduler(**options)
+    for i in range(3):
+        scheduler.next_frame(i * FRAME_PERIOD)
+    scheduler.record('detection', detect_cost)
+    scheduler.record('landmarks', per_frame_cost)
+    scheduler.face_seen(True, 3 * FRAME_PERIOD)
+    assert scheduler.mode == MODE_ACTIVE
+    return scheduler
+
+
+def test_min_interval_is_a_floor():
+    scheduler = active_scheduler(0.005, min_interval=10, target_latency=0.15)
+    assert scheduler.detect_interval == 10
+
+
+def test_target_latency_caps_the_interval():
+    # A cheap detector could run every frame; 150 ms at 30 fps allows detecting every 4th
+    scheduler = active_scheduler(0.005, min_interval=1, target_latency=0.15)
+    assert scheduler.detect_interval == 4
+
+
+def test_slow_detector_overrides_the_latency_cap():
+    # 60 ms per detection in a 26.7 ms budget needs at least every 3rd frame
+    scheduler = active_scheduler(0.060, min_interval=1, target_latency=0.04)
+    assert scheduler.detect_interval == 3
+
+
+def test_max_interval_caps_everything():
+    scheduler = active_scheduler(0.5, min_interval=1, max_interval=6, target_latency=0.04)
+    assert scheduler.detect_interval == 6
+    scheduler = active_scheduler(0.005, min_interval=1, max_interval=3, target_latency=1.0)
+    assert scheduler.detect_interval == 3
+
+
+def test_no_budget_left_uses_max_interval():
+    scheduler = active_scheduler(0.010, per_frame_cost=0.05, max_interval=12, target_latency=0.04)
+    assert scheduler.detect_interval == 12
+
+
+def test_configure_raises_the_floor():
+    scheduler = active_scheduler(0.005, min_interval=1, target_latency=0.15)
+    scheduler.configure(min_interval=8)
+    assert scheduler.detect_interval == 8
+    scheduler.configure(min_interval=2)
+    assert scheduler.detect_interval == 4
+
+
+def test_active_plans_follow_the_interval():
+    scheduler = active_scheduler(0.005, min_interval=1, target_latency=0.15)
+    plans = [scheduler.next_frame((4 + i) * FRAME_PERIOD) for i in range(8)]
+    assert plans.count(FRAME_DETECT) == 2
+    assert plans.count(FRAME_TRACK) == 6
+
+
+def test_fixed_mode_detects_every_min_interval_frames():
+    scheduler = AdaptiveFrameScheduler(min_interval=3, adaptive=False)
+    plans = [scheduler.next_frame(i * FRAME_PERIOD) for i in range(1, 10)]
+    assert plans == [FRAME_SKIP, FRAME_SKIP, FRAME_DETECT] * 3
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tests for settings validation and the settings registry."""
+
+import pytest
+
+from raqeeb_core.settings import Settings, SettingsError, SettingsRegistry, validate_settings
+from raqeeb_core.store import AttendanceStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AttendanceStore(str(tmp_path / 'attendance.db'))
+    yield store
+    store.close()
+
+
+def test_values_are_normalised_to_stored_strings():
+    assert validate_settings({'ear_threshold': ' 0.30', 'camera_index': '2', 'api_enabled': True,
+                              'camera_fourcc': 'MJPG', 'sender_email': ' a@b.c '}) == {
+        'ear_threshold': '0.3', 'camera_index': '2', 'api_enabled': '1', 'camera_fourcc': 'MJPG', 'sender_email': ' a@b.c '}
+
+
+@pytest.mark.parametrize('key, value, message', [
+    ('camera_index', 'one', 'whole number'),
+    ('smtp_port', '70000', 'at most 65535'),
+    ('ear_threshold', '-0.1', 'at least 0.0'),
+    ('ear_threshold', 'nan', 'finite'),
+    ('confidence_threshold', 'NaN', 'finite'),
+    ('backup_interval_hours', 'inf', 'finite'),
+    ('motion_cooldown', '-inf', 'finite'),
+    ('api_enabled', 'yes', '0 or 1'),
+    ('detector_backend', 'nope', 'must be one of'),
+    ('camera_fourcc', 'MJ', 'four-character'),
+    ('no_such_setting', '1', 'unknown setting'),
+])
+def test_invalid_values_name_the_setting(key, value, message):
+    with pytest.raises(SettingsError) as raised:
+        validate_settings({key: value})
+    assert raised.value.key == key
+    assert message in raised.value.message
+
+
+def test_invalid_stored_values_fall_back_to_the_default():
+    defaults = Settings({})
+    settings = Settings({'camera_index': 'broken', 'process_frame_interval': '0', 'backup_interval_hours': 'nan'})
+    assert settings.CAMERA_INDEX == defaults.CAMERA_INDEX
+    assert settings.BACKUP_INTERVAL_HOURS == defaults.BACKUP_INTERVAL_HOURS
+    assert settings.PROCESS_FRAME_INTERVAL == defaults.PROCESS_FRAME_INTERVAL
+
+
+def test_registry_notifies_only_about_changed_keys(store):
+    registry = SettingsRegistry(store)
+    calls = []
+    registry.subscribe(lambda settings, changed: calls.append(changed), keys={'camera_index'})
+    version = registry.version
+    current = registry.current.values.get('camera_index', str(Settings({}).CAMERA_INDEX))
+
+    assert registry.update({'camera_index': current}) == frozenset()
+    assert registry.update({'ear_threshold': '0.21'}) == {'ear_threshold'}
+    assert calls == []
+    assert registry.update({'camera_index': '3', 'ear_threshold': '0.21'}) == {'camera_index'}
+    assert calls == [{'camera_index'}]
+    assert registry.current.CAMERA_INDEX == 3
+    assert registry.version == version + 2
+
+
+def test_registry_rejects_a_batch_with_one_invalid_value(store):
+    registry = SettingsRegistry(store)
+    before = registry.current
+    with pytest.raises(SettingsError):
+        registry.update({'camera_index': '3', 'smtp_port': '0'})
+    assert registry.current is before
+
+
+def test_persisted_changes_survive_a_reload_and_overrides_do_not(store):
+    registry = SettingsRegistry(store)
+    registry.update({'camera_index': '4'})
+    registry.update({'api_port': '9000'}, persist=False)
+    reloaded = SettingsRegistry(store).current
+    assert reloaded.CAMERA_INDEX == 4
+    assert reloaded.API_PORT != 9000